@@ -0,0 +1,89 @@
+"""Benchmark the vectorized annotation engine on long GOES-like sequences.
+
+Compares timelapse.annotate against the per-frame PIL drawing used by
+geemap.add_text_to_gif, on synthetic frames of the same size as a GOES
+timelapse rendered at dimensions=768.
+
+Usage:
+    python benchmarks/bench_annotate.py --frames 120 --fading 1
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timelapse.annotate import annotate_frames, fade_frames, load_font
+
+
+def synthetic_frames(count, width=768, height=576, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    shifts = np.arange(count) * 3
+    return np.stack([np.roll(base, shift, axis=1) for shift in shifts])
+
+
+def goes_dates(count, start="2020-09-05 15:00"):
+    start = datetime.datetime.strptime(start, "%Y-%m-%d %H:%M")
+    step = datetime.timedelta(minutes=10)
+    return [(start + step * i).strftime("%Y-%m-%d %H:%M") for i in range(count)]
+
+
+def annotate_per_frame(frames, text_sequence, font_size=20):
+    """Per-frame PIL drawing, as done by geemap.add_text_to_gif()."""
+    font = load_font("arial.ttf", font_size)
+    count = len(frames)
+    H, W = frames.shape[1:3]
+    xy = (int(0.03 * W), int(0.03 * H))
+    out = []
+    for index, frame in enumerate(frames):
+        image = Image.fromarray(frame)
+        draw = ImageDraw.Draw(image)
+        draw.text(xy, text_sequence[index], font=font, fill="#ffffff")
+        width = (index + 1) / count * W
+        draw.rectangle([(0, H - 5), (width, H)], fill="#0000ff")
+        out.append(np.asarray(image))
+    return np.stack(out)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=5)
+    parser.add_argument("--fading", type=float, default=1.0)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames)
+    text_sequence = goes_dates(args.frames)
+    print(f"{args.frames} frames of {frames.shape[2]}x{frames.shape[1]} pixels")
+
+    _, seconds = timed(annotate_per_frame, frames, text_sequence)
+    print(f"per-frame PIL annotation: {seconds:.3f} s")
+
+    annotated, seconds = timed(
+        annotate_frames,
+        frames,
+        text_sequence,
+        progress_bar_color="#0000ff",
+    )
+    print(f"vectorized annotation:    {seconds:.3f} s")
+
+    if args.fading > 0:
+        faded, seconds = timed(fade_frames, annotated, args.fps, args.fading)
+        print(f"batched fading:           {seconds:.3f} s ({len(faded)} frames)")
+
+
+if __name__ == "__main__":
+    main()
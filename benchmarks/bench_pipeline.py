@@ -0,0 +1,302 @@
+"""Benchmark each stage of the timelapse pipeline on fixtures of increasing size.
+
+The stages are ROI ingestion (read_roi, simplify_roi and gdf_to_ee), frame
+fetch (iter_frames), annotation, GIF encoding and MP4 encoding. Earth Engine is
+replaced by the replay backend with generated fixtures, so the benchmark runs
+offline. Use --latency to add a simulated Earth Engine delay to each
+thumbnail request.
+
+Each run reports seconds, throughput and peak RSS per stage and appends them to
+a JSONL history file, then compares them with the previous run on the same
+machine so that regressions are visible.
+
+Usage:
+    python benchmarks/bench_pipeline.py --frames 10 40 150 --dimensions 768
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from bench_annotate import goes_dates, synthetic_frames
+
+HISTORY_FILE = os.path.join(APP_DIR, "benchmarks", "results", "history.jsonl")
+ROI_FILE = os.path.join(APP_DIR, "data", "us_states.geojson")
+STAGES = ["roi", "fetch", "annotate", "gif", "mp4"]
+
+
+class PeakRSS:
+    """Samples the resident set size of the process while a block runs.
+
+    ru_maxrss only ever grows, so the peak of one stage is sampled from
+    /proc/self/statm where available.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 0
+
+    def _current(self):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            # Linux reports ru_maxrss in kilobytes, macOS in bytes.
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return rss if sys.platform == "darwin" else rss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._current())
+
+
+def measure(func, *args, **kwargs):
+    """Runs a stage and returns its result, seconds and peak RSS in bytes."""
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return result, seconds, rss.peak
+
+
+def timelapse_collection(count):
+    """A visualized Landsat collection, built offline like the page builds it."""
+    import ee
+
+    return (
+        ee.ImageCollection("LANDSAT/LC08/C02/T1_L2")
+        .limit(count)
+        .map(
+            lambda img: img.visualize(
+                bands=["SR_B4", "SR_B3", "SR_B2"], min=7000, max=20000
+            )
+        )
+    )
+
+
+def write_fixtures(fixtures_dir, collection, region, count, dimensions):
+    """Records a synthetic thumbnail for every request iter_frames() makes."""
+    import ee
+
+    from common.ee_backend import request_key
+    from timelapse.frames import frame_requests
+
+    os.makedirs(os.path.join(fixtures_dir, "thumbs"), exist_ok=True)
+    params = frame_requests(region, dimensions)[0][0]
+    frames = synthetic_frames(count, dimensions, dimensions * 3 // 4)
+    images = collection.toList(count)
+    for i, frame in enumerate(frames):
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, "png")
+        key = request_key(ee.Image(images.get(i)), params)
+        with open(os.path.join(fixtures_dir, "thumbs", key), "wb") as f:
+            f.write(buf.getvalue())
+
+
+def ingest_roi(content, dimensions):
+    from geemap.common import gdf_to_ee
+
+    from timelapse.roi import read_roi, simplify_roi
+
+    gdf = simplify_roi(read_roi(content), dimensions)
+    return gdf_to_ee(gdf, geodesic=False)
+
+
+def fetch_frames(collection, region, count, dimensions):
+    from timelapse.frames import iter_frames
+
+    return np.stack(list(iter_frames(collection, region, count, dimensions)))
+
+
+def run(count, dimensions, out_dir, latency=0.0):
+    """Benchmarks every stage for one number of frames.
+
+    Args:
+        count (int): Number of frames.
+        dimensions (int): Frame width in pixels.
+        out_dir (str): Directory of the fixtures and outputs.
+        latency (float, optional): Simulated seconds per Earth Engine request.
+            Defaults to 0.
+
+    Returns:
+        dict: Seconds, frames per second and peak RSS per stage.
+    """
+    from common import ee_backend
+    from timelapse.annotate import annotate_frames
+    from timelapse.encode import encode_frames
+
+    fixtures_dir = os.path.join(out_dir, f"fixtures-{count}")
+    backend = ee_backend.ReplayBackend(fixtures_dir, latency=latency, seed=0)
+    results = {}
+
+    def record(stage, seconds, peak, items=count, error=None):
+        entry = {
+            "seconds": round(seconds, 4),
+            "per_second": round(items / seconds, 2) if seconds > 0 else None,
+            "peak_rss_mb": round(peak / 1024**2, 1),
+        }
+        if error is not None:
+            entry["error"] = error
+        results[stage] = entry
+
+    with ee_backend.installed(backend):
+        with open(ROI_FILE, "rb") as f:
+            content = f.read()
+        roi, seconds, peak = measure(ingest_roi, content, dimensions)
+        record("roi", seconds, peak, items=1)
+
+        collection = timelapse_collection(count)
+        region = roi.geometry().bounds()
+        write_fixtures(fixtures_dir, collection, region, count, dimensions)
+        frames, seconds, peak = measure(
+            fetch_frames, collection, region, count, dimensions
+        )
+        record("fetch", seconds, peak)
+
+        annotated, seconds, peak = measure(
+            annotate_frames, frames, goes_dates(count), progress_bar_color="#0000ff"
+        )
+        record("annotate", seconds, peak)
+
+        out_gif = os.path.join(out_dir, f"timelapse-{count}.gif")
+        for fmt in ["gif", "mp4"]:
+            report, seconds, peak = measure(
+                encode_frames, annotated, out_gif, formats=(fmt,)
+            )
+            record(fmt, seconds, peak, error=report[fmt].get("error"))
+            if "bytes" in report[fmt]:
+                results[fmt]["bytes"] = report[fmt]["bytes"]
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(history_file, machine, dimensions):
+    """Returns the last recorded run on the same machine and frame size."""
+    if not os.path.exists(history_file):
+        return None
+    last = None
+    with open(history_file) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["machine"] == machine and entry["dimensions"] == dimensions:
+                last = entry
+    return last
+
+
+def compare(current, previous, threshold):
+    """Returns the stages that got slower than the threshold allows."""
+    regressions = []
+    for count, stages in current.items():
+        for stage, entry in stages.items():
+            before = (previous or {}).get(count, {}).get(stage, {})
+            if "seconds" not in before or before.get("seconds", 0) <= 0:
+                continue
+            change = entry["seconds"] / before["seconds"] - 1
+            entry["change"] = round(change, 3)
+            if change > threshold:
+                regressions.append(f"{stage} @ {count} frames: {change:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, nargs="+", default=[10, 40, 150])
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--history", default=HISTORY_FILE)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    machine = f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu"
+    previous = previous_run(args.history, machine, args.dimensions)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        for count in args.frames:
+            results[str(count)] = run(count, args.dimensions, out_dir, args.latency)
+
+    regressions = compare(
+        results, previous["results"] if previous else None, args.threshold
+    )
+
+    print(f"{'stage':<10}{'frames':>8}{'seconds':>10}{'per s':>10}{'RSS MB':>10}")
+    for count, stages in results.items():
+        for stage in STAGES:
+            entry = stages[stage]
+            if "error" in entry:
+                print(f"{stage:<10}{count:>8}  failed: {entry['error']}")
+                continue
+            change = entry.get("change")
+            change = "" if change is None else f"  {change:+.0%}"
+            print(
+                f"{stage:<10}{count:>8}{entry['seconds']:>10.3f}"
+                f"{entry['per_second'] or 0:>10.1f}{entry['peak_rss_mb']:>10.1f}"
+                f"{change}"
+            )
+
+    os.makedirs(os.path.dirname(args.history), exist_ok=True)
+    with open(args.history, "a") as f:
+        entry = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "machine": machine,
+            "python": platform.python_version(),
+            "dimensions": args.dimensions,
+            "latency": args.latency,
+            "results": results,
+        }
+        f.write(json.dumps(entry) + "\n")
+
+    if regressions:
+        print("Regressions since the previous run:")
+        for regression in regressions:
+            print(f"  {regression}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
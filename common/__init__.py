@@ -0,0 +1 @@
+"""Helpers shared by several pages of the app."""
@@ -0,0 +1,432 @@
+"""Lifecycle management for files generated by the app.
+
+Timelapses, their MP4/WebP siblings, uploads and downloaded archives are all
+written to one artifact directory. Each file is owned by the session that
+created it and expires after a time-to-live. The directory as a whole is kept
+under a byte quota by evicting the least recently used files, except files a
+session is currently displaying.
+
+Outputs that are displayed in the browser, such as timelapses, go to a public
+directory under the app's ./static folder when static serving is enabled. They
+are embedded by /app/static URL and streamed from disk with ETag and Range
+support, instead of being copied into Streamlit's in-memory media storage once
+per viewer. Streamlit disables static serving at startup when ./static is
+larger than 1 GB, so the public quota is lowered at startup to what the rest of
+./static, including the space reserved for pre-rendered samples, leaves free.
+
+Files are owned by their stem, so the MP4 and WebP written next to a GIF share
+its owner and lifetime. The directory itself is the source of truth: files left
+behind by crashed renders or by a previous process are picked up by the next
+sweep and expire like any other file.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_DIR = os.environ.get(
+    "ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "streamlit-geospatial")
+)
+QUOTA_BYTES = int(os.environ.get("ARTIFACT_QUOTA_BYTES", 2 * 1024**3))
+TTL_SECONDS = int(os.environ.get("ARTIFACT_TTL_SECONDS", 3600))
+# Public artifacts are served by Streamlit from the ./static folder of the app.
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(APP_DIR, "static")
+PUBLIC_DIR = os.path.join(STATIC_DIR, "artifacts")
+PUBLIC_URL = "/app/static/artifacts"
+# Sample timelapses rendered at deploy time. They are never swept.
+PRERENDER_DIR = os.path.join(STATIC_DIR, "prerendered")
+PRERENDER_URL = "/app/static/prerendered"
+# Streamlit disables static serving at startup when ./static is larger than this.
+MAX_STATIC_BYTES = 1024**3
+# Space in ./static reserved for the pre-rendered samples.
+PRERENDER_QUOTA_BYTES = int(
+    os.environ.get("ARTIFACT_PRERENDER_QUOTA_BYTES", 256 * 1024**2)
+)
+PUBLIC_QUOTA_BYTES = int(os.environ.get("ARTIFACT_PUBLIC_QUOTA_BYTES", 640 * 1024**2))
+# Streamlit does not serve static files larger than this.
+MAX_PUBLIC_BYTES = 200 * 1024 * 1024
+# Minimum number of seconds between two automatic sweeps.
+SWEEP_INTERVAL = int(os.environ.get("ARTIFACT_SWEEP_INTERVAL", 60))
+
+
+def _stem(path):
+    return os.path.basename(path).split(".")[0]
+
+
+def _directory_bytes(path, exclude=()):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [name for name in dirs if os.path.join(root, name) not in exclude]
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def public_quota(
+    quota=PUBLIC_QUOTA_BYTES,
+    static_dir=STATIC_DIR,
+    public_dir=PUBLIC_DIR,
+    prerender_dir=PRERENDER_DIR,
+):
+    """Returns the public quota, lowered so ./static stays under MAX_STATIC_BYTES.
+
+    The pre-rendered samples count with their size on disk, but at least with
+    PRERENDER_QUOTA_BYTES, so samples rendered after startup still fit.
+
+    Args:
+        quota (int, optional): The configured quota. Defaults to
+            PUBLIC_QUOTA_BYTES.
+        static_dir (str, optional): The static folder. Defaults to STATIC_DIR.
+        public_dir (str, optional): The public directory. Defaults to
+            PUBLIC_DIR.
+        prerender_dir (str, optional): The prerender directory. Defaults to
+            PRERENDER_DIR.
+
+    Returns:
+        int: The quota in bytes.
+    """
+    others = _directory_bytes(static_dir, exclude=(public_dir, prerender_dir))
+    prerendered = max(_directory_bytes(prerender_dir), PRERENDER_QUOTA_BYTES)
+    free = max(0, MAX_STATIC_BYTES - others - prerendered)
+    if quota > free:
+        logger.warning(
+            "Public artifact quota lowered from %d to %d bytes to keep %s under %d"
+            " bytes",
+            quota,
+            free,
+            static_dir,
+            MAX_STATIC_BYTES,
+        )
+        return free
+    return quota
+
+
+class ArtifactManager:
+    """Owns the files in the artifact directory.
+
+    Args:
+        root (str, optional): The artifact directory. Defaults to ARTIFACT_DIR.
+        quota_bytes (int, optional): Maximum total size of the directory.
+            Defaults to QUOTA_BYTES.
+        ttl (int, optional): Default time-to-live of a file in seconds.
+            Defaults to TTL_SECONDS.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR, quota_bytes=QUOTA_BYTES, ttl=TTL_SECONDS):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # File stem -> {"session", "created", "accessed", "ttl"}.
+        self._owners = {}
+        # Session -> file stems the session is displaying.
+        self._pins = {}
+        self._last_sweep = 0.0
+        self._counters = {"created": 0, "expired": 0, "evicted": 0, "released": 0}
+
+    def new_path(self, suffix, session=None, ttl=None):
+        """Returns a new file path in the artifact directory.
+
+        Args:
+            suffix (str): The file extension, e.g., ".gif".
+            session (str, optional): The owning session. Files without a session
+                are shared and only expire. Defaults to None.
+            ttl (int, optional): Time-to-live in seconds. Defaults to the
+                manager's ttl.
+
+        Returns:
+            str: The file path. The file itself is not created.
+        """
+        stem = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._owners[stem] = {
+                "session": session,
+                "created": now,
+                "accessed": now,
+                "ttl": self.ttl if ttl is None else ttl,
+            }
+            self._counters["created"] += 1
+        return os.path.join(self.root, stem + suffix)
+
+    def pin(self, session, paths):
+        """Marks the files a session is displaying, replacing its previous pins.
+
+        Pinned files are never evicted and do not expire.
+
+        Args:
+            session (str): The session.
+            paths (list): The displayed file paths.
+        """
+        now = time.time()
+        stems = {_stem(path) for path in paths}
+        with self._lock:
+            self._pins[session] = stems
+            for stem in stems:
+                if stem in self._owners:
+                    self._owners[stem]["accessed"] = now
+
+    def remove(self, path):
+        """Deletes a file and forgets about it.
+
+        Args:
+            path (str): The file path.
+        """
+        with self._lock:
+            self._owners.pop(_stem(path), None)
+        try:
+            os.remove(os.path.join(self.root, os.path.basename(path)))
+        except OSError:
+            pass
+
+    @contextmanager
+    def temporary(self, suffix):
+        """Yields a path that is deleted when the block exits.
+
+        Args:
+            suffix (str): The file extension, e.g., ".zip".
+        """
+        path = self.new_path(suffix)
+        try:
+            yield path
+        finally:
+            self.remove(path)
+
+    def _scan(self):
+        files = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime)
+        return files
+
+    def sweep(self, is_active=None):
+        """Deletes expired files, files of ended sessions and LRU files over quota.
+
+        Args:
+            is_active (callable, optional): Returns whether a session is still
+                connected. Files of ended sessions are deleted. Defaults to None.
+
+        Returns:
+            dict: The number of expired, released and evicted files.
+        """
+        now = time.time()
+        removed = {"expired": 0, "released": 0, "evicted": 0}
+
+        with self._lock:
+            self._last_sweep = now
+            if is_active is not None:
+                for session in list(self._pins):
+                    if not is_active(session):
+                        del self._pins[session]
+            pinned = set().union(*self._pins.values())
+
+            files = self._scan()
+            stems = {_stem(name) for name in files}
+            # Forget paths that were handed out but never written and expired.
+            for stem, owner in list(self._owners.items()):
+                if stem not in stems and now - owner["created"] > owner["ttl"]:
+                    del self._owners[stem]
+
+            candidates = []
+            for name, (size, mtime) in files.items():
+                owner = self._owners.get(_stem(name))
+                if owner is None:
+                    # Left behind by another process, expires from its mtime.
+                    owner = {
+                        "session": None,
+                        "created": mtime,
+                        "accessed": mtime,
+                        "ttl": self.ttl,
+                    }
+                    self._owners[_stem(name)] = owner
+                if _stem(name) in pinned:
+                    continue
+
+                session = owner["session"]
+                if session is not None and is_active is not None:
+                    if not is_active(session):
+                        candidates.append((name, "released"))
+                        continue
+                if now - owner["accessed"] > owner["ttl"]:
+                    candidates.append((name, "expired"))
+
+            for name, reason in candidates:
+                self._delete(name, files)
+                removed[reason] += 1
+
+            total = sum(size for size, _ in files.values())
+            if total > self.quota_bytes:
+                lru = sorted(
+                    (name for name in files if _stem(name) not in pinned),
+                    key=lambda name: self._owners[_stem(name)]["accessed"],
+                )
+                for name in lru:
+                    if total <= self.quota_bytes:
+                        break
+                    total -= files[name][0]
+                    self._delete(name, files)
+                    removed["evicted"] += 1
+
+            for reason, count in removed.items():
+                self._counters[reason] += count
+
+        logger.info(
+            "Artifact sweep of %s: removed %s, usage %s",
+            self.root,
+            removed,
+            self.metrics(),
+        )
+        return removed
+
+    def _delete(self, name, files):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except OSError:
+            pass
+        files.pop(name, None)
+
+    def maybe_sweep(self, is_active=None, interval=SWEEP_INTERVAL):
+        """Sweeps if the last sweep is older than the interval.
+
+        Args:
+            is_active (callable, optional): See sweep(). Defaults to None.
+            interval (int, optional): Minimum seconds between sweeps. Defaults to
+                SWEEP_INTERVAL.
+        """
+        if time.time() - self._last_sweep >= interval:
+            self.sweep(is_active)
+
+    def metrics(self):
+        """Returns usage metrics of the artifact directory.
+
+        Returns:
+            dict: Files and bytes on disk, the quota, pinned files and the
+                number of files created, expired, released and evicted since
+                the process started.
+        """
+        files = self._scan()
+        with self._lock:
+            pinned = set().union(*self._pins.values()) if self._pins else set()
+            counters = dict(self._counters)
+        return {
+            "files": len(files),
+            "bytes": sum(size for size, _ in files.values()),
+            "quota_bytes": self.quota_bytes,
+            "pinned_files": sum(_stem(name) in pinned for name in files),
+            "sessions": len(self._pins),
+            **counters,
+        }
+
+
+manager = ArtifactManager()
+public = ArtifactManager(PUBLIC_DIR, public_quota())
+# Files left by a previous process count towards ./static at the next startup.
+public.sweep()
+
+
+def static_serving():
+    """Returns whether Streamlit serves the ./static folder of the app."""
+    import streamlit as st
+
+    return bool(st.get_option("server.enableStaticServing"))
+
+
+def _manager_for(path):
+    if os.path.dirname(os.path.abspath(path)) == public.root:
+        return public
+    return manager
+
+
+def session_id():
+    """Returns the id of the current Streamlit session, if any."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return None if ctx is None else ctx.session_id
+
+
+def is_active_session(session):
+    """Returns whether a Streamlit session is still connected."""
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return True
+    return Runtime.instance().is_active_session(session)
+
+
+def artifact_path(suffix, shared=False, ttl=None, serve=False):
+    """Returns a new artifact path owned by the current session.
+
+    Args:
+        suffix (str): The file extension, e.g., ".gif".
+        shared (bool, optional): Whether the file outlives the session, e.g., a
+            cached download. Defaults to False.
+        ttl (int, optional): Time-to-live in seconds. Defaults to TTL_SECONDS.
+        serve (bool, optional): Whether the file will be displayed in the
+            browser. Such files are written to the public directory if static
+            serving is enabled, so they can be embedded with artifact_url().
+            Defaults to False.
+
+    Returns:
+        str: The file path.
+    """
+    target = public if serve and static_serving() else manager
+    target.maybe_sweep(is_active_session)
+    session = None if shared else session_id()
+    return target.new_path(suffix, session, ttl)
+
+
+def artifact_url(path):
+    """Returns the URL to embed a file with, or the path itself.
+
+    Files in the public and prerender directories are embedded by their
+    /app/static URL, so the browser fetches them from disk. Other files, and
+    files too large for the static file endpoint, are returned as paths for
+    Streamlit to inline.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        str: The URL or the path.
+    """
+    if os.path.getsize(path) > MAX_PUBLIC_BYTES or not static_serving():
+        return path
+    directory = os.path.dirname(os.path.abspath(path))
+    if directory == public.root:
+        return f"{PUBLIC_URL}/{os.path.basename(path)}"
+    if directory == PRERENDER_DIR:
+        return f"{PRERENDER_URL}/{os.path.basename(path)}"
+    return path
+
+
+def show(paths):
+    """Protects the files displayed by the current session from eviction.
+
+    Args:
+        paths (list): The displayed file paths. Missing files are ignored.
+    """
+    session = session_id()
+    for target in [manager, public]:
+        target.pin(
+            session,
+            [
+                path
+                for path in paths
+                if os.path.exists(path) and _manager_for(path) is target
+            ],
+        )
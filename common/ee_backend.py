@@ -0,0 +1,460 @@
+"""Pluggable Earth Engine backends: live, recording and offline replay.
+
+The pages only talk to Earth Engine through getInfo() calls, thumbnails and
+map tile URLs. A backend provides these three, so the same code can run
+against the live service, record the responses it gets into fixture files,
+or replay those fixtures on a machine without credentials or network access.
+
+The backend is chosen with environment variables:
+
+- EE_BACKEND: "live" (default), "record" or "replay".
+- EE_FIXTURES: the fixture directory. Defaults to ./fixtures/ee.
+- EE_LATENCY: seconds added to every replayed call. Defaults to 0.
+- EE_FAILURE_RATE: fraction of replayed calls that fail. Defaults to 0.
+
+Fixtures are keyed by the serialized Earth Engine expression, so a replay only
+succeeds if the code builds the same expressions as the recorded run.
+
+ee.data.computeValue() and ee.data.getMapId() are replaced once by functions
+that route each call through the backend installed in the calling context, and
+call the original functions elsewhere. A backend is installed for a block with
+installed(), or for the rest of a Streamlit script run with install(), so code
+outside of it, e.g., another session or a test, is not affected. Worker threads
+started with scheduler.inherit() run in the context of the submitting thread.
+
+The backends rely on a few private attributes of ee.data, which are checked by
+check_ee_internals(). uninstall() restores the original functions.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import ee
+
+from . import tile_cache
+from .artifacts import session_id
+from .ee_client import http_session
+from .scheduler import scheduler
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.environ.get("EE_FIXTURES", os.path.join(APP_DIR, "fixtures", "ee"))
+# The algorithm list replays use when their fixtures have none, recorded from
+# earthengine-api 1.7.48.
+ALGORITHMS_FILE = os.path.join(APP_DIR, "data", "ee_algorithms.json")
+
+# Private ee.data functions and state attributes the backends and ee_client
+# use. requirements.txt pins the earthengine-api versions that have them.
+EE_INTERNALS = [
+    "_get_state",
+    "_install_cloud_api_resource",
+    "_execute_cloud_call",
+    "_get_cloud_projects",
+    "_get_projects_path",
+]
+EE_STATE_INTERNALS = [
+    "credentials",
+    "requests_session",
+    "cloud_api_resource",
+    "cloud_api_resource_raw",
+]
+
+
+def check_ee_internals():
+    """Raises RuntimeError if ee lacks a private attribute the backends use."""
+    missing = [f"ee.data.{name}" for name in EE_INTERNALS if not hasattr(ee.data, name)]
+    if not missing:
+        state = ee.data._get_state()
+        missing = [
+            f"ee.data._get_state().{name}"
+            for name in EE_STATE_INTERNALS
+            if not hasattr(state, name)
+        ]
+    if missing:
+        raise RuntimeError(
+            f"earthengine-api {ee.__version__} is not supported, it lacks "
+            f"{', '.join(missing)}. Install a version allowed by requirements.txt."
+        )
+
+
+def _encode(value):
+    if isinstance(value, ee.ComputedObject):
+        return value.serialize()
+    return str(value)
+
+
+def request_key(obj, params=None):
+    """Returns the fixture key of an Earth Engine request.
+
+    Args:
+        obj (ee.ComputedObject): The computed object.
+        params (dict, optional): Extra request parameters, e.g., thumbnail or
+            visualization parameters. Defaults to None.
+
+    Returns:
+        str: A hex digest.
+    """
+    payload = obj.serialize()
+    if params:
+        payload += json.dumps(params, sort_keys=True, default=_encode)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Backend:
+    """The Earth Engine calls made by the app."""
+
+    name = "base"
+
+    def initialize(self, token_name="EARTHENGINE_TOKEN"):
+        """Initializes Earth Engine for this backend."""
+        raise NotImplementedError
+
+    def compute_value(self, obj):
+        """Returns the value of a computed object, as ee.data.computeValue()."""
+        raise NotImplementedError
+
+    def thumbnail(self, image, params, timeout=300):
+        """Returns the encoded thumbnail of an image as bytes."""
+        raise NotImplementedError
+
+    def tile_url(self, image, vis_params=None):
+        """Returns the XYZ tile URL format of a visualized image."""
+        raise NotImplementedError
+
+
+class LiveBackend(Backend):
+    """Talks to the Earth Engine service."""
+
+    name = "live"
+
+    def initialize(self, token_name="EARTHENGINE_TOKEN"):
+        import geemap.foliumap as geemap
+
+        geemap.ee_initialize(token_name=token_name)
+
+    def compute_value(self, obj):
+        return _live_compute_value(obj)
+
+    def thumbnail(self, image, params, timeout=300):
+        url = image.getThumbURL(params)
+        r = http_session().get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.content
+
+    def tile_url(self, image, vis_params=None):
+        return image.getMapId(vis_params or {})["tile_fetcher"].url_format
+
+
+class RecordingBackend(LiveBackend):
+    """Talks to Earth Engine and saves every response as a fixture.
+
+    Args:
+        fixtures_dir (str, optional): The fixture directory. Defaults to
+            FIXTURES_DIR.
+    """
+
+    name = "record"
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.fixtures_dir = fixtures_dir
+        for sub in ["values", "thumbs", "tiles"]:
+            os.makedirs(os.path.join(fixtures_dir, sub), exist_ok=True)
+
+    def _write(self, sub, key, data, mode="w"):
+        path = os.path.join(self.fixtures_dir, sub, key)
+        with open(path, mode) as f:
+            f.write(data)
+
+    def initialize(self, token_name="EARTHENGINE_TOKEN"):
+        super().initialize(token_name)
+        # The algorithm list lets replays build the same expressions offline.
+        path = os.path.join(self.fixtures_dir, "algorithms.json")
+        if not os.path.exists(path):
+            call = (
+                ee.data._get_cloud_projects()
+                .algorithms()
+                .list(parent=ee.data._get_projects_path(), prettyPrint=False)
+            )
+            with open(path, "w") as f:
+                json.dump(ee.data._execute_cloud_call(call), f)
+
+    def compute_value(self, obj):
+        value = super().compute_value(obj)
+        self._write("values", f"{request_key(obj)}.json", json.dumps(value))
+        return value
+
+    def thumbnail(self, image, params, timeout=300):
+        content = super().thumbnail(image, params, timeout)
+        self._write("thumbs", request_key(image, params), content, "wb")
+        return content
+
+    def tile_url(self, image, vis_params=None):
+        url = super().tile_url(image, vis_params)
+        self._write("tiles", f"{request_key(image, vis_params)}.txt", url)
+        return url
+
+
+class ReplayBackend(Backend):
+    """Answers requests from recorded fixtures, without network access.
+
+    Args:
+        fixtures_dir (str, optional): The fixture directory. Defaults to
+            FIXTURES_DIR.
+        latency (float, optional): Seconds added to every call. Defaults to 0.
+        jitter (float, optional): Random extra latency, as a fraction of
+            latency. Defaults to 0.5.
+        failure_rate (float, optional): Fraction of calls that raise
+            ee.EEException. Defaults to 0.
+        seed (int, optional): Seed of the latency and failure draws. Defaults
+            to None.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        fixtures_dir=FIXTURES_DIR,
+        latency=0.0,
+        jitter=0.5,
+        failure_rate=0.0,
+        seed=None,
+    ):
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0, "missing": 0}
+
+    def _simulate(self, kind):
+        with self._lock:
+            self.stats["calls"] += 1
+            delay = self.latency * (1 + self.jitter * self._random.random())
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.stats["failures"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise ee.EEException(f"Injected failure of a replayed {kind} call.")
+
+    def _read(self, sub, key, mode="r"):
+        path = os.path.join(self.fixtures_dir, sub, key)
+        try:
+            with open(path, mode) as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.stats["missing"] += 1
+            raise ee.EEException(
+                f"No recorded response for {sub}/{key}. Record it with "
+                "EE_BACKEND=record."
+            ) from None
+
+    def algorithms(self):
+        """Returns the recorded algorithm list, or the one in ALGORITHMS_FILE."""
+        from ee import _cloud_api_utils
+
+        path = os.path.join(self.fixtures_dir, "algorithms.json")
+        if not os.path.exists(path):
+            path = ALGORITHMS_FILE
+        with open(path) as f:
+            return _cloud_api_utils.convert_algorithms(json.load(f))
+
+    def initialize(self, token_name="EARTHENGINE_TOKEN"):
+        if ee.data._get_state().credentials == "replay":
+            return
+        ee.Reset()
+        # ee.Initialize() only needs these two offline, so they are restored
+        # right after it.
+        originals = {
+            "_install_cloud_api_resource": ee.data._install_cloud_api_resource,
+            "getAlgorithms": ee.data.getAlgorithms,
+        }
+        ee.data._install_cloud_api_resource = lambda: None
+        ee.data.getAlgorithms = self.algorithms
+        try:
+            ee.Initialize(None, "", project="replay")
+        finally:
+            for name, value in originals.items():
+                setattr(ee.data, name, value)
+        # Lets geemap.ee_initialize() see an initialized session.
+        ee.data._get_state().credentials = "replay"
+
+    def compute_value(self, obj):
+        self._simulate("getInfo")
+        return json.loads(self._read("values", f"{request_key(obj)}.json"))
+
+    def thumbnail(self, image, params, timeout=300):
+        self._simulate("thumbnail")
+        return self._read("thumbs", request_key(image, params), "rb")
+
+    def tile_url(self, image, vis_params=None):
+        self._simulate("tile")
+        return self._read("tiles", f"{request_key(image, vis_params)}.txt")
+
+
+_live_compute_value = ee.data.computeValue
+_live_get_map_id = ee.data.getMapId
+# The backend of the process, used by contexts without a backend of their own.
+_backend = None
+# (backend, routes) installed in the current context.
+_installed = contextvars.ContextVar("ee_backend", default=None)
+# Name -> the ee.data function replaced by a dispatcher.
+_originals = {}
+
+
+def _dispatch(name, original):
+    def dispatch(*args, **kwargs):
+        current = _installed.get()
+        if current is None:
+            return original(*args, **kwargs)
+        return current[1][name](*args, **kwargs)
+
+    dispatch.__wrapped__ = original
+    return dispatch
+
+
+def _hook():
+    for name in ["computeValue", "getMapId"]:
+        if name not in _originals:
+            _originals[name] = getattr(ee.data, name)
+            setattr(ee.data, name, _dispatch(name, _originals[name]))
+
+
+def _routes(backend):
+    """Returns the functions that answer ee.data calls with a backend."""
+    compute_value = _live_compute_value
+    if backend.name != "live":
+        compute_value = backend.compute_value
+
+    def replay_map_id(params):
+        image = params["image"]
+        vis_params = {k: v for k, v in params.items() if k != "image"}
+        url = backend.tile_url(image, vis_params)
+        return {
+            "mapid": request_key(image, vis_params),
+            "token": "",
+            "tile_fetcher": ee.data.TileFetcher(url),
+        }
+
+    get_map_id = _live_get_map_id
+    if backend.name == "replay":
+        get_map_id = replay_map_id
+    return {
+        "computeValue": scheduler.scheduled(compute_value, session_id),
+        "getMapId": tile_cache.cached(get_map_id),
+    }
+
+
+def install(backend):
+    """Routes the ee.data calls of the current context through a backend.
+
+    The backend stays installed until the context ends, e.g., the Streamlit
+    script run, and is inherited by worker threads started with
+    scheduler.inherit(). getInfo() calls are also admitted by the process-wide
+    scheduler, on behalf of the current Streamlit session, and map ids are
+    reused from the tile cache.
+
+    Args:
+        backend (Backend): The initialized backend.
+
+    Returns:
+        contextvars.Token: The token installed() restores the previous
+            backend of the context with.
+    """
+    check_ee_internals()
+    _hook()
+    return _installed.set((backend, _routes(backend)))
+
+
+def _reset_replay():
+    if ee.data._get_state().credentials == "replay":
+        ee.Reset()
+
+
+def uninstall():
+    """Restores the ee.data functions replaced by install().
+
+    A replay session is reset, so that another backend can be initialized.
+    """
+    global _backend
+    for name, value in _originals.items():
+        setattr(ee.data, name, value)
+    _originals.clear()
+    _reset_replay()
+    _backend = None
+
+
+@contextmanager
+def installed(backend):
+    """Initializes a backend and routes the ee.data calls of a block through it.
+
+    Calls made by other threads are not affected, unless they are started with
+    scheduler.inherit(). A replay session is reset when the block ends.
+
+    Args:
+        backend (Backend): The backend.
+
+    Yields:
+        Backend: The backend.
+    """
+    token = None
+    try:
+        backend.initialize()
+        token = install(backend)
+        yield backend
+    finally:
+        if token is not None:
+            _installed.reset(token)
+        if backend.name == "replay":
+            _reset_replay()
+
+
+def from_env():
+    """Creates the backend configured by the environment variables."""
+    name = os.environ.get("EE_BACKEND", "live")
+    if name == "replay":
+        return ReplayBackend(
+            FIXTURES_DIR,
+            latency=float(os.environ.get("EE_LATENCY", 0)),
+            failure_rate=float(os.environ.get("EE_FAILURE_RATE", 0)),
+        )
+    if name == "record":
+        return RecordingBackend(FIXTURES_DIR)
+    return LiveBackend()
+
+
+def get_backend():
+    """Returns the backend of the current context, or the one of the process.
+
+    The backend of the process is created from the environment.
+    """
+    global _backend
+    current = _installed.get()
+    if current is not None:
+        return current[0]
+    if _backend is None:
+        _backend = from_env()
+    return _backend
+
+
+def initialize(token_name="EARTHENGINE_TOKEN"):
+    """Initializes Earth Engine with the backend of the process.
+
+    Pages use ee_client.initialize(), which calls this once per process and
+    installs the backend in every script run that calls it.
+
+    Args:
+        token_name (str, optional): The environment variable holding the Earth
+            Engine token, used by the live backends. Defaults to
+            "EARTHENGINE_TOKEN".
+    """
+    backend = get_backend()
+    backend.initialize(token_name)
@@ -0,0 +1,208 @@
+"""Batch the Earth Engine requests a page needs into one round trip.
+
+A page that calls getInfo() and adds Earth Engine layers one after another
+waits for each request in turn. A Batch collects them instead and returns
+futures. When the batch is sent, every value is evaluated in a single
+ee.Dictionary request, and the map ids of the tile layers are requested
+concurrently with it, so the page waits for the slowest request only.
+
+Example:
+
+    with Batch() as batch:
+        centroid = batch.value(fc.first().geometry().centroid(1))
+        layer = batch.tile_layer(fc.style(**style), {}, "Buildings")
+    Map.add_layer(layer.result())
+
+The batch is sent when the block exits, or when the result of one of its
+futures is first needed.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import ee
+import folium
+
+from .artifacts import session_id
+from .ee_backend import get_backend
+from .scheduler import inherit, slot
+
+# Requests of a batch in flight at once.
+MAX_WORKERS = 8
+
+
+class BatchFuture(Future):
+    """A future that sends its batch when its result is needed."""
+
+    def __init__(self, batch):
+        super().__init__()
+        self._batch = batch
+
+    def result(self, timeout=None):
+        if not self.done():
+            self._batch.send()
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        if not self.done():
+            self._batch.send()
+        return super().exception(timeout)
+
+
+def _set(future, func, *args):
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+
+
+def _get_info(obj):
+    return obj.getInfo()
+
+
+def _tile_url(ee_object, vis_params):
+    """Returns the tile URL format of an object, as geemap.ee_tile_layer()."""
+    from geemap.ee_tile_layers import _ee_object_to_image, _validate_vis_params
+
+    vis_params = _validate_vis_params(vis_params)
+    image = ee.Image(_ee_object_to_image(ee_object, vis_params))
+    return get_backend().tile_url(image, vis_params)
+
+
+class Batch:
+    """Collects Earth Engine requests and sends them together.
+
+    Args:
+        max_workers (int, optional): Requests in flight at once. Defaults to
+            MAX_WORKERS.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._values = []
+        self._tiles = []
+        self._session = session_id()
+
+    def value(self, obj):
+        """Adds a client-side evaluation of an object, as obj.getInfo().
+
+        Args:
+            obj (ee.ComputedObject): The object.
+
+        Returns:
+            Future: The future of the value.
+        """
+        future = BatchFuture(self)
+        with self._lock:
+            self._values.append((obj, future))
+        return future
+
+    def tile_url(self, ee_object, vis_params=None):
+        """Adds a map id request of an object.
+
+        Args:
+            ee_object (ee.Image | ee.ImageCollection | ee.FeatureCollection):
+                The object, converted to an image as geemap.ee_tile_layer()
+                does.
+            vis_params (dict, optional): The visualization parameters.
+                Defaults to None.
+
+        Returns:
+            Future: The future of the XYZ tile URL format.
+        """
+        future = BatchFuture(self)
+        with self._lock:
+            self._tiles.append((ee_object, vis_params, future))
+        return future
+
+    def tile_layer(
+        self, ee_object, vis_params=None, name="Layer untitled", shown=True, opacity=1.0
+    ):
+        """Adds a tile layer of an object, as geemap.ee_tile_layer().
+
+        Args:
+            ee_object (ee.Image | ee.ImageCollection | ee.FeatureCollection):
+                The object.
+            vis_params (dict, optional): The visualization parameters.
+                Defaults to None.
+            name (str, optional): The layer name. Defaults to "Layer untitled".
+            shown (bool, optional): Whether the layer is shown. Defaults to True.
+            opacity (float, optional): The layer opacity. Defaults to 1.0.
+
+        Returns:
+            Future: The future of the folium.TileLayer.
+        """
+        url = self.tile_url(ee_object, vis_params)
+        future = BatchFuture(self)
+
+        def done(url):
+            try:
+                layer = folium.TileLayer(
+                    tiles=url.result(),
+                    attr="Google Earth Engine",
+                    name=name,
+                    overlay=True,
+                    control=True,
+                    show=shown,
+                    opacity=opacity,
+                    max_zoom=24,
+                )
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(layer)
+
+        url.add_done_callback(done)
+        return future
+
+    def _evaluate(self, values, executor):
+        """Evaluates the values in one request, or one by one if it fails.
+
+        A failing expression fails the whole dictionary, so the values are
+        then evaluated separately and only its own future gets the error.
+        """
+        if len(values) > 1:
+            combined = ee.Dictionary({str(i): obj for i, (obj, _) in enumerate(values)})
+            try:
+                result = combined.getInfo()
+            except Exception:
+                pass
+            else:
+                for i, (_, future) in enumerate(values):
+                    future.set_result(result[str(i)])
+                return
+        evaluate = inherit(_set)
+        pending = [executor.submit(evaluate, f, _get_info, obj) for obj, f in values]
+        for future in pending:
+            future.result()
+
+    def send(self):
+        """Sends the pending requests and waits for their results."""
+        with self._lock:
+            values, self._values = self._values, []
+            tiles, self._tiles = self._tiles, []
+            if not values and not tiles:
+                return
+
+            # The batch holds one scheduler slot for all its requests, which
+            # its worker threads run within, on behalf of the batch's session.
+            width = min(self.max_workers, len(tiles) + (1 if values else 0))
+            with slot(self._session, len(values) + len(tiles), width):
+                fetch = inherit(_set, self._session)
+                with ThreadPoolExecutor(max_workers=width) as executor:
+                    pending = [
+                        executor.submit(fetch, future, _tile_url, ee_object, vis)
+                        for ee_object, vis, future in tiles
+                    ]
+                    if values:
+                        self._evaluate(values, executor)
+                    for future in pending:
+                        future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.send()
@@ -0,0 +1,264 @@
+"""Process-wide cache for Earth Engine metadata.
+
+Catalog searches, band names, date ranges and property names change rarely,
+but each lookup is a blocking round trip to Earth Engine. Results are kept in
+memory and on disk with a time-to-live, and concurrent identical lookups share
+a single request, so reruns caused by widget changes never wait on Earth
+Engine.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import ee
+
+CACHE_DIR = os.environ.get(
+    "EE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ee-metadata-cache")
+)
+TTL_SECONDS = int(os.environ.get("EE_CACHE_TTL_SECONDS", 24 * 3600))
+
+
+class MetadataCache:
+    """A TTL cache with a memory tier, a disk tier and single-flight lookups.
+
+    Values must be JSON serializable.
+
+    Args:
+        cache_dir (str, optional): Directory of the disk tier. None disables it.
+            Defaults to CACHE_DIR.
+        ttl (int, optional): Default time-to-live in seconds. Defaults to
+            TTL_SECONDS.
+        max_entries (int, optional): Maximum number of entries per tier. The
+            least recently used entries are dropped first. Defaults to None,
+            which means unbounded.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=TTL_SECONDS, max_entries=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Key -> (expiry time, value), in least recently used order.
+        self._memory = OrderedDict()
+        # Key -> Future of the lookup in flight.
+        self._inflight = {}
+        self.stats = {"memory": 0, "disk": 0, "miss": 0, "shared": 0}
+
+    def _disk_path(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _read_disk(self, key, now):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._disk_path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry["expires"] < now:
+            return None
+        if self.max_entries is not None:
+            # The modification time orders the disk tier for LRU pruning.
+            try:
+                os.utime(self._disk_path(key))
+            except OSError:
+                pass
+        return entry["expires"], entry["value"]
+
+    def _write_disk(self, key, expires, value):
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "expires": expires, "value": value}, f)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        else:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        if self.max_entries is None:
+            return
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                files = [
+                    (entry.stat().st_mtime, entry.path)
+                    for entry in entries
+                    if entry.name.endswith(".json")
+                ]
+        except OSError:
+            return
+        files.sort()
+        for _, path in files[: max(0, len(files) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, key, compute, ttl=None):
+        """Returns the cached value of a key, computing it on a miss.
+
+        Args:
+            key (str): The cache key.
+            compute (callable): Computes the value. Exceptions are not cached.
+            ttl (int, optional): Time-to-live in seconds. Defaults to the cache's
+                ttl.
+
+        Returns:
+            The value.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= now:
+                self._memory.move_to_end(key)
+                self.stats["memory"] += 1
+                return entry[1]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.stats["shared"] += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            entry = self._read_disk(key, now)
+            if entry is not None:
+                self.stats["disk"] += 1
+            else:
+                self.stats["miss"] += 1
+                value = compute()
+                expires = time.time() + (self.ttl if ttl is None else ttl)
+                self._write_disk(key, expires, value)
+                entry = (expires, value)
+            with self._lock:
+                self._memory[key] = entry
+                self._memory.move_to_end(key)
+                if self.max_entries is not None:
+                    while len(self._memory) > self.max_entries:
+                        self._memory.popitem(last=False)
+            future.set_result(entry[1])
+            return entry[1]
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key):
+        """Removes a key from both tiers.
+
+        Args:
+            key (str): The cache key.
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+
+cache = MetadataCache()
+
+
+def search_catalog(keyword):
+    """Searches the Earth Engine data catalog, like geemap.search_ee_data().
+
+    Args:
+        keyword (str): The search keyword.
+
+    Returns:
+        list: The matching datasets.
+    """
+    import geemap.foliumap as geemap
+
+    from .artifacts import session_id
+    from .scheduler import slot
+
+    def compute():
+        with slot(session_id()):
+            return geemap.search_ee_data(keyword)
+
+    keyword = " ".join(keyword.lower().split())
+    return cache.get(f"search:{keyword}", compute)
+
+
+def image_info(asset_id):
+    """Returns the band and property names of the first image of a collection.
+
+    Only the first image is read, so this is cached apart from the date range,
+    which scans the whole collection and can be slow or time out.
+
+    Args:
+        asset_id (str): The ee.ImageCollection asset id.
+
+    Returns:
+        dict: The "bands" and "properties" of the first image.
+    """
+
+    def compute():
+        first = ee.ImageCollection(asset_id).first()
+        return ee.Dictionary(
+            {"bands": first.bandNames(), "properties": first.propertyNames()}
+        ).getInfo()
+
+    return cache.get(f"image:{asset_id}", compute)
+
+
+def date_range(asset_id):
+    """Returns the date range of a collection.
+
+    Args:
+        asset_id (str): The ee.ImageCollection asset id.
+
+    Returns:
+        dict: The "start" and "end" of the collection in milliseconds since the
+            epoch.
+    """
+
+    def compute():
+        col = ee.ImageCollection(asset_id)
+        dates = col.reduceColumns(ee.Reducer.minMax(), ["system:time_start"])
+        return ee.Dictionary(
+            {"start": dates.get("min"), "end": dates.get("max")}
+        ).getInfo()
+
+    return cache.get(f"dates:{asset_id}", compute)
+
+
+def band_names(asset_id):
+    """Returns the band names of the first image of a collection.
+
+    The date range of the collection is not computed.
+
+    Args:
+        asset_id (str): The ee.ImageCollection asset id.
+
+    Returns:
+        list: The band names.
+    """
+    return image_info(asset_id)["bands"]
@@ -0,0 +1,241 @@
+"""One Earth Engine client per process, shared by every page and session.
+
+Pages call initialize() on every run. The first call loads the credentials and
+initializes the configured backend, under a lock, so concurrent sessions of a
+fresh process wait for a single initialization instead of each running their
+own. Later calls return at once.
+
+All Earth Engine HTTP traffic, ee.data calls and thumbnail downloads, goes
+through one keep-alive session whose connection pool is as large as the
+scheduler's concurrency cap, so connections are reused instead of paying a TLS
+handshake per request.
+
+OAuth tokens expire after an hour. ee refreshes them on the first request
+after expiry, which stalls that request and every request made meanwhile. A
+background thread refreshes them before they expire instead.
+
+The refresh is set with environment variables:
+
+- EE_TOKEN_REFRESH_MARGIN: seconds before expiry a token is refreshed.
+  Defaults to 300.
+- EE_TOKEN_CHECK_INTERVAL: seconds between two expiry checks. Defaults to 60.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+import ee
+import requests
+from requests.adapters import HTTPAdapter
+
+from .scheduler import MAX_CONCURRENT
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN = float(os.environ.get("EE_TOKEN_REFRESH_MARGIN", 300))
+CHECK_INTERVAL = float(os.environ.get("EE_TOKEN_CHECK_INTERVAL", 60))
+
+
+def pooled_session(pool_size=MAX_CONCURRENT):
+    """Creates a keep-alive HTTP session with a connection pool.
+
+    Args:
+        pool_size (int, optional): Connections kept open per host. Defaults to
+            MAX_CONCURRENT.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class EEClient:
+    """Initializes Earth Engine once and keeps its credentials fresh.
+
+    Args:
+        pool_size (int, optional): Connections of the HTTP session. Defaults to
+            MAX_CONCURRENT.
+        refresh_margin (float, optional): Seconds before expiry a token is
+            refreshed. Defaults to REFRESH_MARGIN.
+        check_interval (float, optional): Seconds between two expiry checks.
+            Defaults to CHECK_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        pool_size=MAX_CONCURRENT,
+        refresh_margin=REFRESH_MARGIN,
+        check_interval=CHECK_INTERVAL,
+    ):
+        self.session = pooled_session(pool_size)
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._refresher = None
+        self._metrics = {
+            "backend": None,
+            "init_seconds": None,
+            "initialized_at": None,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "token_expiry": None,
+        }
+
+    def initialize(self, token_name="EARTHENGINE_TOKEN"):
+        """Initializes Earth Engine with the configured backend, once.
+
+        The backend is installed in the calling script run, on every call, so
+        its getInfo() calls and map ids go through the scheduler and the tile
+        cache.
+
+        Args:
+            token_name (str, optional): The environment variable holding the
+                Earth Engine token, used by the live backends. Defaults to
+                "EARTHENGINE_TOKEN".
+        """
+        from . import ee_backend
+
+        if not self._initialized:
+            self._initialize(token_name)
+        ee_backend.install(ee_backend.get_backend())
+
+    def _initialize(self, token_name):
+        from . import ee_backend
+
+        with self._lock:
+            if self._initialized:
+                return
+            ee_backend.check_ee_internals()
+            backend = ee_backend.get_backend()
+            started = time.perf_counter()
+            # ee.Initialize() keeps a session it finds in its state.
+            ee.data._get_state().requests_session = self.session
+            ee_backend.initialize(token_name)
+            seconds = time.perf_counter() - started
+            self._metrics.update(
+                backend=backend.name,
+                init_seconds=round(seconds, 3),
+                initialized_at=time.time(),
+            )
+            logger.info(
+                "Initialized Earth Engine (%s backend) in %.2f seconds",
+                backend.name,
+                seconds,
+            )
+            self._initialized = True
+            if self._refresher is None and self._credentials():
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="ee-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+    def _credentials(self):
+        """Returns every copy of the OAuth credentials ee sends requests with.
+
+        ee authorizes its API resources with a copy of the credentials, without
+        their quota project, so each copy needs the refreshed token.
+        """
+        state = ee.data._get_state()
+        found = []
+        for holder in [
+            state,
+            getattr(state.cloud_api_resource, "_http", None),
+            getattr(state.cloud_api_resource_raw, "_http", None),
+        ]:
+            credentials = getattr(holder, "credentials", None)
+            if hasattr(credentials, "refresh") and hasattr(credentials, "expiry"):
+                if all(credentials is not c for c in found):
+                    found.append(credentials)
+        return found
+
+    def _expiring(self, credentials):
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        left = (credentials.expiry - now).total_seconds()
+        return left < self.refresh_margin
+
+    def refresh(self, force=False):
+        """Refreshes the OAuth token if it expires within the margin.
+
+        Args:
+            force (bool, optional): Refresh even if the token is still fresh.
+                Defaults to False.
+
+        Returns:
+            bool: Whether the token was refreshed.
+        """
+        found = self._credentials()
+        if not found or not (force or self._expiring(found[0])):
+            return False
+
+        from google.auth.transport.requests import Request
+
+        main = found[0]
+        try:
+            main.refresh(Request(self.session))
+        except Exception as e:
+            self._metrics["refresh_failures"] += 1
+            logger.warning("Refreshing the Earth Engine token failed: %s", e)
+            return False
+        for credentials in found[1:]:
+            credentials.token = main.token
+            credentials.expiry = main.expiry
+        self._metrics["refreshes"] += 1
+        self._metrics["token_expiry"] = main.expiry.isoformat() if main.expiry else None
+        logger.debug("Refreshed the Earth Engine token")
+        return True
+
+    def _refresh_loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.check_interval)
+
+    def reset(self):
+        """Uninstalls the backend, so that the next initialize() starts over."""
+        from . import ee_backend
+
+        with self._lock:
+            ee_backend.uninstall()
+            self._initialized = False
+
+    def metrics(self):
+        """Returns the initialization latency and token refresh counters.
+
+        Returns:
+            dict: The "backend" name, "init_seconds", the "initialized_at"
+                timestamp, the "refreshes" and "refresh_failures" counters and
+                the "token_expiry" of the last refresh.
+        """
+        return {"initialized": self._initialized, **self._metrics}
+
+
+client = EEClient()
+
+
+def initialize(token_name="EARTHENGINE_TOKEN"):
+    """Initializes Earth Engine for this process, once.
+
+    See EEClient.initialize() for the arguments.
+    """
+    client.initialize(token_name)
+
+
+def http_session():
+    """Returns the pooled HTTP session of the process-wide client."""
+    return client.session
+
+
+def metrics():
+    """Returns the metrics of the process-wide client."""
+    return client.metrics()
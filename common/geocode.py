@@ -0,0 +1,232 @@
+"""Location search with normalized queries, caching and a local gazetteer.
+
+Exact matches in the bundled gazetteer are listed first, followed by the
+results of geemap.geocode(), which are cached in memory and on disk. An
+ambiguous name such as "Washington" therefore finds both the state and the
+city. If the geocoding service fails, the gazetteer's exact and prefix matches
+are returned instead.
+
+The gazetteer is a Parquet table sorted by normalized name, so prefix lookups
+are a binary search. It is built with build_gazetteer() from the boundary files
+in ./data, optionally extended with a GeoNames cities dump, e.g.,
+https://download.geonames.org/export/dump/cities15000.zip.
+"""
+
+import bisect
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import namedtuple
+
+from .ee_cache import MetadataCache
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"
+)
+GAZETTEER_FILE = os.path.join(DATA_DIR, "gazetteer.parquet")
+CACHE_DIR = os.environ.get(
+    "GEOCODE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "geocode-cache")
+)
+
+# Geocoding results rarely change, so they are kept for 30 days.
+cache = MetadataCache(CACHE_DIR, ttl=30 * 24 * 3600, max_entries=2000)
+
+Place = namedtuple("Place", ["address", "lat", "lng"])
+
+
+def normalize(query):
+    """Normalizes a place name for lookups.
+
+    Accents, punctuation, case and repeated whitespace are removed, so that
+    "Knoxville, TN" and "knoxville  tn" are the same query.
+
+    Args:
+        query (str): The place name.
+
+    Returns:
+        str: The normalized name.
+    """
+    query = unicodedata.normalize("NFKD", query)
+    query = "".join(c for c in query if not unicodedata.combining(c))
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class Gazetteer:
+    """Place names with a sorted prefix index.
+
+    Args:
+        path (str, optional): The Parquet file. Defaults to GAZETTEER_FILE.
+    """
+
+    def __init__(self, path=GAZETTEER_FILE):
+        import pandas as pd
+
+        df = pd.read_parquet(path).sort_values(["key", "rank"])
+        self.keys = df["key"].tolist()
+        self.places = [
+            Place(row.name, row.lat, row.lng)
+            for row in df[["name", "lat", "lng"]].itertuples(index=False)
+        ]
+        self.ranks = df["rank"].tolist()
+
+    def lookup(self, query):
+        """Returns the places whose normalized name equals the query."""
+        key = normalize(query)
+        start = bisect.bisect_left(self.keys, key)
+        stop = bisect.bisect_right(self.keys, key)
+        return self.places[start:stop]
+
+    def suggest(self, prefix, limit=10):
+        """Returns up to limit places whose normalized name starts with prefix."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        start = bisect.bisect_left(self.keys, key)
+        # Every name starting with key sorts before key followed by U+FFFF.
+        stop = bisect.bisect_left(self.keys, key + "\uffff", lo=start)
+        matches = sorted(range(start, stop), key=lambda i: self.ranks[i])
+        return [self.places[i] for i in matches[:limit]]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def gazetteer():
+    """Returns the bundled gazetteer, loaded on first use, or None if missing."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None and os.path.exists(GAZETTEER_FILE):
+            _gazetteer = Gazetteer(GAZETTEER_FILE)
+    return _gazetteer
+
+
+def _search(query, max_rows):
+    import geemap.foliumap as geemap
+
+    locations = geemap.geocode(query, max_rows=max_rows) or []
+    return [[g.address, g.lat, g.lng] for g in locations]
+
+
+def geocode(query, max_rows=10):
+    """Searches for a place by name or address.
+
+    Args:
+        query (str): The place name or address.
+        max_rows (int, optional): Maximum number of results. Defaults to 10.
+
+    Returns:
+        list: The matching places, with address, lat and lng attributes, exact
+            gazetteer matches first.
+    """
+    key = normalize(query)
+    if not key:
+        return []
+
+    local = gazetteer()
+    places = [] if local is None else local.lookup(key)
+
+    try:
+        rows = cache.get(f"{key}:{max_rows}", lambda: _search(query, max_rows))
+    except Exception:
+        # The geocoding service is unavailable.
+        rows = []
+    if not rows and local is not None:
+        rows = local.suggest(key, max_rows)
+
+    seen = {normalize(place.address) for place in places}
+    for row in rows:
+        place = Place(*row)
+        if normalize(place.address) not in seen:
+            seen.add(normalize(place.address))
+            places.append(place)
+    return places[:max_rows]
+
+
+def build_gazetteer(out_path=GAZETTEER_FILE, geonames=None, min_population=15000):
+    """Builds the gazetteer from the boundary files in ./data and GeoNames.
+
+    Args:
+        out_path (str, optional): The output Parquet file. Defaults to
+            GAZETTEER_FILE.
+        geonames (str, optional): A GeoNames cities dump, e.g.,
+            cities15000.txt. Defaults to None.
+        min_population (int, optional): Minimum population of GeoNames cities.
+            Defaults to 15000.
+
+    Returns:
+        pd.DataFrame: The gazetteer.
+    """
+    import geopandas as gpd
+    import pandas as pd
+
+    def boundaries(file_name, label, rank):
+        gdf = gpd.read_file(os.path.join(DATA_DIR, file_name))
+        points = gdf.geometry.representative_point()
+        return pd.DataFrame(
+            {
+                "name": gdf.apply(label, axis=1),
+                "lat": points.y.round(5),
+                "lng": points.x.round(5),
+                "rank": rank,
+            }
+        )
+
+    states = gpd.read_file(os.path.join(DATA_DIR, "us_states.geojson"))
+    abbreviations = dict(zip(states["STATEFP"], states["STUSPS"]))
+
+    frames = [
+        boundaries("us_states.geojson", lambda r: f"{r['NAME']}, United States", 0),
+        boundaries("us_states.geojson", lambda r: r["NAME"], 0),
+        boundaries("us_metro_areas.geojson", lambda r: r["NAME"], 1),
+        boundaries(
+            "us_counties.geojson",
+            lambda r: f"{r['NAME']} County, {abbreviations.get(r['STATEFP'], '')}",
+            2,
+        ),
+    ]
+
+    if geonames is not None:
+        # See https://download.geonames.org/export/dump/readme.txt for columns.
+        cities = pd.read_csv(
+            geonames,
+            sep="\t",
+            header=None,
+            usecols=[1, 4, 5, 8, 14],
+            names=["name", "lat", "lng", "country", "population"],
+            keep_default_na=False,
+            quoting=3,
+        )
+        cities = cities[cities["population"] >= min_population]
+        cities = cities.sort_values("population", ascending=False)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "name": cities["name"] + ", " + cities["country"],
+                    "lat": cities["lat"],
+                    "lng": cities["lng"],
+                    "rank": 1,
+                }
+            )
+        )
+
+    df = pd.concat(frames, ignore_index=True)
+    df["key"] = df["name"].map(normalize)
+    df = df.drop_duplicates("name").sort_values(["key", "rank"])
+    df = df[["key", "name", "lat", "lng", "rank"]].reset_index(drop=True)
+    df.to_parquet(out_path, index=False, compression="zstd")
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the geocoding gazetteer.")
+    parser.add_argument("--geonames", help="A GeoNames cities dump (cities15000.txt)")
+    parser.add_argument("--out", default=GAZETTEER_FILE)
+    args = parser.parse_args()
+    df = build_gazetteer(args.out, args.geonames)
+    print(f"Wrote {len(df)} places to {args.out}")
@@ -0,0 +1,154 @@
+"""Render the static part of a folium map once and show it with per-run layers.
+
+st_folium() renders the map it is given on every call, and rendering changes
+the map: its id is renamed and its controls and header are added again. A map
+shared across runs and sessions would have to be copied on every run. Instead,
+the static map is rendered once into the strings st_folium() sends to the
+browser, and each run renders only its own feature group, with the same
+streamlit_folium helpers st_folium() uses.
+"""
+
+import folium
+import streamlit as st
+import streamlit_folium as sf
+
+# The values the map component returns before the user interacts with it.
+DEFAULTS = [
+    "last_clicked",
+    "last_object_clicked",
+    "last_object_clicked_count",
+    "last_object_clicked_tooltip",
+    "last_object_clicked_popup",
+    "all_drawings",
+    "last_active_drawing",
+    "last_circle_radius",
+    "last_circle_polygon",
+    "selected_layers",
+    "selected_tags",
+    "last_geocoder_result",
+]
+
+
+def _walk(element):
+    yield element
+    for child in getattr(element, "_children", {}).values():
+        yield from _walk(child)
+
+
+def _bounds(bounds):
+    (south, west), (north, east) = bounds
+    return {
+        "_southWest": {"lat": south, "lng": west},
+        "_northEast": {"lat": north, "lng": east},
+    }
+
+
+def render_shell(m):
+    """Renders a map into the arguments of the st_folium() component.
+
+    Args:
+        m (folium.Map): The map. Rendering changes it, so it must not be
+            rendered or shown again.
+
+    Returns:
+        dict: The "script", "header", "html", "id", "css_links", "js_links",
+            "bounds" and "zoom" of the map.
+    """
+    m.render()
+    # _get_map_string() renames the map, so the HTML and header come first.
+    html = sf._get_html(m)
+    header = sf._get_header(m)
+    script = sf._get_map_string(m)
+
+    css_links, js_links = [], []
+    for element in _walk(m):
+        css_links.extend(href for _, href in getattr(element, "default_css", []))
+        js_links.extend(src for _, src in getattr(element, "default_js", []))
+
+    return {
+        "script": script,
+        "header": header,
+        "html": html,
+        "id": sf.get_full_id(m),
+        "css_links": list(dict.fromkeys(css_links)),
+        "js_links": list(dict.fromkeys(js_links)),
+        "bounds": _bounds(m.get_bounds()),
+        "zoom": m.options.get("zoom"),
+    }
+
+
+def show_shell(
+    shell,
+    layers=None,
+    key=None,
+    height=700,
+    returned_objects=None,
+    center=None,
+    zoom=None,
+):
+    """Shows a rendered map with the layers of this run.
+
+    The map fills the width of its container, like st_folium() with
+    use_container_width=True.
+
+    Args:
+        shell (dict): The map rendered by render_shell().
+        layers (folium.FeatureGroup | list, optional): The feature groups of
+            this run. Defaults to None.
+        key (str, optional): The key of the component. Its value is kept in
+            st.session_state under this key. Defaults to None.
+        height (int, optional): The height of the map in pixels. Defaults to
+            700.
+        returned_objects (list, optional): The values sent back to the script,
+            see st_folium(). Defaults to None, which returns all of them.
+        center (tuple, optional): The (lat, lng) to center the map on. Defaults
+            to None.
+        zoom (int, optional): The zoom level to set. Defaults to None.
+
+    Returns:
+        dict: The values returned by the map.
+    """
+    defaults = {name: None for name in DEFAULTS}
+    defaults["bounds"] = shell["bounds"]
+    defaults["zoom"] = shell["zoom"]
+    if returned_objects is not None:
+        defaults = {k: v for k, v in defaults.items() if k in returned_objects}
+
+    feature_group = None
+    if layers is not None:
+        if isinstance(layers, folium.FeatureGroup):
+            layers = [layers]
+        # Each feature group is rendered against an empty map, whose id is
+        # replaced by the id of the shell, like st_folium() does.
+        feature_group = "".join(
+            sf._get_feature_group_string(layer, map=folium.Map(tiles=None), idx=idx)
+            for idx, layer in enumerate(layers)
+        )
+
+    hash_key = sf.generate_js_hash(shell["script"], key, False)
+
+    def on_change():
+        if key is not None:
+            st.session_state[key] = st.session_state.get(hash_key, {})
+
+    return sf._component_func(
+        script=shell["script"],
+        header=shell["header"],
+        html=shell["html"],
+        id=shell["id"],
+        key=hash_key,
+        height=height,
+        width=None,
+        returned_objects=returned_objects,
+        default=defaults,
+        zoom=zoom,
+        center=center,
+        feature_group=feature_group,
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=shell["css_links"],
+        js_links=shell["js_links"],
+        on_change=on_change,
+        wrap_longitude=False,
+    )
@@ -0,0 +1,371 @@
+"""Fair scheduling of Earth Engine work across sessions.
+
+Every Earth Engine-heavy call goes through one process-wide scheduler:
+timelapse renders, catalog searches and getInfo() calls. The scheduler
+
+- rate limits each session with a token bucket, so one session cannot flood
+  the queue with requests,
+- orders queued work by weighted fair queuing on its estimated cost, so a
+  session that submits expensive timelapses gets the same share of Earth
+  Engine time as a session that submits cheap ones, instead of all of it,
+- caps the number of Earth Engine requests in flight at once to the project's
+  concurrent request quota.
+
+Each piece of work holds a width of the cap while it runs: one request for a
+getInfo() call, one per fetch worker for a timelapse that downloads its frames
+concurrently. Calls made while the thread already holds a slot, e.g., the
+getInfo() calls inside a geemap timelapse function, run within that slot.
+
+Worker threads have no Streamlit session of their own. Functions submitted to
+them are wrapped with inherit(), which runs them on behalf of the submitting
+thread's session and within its slot.
+
+The limits are set with environment variables:
+
+- EE_MAX_CONCURRENT: concurrent Earth Engine requests. Defaults to 40.
+- EE_SESSION_RATE: calls per second each session may start. Defaults to 2.
+- EE_SESSION_BURST: calls a session may start at once. Defaults to 20.
+- EE_METRICS_INTERVAL: minimum seconds between two logs of the queue depth and
+  wait time percentiles. Defaults to 60.
+"""
+
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT = int(os.environ.get("EE_MAX_CONCURRENT", 40))
+SESSION_RATE = float(os.environ.get("EE_SESSION_RATE", 2))
+SESSION_BURST = float(os.environ.get("EE_SESSION_BURST", 20))
+METRICS_INTERVAL = float(os.environ.get("EE_METRICS_INTERVAL", 60))
+
+# Seconds between two checks of a waiting job's cancel token.
+POLL_INTERVAL = 0.5
+# Number of recent waits kept for the wait-time percentiles.
+WAIT_SAMPLES = 1000
+# Buckets are pruned once there are more sessions than this.
+MAX_BUCKETS = 256
+
+
+class TokenBucket:
+    """A token bucket that refills continuously.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (float): Maximum number of tokens.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, tokens=1.0):
+        """Reserves tokens, going into debt if the bucket holds too few.
+
+        Args:
+            tokens (float, optional): Number of tokens. Defaults to 1.
+
+        Returns:
+            float: Seconds until the reserved tokens are covered, 0 if they
+                were available.
+        """
+        self._refill(time.monotonic())
+        self.tokens -= min(tokens, self.burst)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def full(self):
+        """Returns whether the bucket has refilled completely."""
+        self._refill(time.monotonic())
+        return self.tokens >= self.burst
+
+
+class FairScheduler:
+    """Admits Earth Engine work by session, in weighted fair order.
+
+    Queued work is ordered by start-time fair queuing: each job gets a start
+    tag, the later of the scheduler's virtual time and the finish tag of the
+    session's previous job, and a finish tag, its start tag plus its cost. The
+    job with the lowest start tag runs next, so a session's share of the queue
+    shrinks with the cost of the work it has already been given.
+
+    Args:
+        max_concurrent (int, optional): Earth Engine requests in flight at once.
+            Defaults to MAX_CONCURRENT.
+        rate (float, optional): Calls per second each session may start.
+            Defaults to SESSION_RATE.
+        burst (float, optional): Calls a session may start at once. Defaults
+            to SESSION_BURST.
+        metrics_interval (float, optional): Minimum seconds between two logs
+            of metrics(). Defaults to METRICS_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=MAX_CONCURRENT,
+        rate=SESSION_RATE,
+        burst=SESSION_BURST,
+        metrics_interval=METRICS_INTERVAL,
+    ):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.metrics_interval = metrics_interval
+
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._seq = itertools.count()
+        # Heap of [start tag, sequence, width, session] of the queued jobs.
+        self._queue = []
+        self._virtual = 0.0
+        # Session -> finish tag of its latest job.
+        self._finish = {}
+        # Session -> TokenBucket.
+        self._buckets = {}
+        self._running = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._counters = {"admitted": 0, "throttled": 0, "cancelled": 0}
+        self._last_log = time.monotonic()
+
+    def _throttle(self, session, cancel):
+        with self._cond:
+            bucket = self._buckets.get(session)
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._buckets = {
+                        s: b for s, b in self._buckets.items() if not b.full()
+                    }
+                bucket = self._buckets[session] = TokenBucket(self.rate, self.burst)
+            delay = bucket.take()
+            if delay > 0:
+                self._counters["throttled"] += 1
+        if delay > 0:
+            logger.debug("Throttling session %s for %.1f seconds", session, delay)
+            self._sleep(delay, cancel)
+
+    def _sleep(self, seconds, cancel):
+        if cancel is None:
+            time.sleep(seconds)
+            return
+        deadline = time.monotonic() + seconds
+        while not cancel.wait(
+            max(0.0, min(POLL_INTERVAL, deadline - time.monotonic()))
+        ):
+            if time.monotonic() >= deadline:
+                return
+        cancel.check()
+
+    def _acquire(self, session, cost, width, cancel):
+        width = max(1, min(int(width), self.max_concurrent))
+        queued = time.monotonic()
+        with self._cond:
+            start = max(self._virtual, self._finish.get(session, 0.0))
+            self._finish[session] = start + max(cost, 0.0)
+            ticket = [start, next(self._seq), width, session]
+            heapq.heappush(self._queue, ticket)
+            try:
+                while not (
+                    self._queue[0] is ticket
+                    and self._running + width <= self.max_concurrent
+                ):
+                    self._cond.wait(POLL_INTERVAL if cancel is not None else None)
+                    if cancel is not None:
+                        cancel.check()
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._counters["cancelled"] += 1
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self._running += width
+            self._virtual = start
+            self._counters["admitted"] += 1
+            wait = time.monotonic() - queued
+            self._waits.append(wait)
+            # The next job in line may fit in the remaining width.
+            self._cond.notify_all()
+        if wait > 1:
+            logger.info(
+                "Session %s waited %.1f seconds for Earth Engine", session, wait
+            )
+        self._maybe_log()
+        return width
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        with self._cond:
+            if now - self._last_log < self.metrics_interval:
+                return
+            self._last_log = now
+        logger.info("Earth Engine scheduler: %s", self.metrics())
+
+    def _release(self, width):
+        with self._cond:
+            self._running -= width
+            # Sessions whose work is all behind the virtual time start afresh.
+            self._finish = {s: f for s, f in self._finish.items() if f > self._virtual}
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, session=None, cost=1.0, width=1, cancel=None):
+        """Runs a block once the scheduler admits it.
+
+        Args:
+            session (str, optional): The session the work is done for. Defaults
+                to None, which uses the session bound by inherit(). Work of
+                unknown sessions shares one bucket.
+            cost (float, optional): The estimated cost, in seconds of Earth
+                Engine time. Defaults to 1.
+            width (int, optional): Earth Engine requests the block keeps in
+                flight at once. Defaults to 1.
+            cancel (CancelToken, optional): Stops waiting and raises its
+                Cancelled exception when the job is cancelled. Defaults to None.
+
+        Yields:
+            None
+        """
+        if getattr(self._local, "held", False):
+            yield
+            return
+
+        if session is None:
+            session = getattr(self._local, "session", None)
+        self._throttle(session, cancel)
+        width = self._acquire(session, cost, width, cancel)
+        previous = getattr(self._local, "session", None)
+        self._local.held = True
+        self._local.session = session
+        try:
+            yield
+        finally:
+            self._local.held = False
+            self._local.session = previous
+            self._release(width)
+
+    def scheduled(self, func, session=None, cost=1.0):
+        """Wraps a function so that each call runs in a slot.
+
+        Args:
+            func (callable): The function.
+            session (callable, optional): Returns the session of the current
+                call. Defaults to None.
+            cost (float, optional): The estimated cost of a call. Defaults to 1.
+
+        Returns:
+            callable: The wrapped function.
+        """
+
+        def wrapper(*args, **kwargs):
+            with self.slot(session() if session else None, cost):
+                return func(*args, **kwargs)
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def inherit(self, func, session=None):
+        """Wraps a function the current thread submits to a worker thread.
+
+        The worker runs it on behalf of the session, and within the current
+        thread's slot if it holds one, so its scheduled calls are neither
+        counted twice nor pooled with the calls of unknown sessions. It also
+        runs in a copy of the current thread's context variables, e.g., the
+        Earth Engine backend installed in it.
+
+        Args:
+            func (callable): The function.
+            session (str, optional): The session. Defaults to None, which uses
+                the session of the current thread's slot.
+
+        Returns:
+            callable: The wrapped function.
+        """
+        held = getattr(self._local, "held", False)
+        if session is None:
+            session = getattr(self._local, "session", None)
+        context = contextvars.copy_context()
+
+        def wrapper(*args, **kwargs):
+            previous = (
+                getattr(self._local, "held", False),
+                getattr(self._local, "session", None),
+            )
+            self._local.held, self._local.session = held, session
+            try:
+                # A context can only be entered by one thread at a time.
+                return context.copy().run(func, *args, **kwargs)
+            finally:
+                self._local.held, self._local.session = previous
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def metrics(self):
+        """Returns the queue depth, the requests in flight and wait times.
+
+        Returns:
+            dict: The number of queued jobs, overall and per session, the width
+                in use, the 50th and 95th percentile and maximum of recent waits
+                in seconds, and the admitted, throttled and cancelled counters.
+        """
+        with self._cond:
+            queued = {}
+            for _, _, _, session in self._queue:
+                queued[session] = queued.get(session, 0) + 1
+            waits = sorted(self._waits)
+            counters = dict(self._counters)
+            running = self._running
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3)
+
+        return {
+            "queued": sum(queued.values()),
+            "queued_by_session": queued,
+            "running": running,
+            "max_concurrent": self.max_concurrent,
+            "wait_p50": percentile(0.5),
+            "wait_p95": percentile(0.95),
+            "wait_max": round(waits[-1], 3) if waits else 0.0,
+            **counters,
+        }
+
+
+scheduler = FairScheduler()
+
+
+def slot(session=None, cost=1.0, width=1, cancel=None):
+    """Runs a block in a slot of the process-wide scheduler.
+
+    See FairScheduler.slot() for the arguments.
+    """
+    return scheduler.slot(session, cost, width, cancel)
+
+
+def inherit(func, session=None):
+    """Wraps a function for a worker thread of the process-wide scheduler.
+
+    See FairScheduler.inherit() for the arguments.
+    """
+    return scheduler.inherit(func, session)
+
+
+def metrics():
+    """Returns the metrics of the process-wide scheduler."""
+    return scheduler.metrics()
@@ -0,0 +1,127 @@
+"""Contrast stretch of an ImageCollection from sampled pixel statistics.
+
+Percentiles of each band are computed over pixels sampled at random from a few
+images of the collection in the ROI and date range, in a single request. They
+are kept in the metadata cache per asset, bands, ROI and date range, so a
+rerun or a second render of the same request doesn't wait on Earth Engine.
+"""
+
+import hashlib
+import math
+
+import ee
+
+from .ee_cache import cache
+
+# Percentiles used for min, gamma and max.
+PERCENTILES = [2, 50, 98]
+# Images sampled from the collection.
+SAMPLE_IMAGES = 12
+# Pixels sampled from each image.
+SAMPLE_PIXELS = 2000
+# Bounds of the fitted gamma.
+MIN_GAMMA = 0.5
+MAX_GAMMA = 2.5
+
+
+def _roi_key(roi):
+    return hashlib.sha256(roi.serialize().encode()).hexdigest()[:16]
+
+
+def _round(value):
+    return float(f"{value:.4g}")
+
+
+def band_percentiles(asset_id, bands, roi, start_date, end_date):
+    """Returns percentiles of each band over the ROI and date range.
+
+    Args:
+        asset_id (str): The ee.ImageCollection asset id.
+        bands (list): The band names.
+        roi (ee.Geometry): The region of interest.
+        start_date (str): Start date, e.g., "2020-01-01".
+        end_date (str): End date.
+
+    Returns:
+        dict: Band name -> {"p2": ..., "p50": ..., "p98": ...}.
+    """
+    start_date, end_date = str(start_date), str(end_date)
+
+    def compute():
+        col = (
+            ee.ImageCollection(asset_id)
+            .filterDate(start_date, end_date)
+            .filterBounds(roi)
+            .select(bands)
+        )
+        sample = col.randomColumn("stretch", 0).sort("stretch").limit(SAMPLE_IMAGES)
+        points = sample.map(
+            lambda img: img.sample(
+                region=roi,
+                numPixels=SAMPLE_PIXELS,
+                seed=0,
+                tileScale=4,
+                dropNulls=True,
+            )
+        ).flatten()
+        reducer = ee.Reducer.percentile(PERCENTILES)
+        return ee.Dictionary.fromLists(
+            bands, [points.reduceColumns(reducer, [band]) for band in bands]
+        ).getInfo()
+
+    key = (
+        f"stretch:{asset_id}:{','.join(bands)}:{_roi_key(roi)}:{start_date}:{end_date}"
+    )
+    return cache.get(key, compute)
+
+
+def stretch_vis_params(stats, bands):
+    """Creates visualization parameters from band percentiles.
+
+    The 2nd and 98th percentiles become min and max. For RGB composites, the
+    gamma of each band maps its median to mid-gray.
+
+    Args:
+        stats (dict): The percentiles returned by band_percentiles().
+        bands (list): The band names.
+
+    Returns:
+        dict: The visualization parameters.
+    """
+    lows, highs, gammas = [], [], []
+    for band in bands:
+        values = stats.get(band) or {}
+        low, mid, high = (values.get(f"p{p}") for p in PERCENTILES)
+        if low is None or high is None:
+            raise ValueError(f"No valid pixels of band {band} in the ROI.")
+        if high <= low:
+            high = low + 1
+        lows.append(_round(low))
+        highs.append(_round(high))
+
+        if mid is None:
+            mid = (low + high) / 2
+        position = min(max((mid - low) / (high - low), 0.01), 0.99)
+        gamma = math.log(position) / math.log(0.5)
+        gammas.append(round(min(max(gamma, MIN_GAMMA), MAX_GAMMA), 2))
+
+    if len(bands) == 1:
+        return {"bands": bands, "min": lows[0], "max": highs[0]}
+    return {"bands": bands, "min": lows, "max": highs, "gamma": gammas}
+
+
+def auto_stretch(asset_id, bands, roi, start_date, end_date):
+    """Computes the visualization parameters of a timelapse from the data.
+
+    Args:
+        asset_id (str): The ee.ImageCollection asset id.
+        bands (list): One or three band names.
+        roi (ee.Geometry): The region of interest.
+        start_date (str): Start date, e.g., "2020-01-01".
+        end_date (str): End date.
+
+    Returns:
+        dict: The visualization parameters, with min, max and, for RGB, gamma.
+    """
+    stats = band_percentiles(asset_id, bands, roi, start_date, end_date)
+    return stretch_vis_params(stats, bands)
@@ -0,0 +1,81 @@
+"""Process-wide cache for Earth Engine map ids.
+
+geemap's addLayer() and ee_tile_layer() ask Earth Engine for a new map id each
+time, which the map pages do for every layer on every rerun. A map id depends
+only on the visualized image expression and the request parameters, and its
+tile URL stays valid for a while for every user, so map ids are cached by a
+hash of both, with a time-to-live and single-flight lookups.
+
+The cache is set with environment variables:
+
+- EE_TILE_TTL_SECONDS: seconds a map id is reused. Defaults to 3600.
+- EE_TILE_CACHE_SIZE: maximum number of cached map ids. Defaults to 1024.
+"""
+
+import hashlib
+import json
+import os
+
+import ee
+
+from .ee_cache import MetadataCache
+
+TTL_SECONDS = int(os.environ.get("EE_TILE_TTL_SECONDS", 3600))
+MAX_ENTRIES = int(os.environ.get("EE_TILE_CACHE_SIZE", 1024))
+
+cache = MetadataCache(cache_dir=None, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES)
+
+
+def _encode(value):
+    if isinstance(value, ee.ComputedObject):
+        return value.serialize()
+    return str(value)
+
+
+def map_id_key(params):
+    """Returns the cache key of an ee.data.getMapId() request.
+
+    Args:
+        params (dict): The request, with the visualized "image" and the
+            remaining visualization parameters.
+
+    Returns:
+        str: The key.
+    """
+    payload = params["image"].serialize()
+    rest = {k: v for k, v in params.items() if k != "image"}
+    payload += json.dumps(rest, sort_keys=True, default=_encode)
+    return f"tiles:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+def cached(get_map_id):
+    """Wraps ee.data.getMapId() so that map ids are reused within the TTL.
+
+    Args:
+        get_map_id (callable): The function to wrap.
+
+    Returns:
+        callable: The wrapped function.
+    """
+
+    def compute(params):
+        result = get_map_id(params)
+        return {
+            "mapid": result["mapid"],
+            "token": result["token"],
+            "url_format": result["tile_fetcher"].url_format,
+        }
+
+    def wrapper(params):
+        entry = cache.get(map_id_key(params), lambda: compute(params))
+        # Callers add to the returned dictionary, so each gets its own.
+        return {
+            "mapid": entry["mapid"],
+            "token": entry["token"],
+            "tile_fetcher": ee.data.TileFetcher(
+                entry["url_format"], map_name=entry["mapid"]
+            ),
+        }
+
+    wrapper.__wrapped__ = get_map_id
+    return wrapper
@@ -2,8 +2,12 @@ import ee
 import json
 import streamlit as st
 import geemap.foliumap as geemap
+from common import ee_client
+from common.ee_batch import Batch
+from common.ee_cache import search_catalog
 
 st.set_page_config(layout="wide")
+ee_client.initialize()
 
 st.sidebar.info("""
     - Web App URL: <https://streamlit.gishub.org>
@@ -46,6 +50,11 @@ def nlcd():
         add_legend = st.checkbox("Show legend")
 
     if selected_year:
+        # The map ids of all years are requested together, and addLayer()
+        # reuses them from the tile cache.
+        with Batch() as batch:
+            for year in selected_year:
+                batch.tile_url(getNLCD(year), {})
         for year in selected_year:
             Map.addLayer(getNLCD(year), {}, "NLCD " + year)
 
@@ -78,7 +87,7 @@ def search_data():
     with col2:
         keyword = st.text_input("Enter a keyword to search (e.g., elevation)", "")
         if keyword:
-            ee_assets = geemap.search_ee_data(keyword)
+            ee_assets = search_catalog(keyword)
             asset_titles = [x["title"] for x in ee_assets]
             asset_types = [x["type"] for x in ee_assets]
 
@@ -2,6 +2,8 @@ import datetime
 import ee
 import streamlit as st
 import geemap.foliumap as geemap
+from common import ee_client
+from common.ee_batch import Batch
 
 st.set_page_config(layout="wide")
 
@@ -19,6 +21,7 @@ st.title("Comparing Global Land Cover Maps")
 
 col1, col2 = st.columns([4, 1])
 
+ee_client.initialize()
 Map = geemap.Map()
 Map.add_basemap("ESA WorldCover 2020 S2 FCC")
 Map.add_basemap("ESA WorldCover 2020 S2 TCC")
@@ -74,19 +77,21 @@ with col2:
     dw = geemap.dynamic_world(region, start_date, end_date, return_type="hillshade")
 
     layers = {
-        "Dynamic World": geemap.ee_tile_layer(dw, {}, "Dynamic World Land Cover"),
-        "ESA Land Cover": geemap.ee_tile_layer(esa, esa_vis, "ESA Land Cover"),
-        "ESRI Land Cover": geemap.ee_tile_layer(esri, esri_vis, "ESRI Land Cover"),
+        "Dynamic World": (dw, {}, "Dynamic World Land Cover"),
+        "ESA Land Cover": (esa, esa_vis, "ESA Land Cover"),
+        "ESRI Land Cover": (esri, esri_vis, "ESRI Land Cover"),
     }
 
     options = list(layers.keys())
     left = st.selectbox("Select a left layer", options, index=1)
     right = st.selectbox("Select a right layer", options, index=0)
 
-    left_layer = layers[left]
-    right_layer = layers[right]
+    # Only the two selected layers are requested, at the same time.
+    with Batch() as batch:
+        left_layer = batch.tile_layer(*layers[left])
+        right_layer = left_layer if right == left else batch.tile_layer(*layers[right])
 
-    Map.split_map(left_layer, right_layer)
+    Map.split_map(left_layer.result(), right_layer.result())
 
     legend = st.selectbox("Select a legend", options, index=options.index(right))
     if legend == "Dynamic World":
@@ -2,14 +2,12 @@ import ee
 import geemap.foliumap as geemap
 import geopandas as gpd
 import streamlit as st
+from common import ee_client
+from common.ee_batch import Batch
 
 st.set_page_config(layout="wide")
 
 
-def ee_authenticate(token_name="EARTHENGINE_TOKEN"):
-    geemap.ee_initialize(token_name=token_name)
-
-
 st.sidebar.info("""
     - Web App URL: <https://streamlit.gishub.org>
     - GitHub repository: <https://github.com/opengeos/streamlit-geospatial>
@@ -50,6 +48,7 @@ state_names = states_gdf["name"].values.tolist()
 
 basemaps = list(geemap.basemaps)
 
+ee_client.initialize()
 Map = geemap.Map()
 
 with col2:
@@ -90,14 +89,23 @@ with col2:
 
     split = st.checkbox("Split-panel map")
 
+    # The map id of the layer and the map center are requested together. The
+    # layer is then added by geemap, which reuses the map id from the tile
+    # cache.
+    styled = fc.style(**style)
+    with Batch() as batch:
+        batch.tile_url(styled, {})
+        centroid = batch.value(fc.first().geometry().centroid(1))
+
     if split:
-        left = geemap.ee_tile_layer(fc.style(**style), {}, "Left")
+        left = geemap.ee_tile_layer(styled, {}, "Left")
         right = left
         Map.split_map(left, right)
     else:
-        Map.addLayer(fc.style(**style), {}, layer_name)
+        Map.addLayer(styled, {}, layer_name)
 
-    Map.centerObject(fc.first(), zoom=16)
+    lon, lat = centroid.result()["coordinates"]
+    Map.set_center(lon, lat, 16)
 
     with st.expander("Data Sources"):
         st.info("""
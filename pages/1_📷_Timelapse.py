@@ -1,24 +1,45 @@
 import ee
 import json
+import logging
+import math
 import os
+import time
 import warnings
 import datetime
-import fiona
 import geopandas as gpd
+from contextlib import contextmanager
 import folium
 import streamlit as st
 import geemap.colormaps as cm
 import geemap.foliumap as geemap
 from datetime import date
-from shapely.geometry import Polygon
+from shapely.geometry import shape
+from common import ee_client
+from common.artifacts import (
+    artifact_path,
+    artifact_url,
+    is_active_session,
+    session_id,
+    show,
+)
+from common.ee_cache import band_names, date_range, search_catalog
+from common.geocode import geocode
+from common.map_shell import render_shell, show_shell
+from common.scheduler import metrics as scheduler_metrics, slot
+from common.stretch import auto_stretch
+from timelapse import format_report, preview_strip
+from timelapse.budget import MAX_OUTPUT_MB
+from timelapse.estimate import admit, estimate_cost, record_cost
+from timelapse.jobs import Cancelled, job
+from timelapse.prerender import prerendered
+from timelapse.render import fire_path, render_timelapse, request_width
+from timelapse.roi import read_roi, simplify_roi
+from timelapse.samples import goes_rois, landsat_rois, modis_rois, ocean_rois
 
 st.set_page_config(layout="wide")
 warnings.filterwarnings("ignore")
 
-
-@st.cache_data
-def ee_authenticate(token_name="EARTHENGINE_TOKEN"):
-    geemap.ee_initialize(token_name=token_name)
+logger = logging.getLogger(__name__)
 
 
 st.sidebar.info("""
@@ -31,197 +52,151 @@ st.sidebar.info("""
     Qiusheng Wu at [wetlands.io](https://wetlands.io) | [GitHub](https://github.com/giswqs) | [Twitter](https://twitter.com/giswqs) | [YouTube](https://youtube.com/@giswqs) | [LinkedIn](https://www.linkedin.com/in/giswqs)
     """)
 
-goes_rois = {
-    "Creek Fire, CA (2020-09-05)": {
-        "region": Polygon(
-            [
-                [-121.003418, 36.848857],
-                [-121.003418, 39.049052],
-                [-117.905273, 39.049052],
-                [-117.905273, 36.848857],
-                [-121.003418, 36.848857],
-            ]
-        ),
-        "start_time": "2020-09-05T15:00:00",
-        "end_time": "2020-09-06T02:00:00",
-    },
-    "Bomb Cyclone (2021-10-24)": {
-        "region": Polygon(
-            [
-                [-159.5954, 60.4088],
-                [-159.5954, 24.5178],
-                [-114.2438, 24.5178],
-                [-114.2438, 60.4088],
-            ]
-        ),
-        "start_time": "2021-10-24T14:00:00",
-        "end_time": "2021-10-25T01:00:00",
-    },
-    "Hunga Tonga Volcanic Eruption (2022-01-15)": {
-        "region": Polygon(
-            [
-                [-192.480469, -32.546813],
-                [-192.480469, -8.754795],
-                [-157.587891, -8.754795],
-                [-157.587891, -32.546813],
-                [-192.480469, -32.546813],
-            ]
-        ),
-        "start_time": "2022-01-15T03:00:00",
-        "end_time": "2022-01-15T07:00:00",
-    },
-    "Hunga Tonga Volcanic Eruption Closer Look (2022-01-15)": {
-        "region": Polygon(
-            [
-                [-178.901367, -22.958393],
-                [-178.901367, -17.85329],
-                [-171.452637, -17.85329],
-                [-171.452637, -22.958393],
-                [-178.901367, -22.958393],
-            ]
-        ),
-        "start_time": "2022-01-15T03:00:00",
-        "end_time": "2022-01-15T07:00:00",
-    },
-}
-
-
-landsat_rois = {
-    "Aral Sea": Polygon(
-        [
-            [57.667236, 43.834527],
-            [57.667236, 45.996962],
-            [61.12793, 45.996962],
-            [61.12793, 43.834527],
-            [57.667236, 43.834527],
-        ]
-    ),
-    "Dubai": Polygon(
-        [
-            [54.541626, 24.763044],
-            [54.541626, 25.427152],
-            [55.632019, 25.427152],
-            [55.632019, 24.763044],
-            [54.541626, 24.763044],
-        ]
-    ),
-    "Hong Kong International Airport": Polygon(
-        [
-            [113.825226, 22.198849],
-            [113.825226, 22.349758],
-            [114.085121, 22.349758],
-            [114.085121, 22.198849],
-            [113.825226, 22.198849],
-        ]
-    ),
-    "Las Vegas, NV": Polygon(
-        [
-            [-115.554199, 35.804449],
-            [-115.554199, 36.558188],
-            [-113.903503, 36.558188],
-            [-113.903503, 35.804449],
-            [-115.554199, 35.804449],
-        ]
-    ),
-    "Pucallpa, Peru": Polygon(
-        [
-            [-74.672699, -8.600032],
-            [-74.672699, -8.254983],
-            [-74.279938, -8.254983],
-            [-74.279938, -8.600032],
-        ]
-    ),
-    "Sierra Gorda, Chile": Polygon(
-        [
-            [-69.315491, -22.837104],
-            [-69.315491, -22.751488],
-            [-69.190006, -22.751488],
-            [-69.190006, -22.837104],
-            [-69.315491, -22.837104],
-        ]
-    ),
-}
-
-modis_rois = {
-    "World": Polygon(
-        [
-            [-171.210938, -57.136239],
-            [-171.210938, 79.997168],
-            [177.539063, 79.997168],
-            [177.539063, -57.136239],
-            [-171.210938, -57.136239],
-        ]
-    ),
-    "Africa": Polygon(
-        [
-            [-18.6983, 38.1446],
-            [-18.6983, -36.1630],
-            [52.2293, -36.1630],
-            [52.2293, 38.1446],
-        ]
-    ),
-    "USA": Polygon(
-        [
-            [-127.177734, 23.725012],
-            [-127.177734, 50.792047],
-            [-66.269531, 50.792047],
-            [-66.269531, 23.725012],
-            [-127.177734, 23.725012],
-        ]
-    ),
-}
-
-ocean_rois = {
-    "Gulf of Mexico": Polygon(
-        [
-            [-101.206055, 15.496032],
-            [-101.206055, 32.361403],
-            [-75.673828, 32.361403],
-            [-75.673828, 15.496032],
-            [-101.206055, 15.496032],
-        ]
-    ),
-    "North Atlantic Ocean": Polygon(
-        [
-            [-85.341797, 24.046464],
-            [-85.341797, 45.02695],
-            [-55.810547, 45.02695],
-            [-55.810547, 24.046464],
-            [-85.341797, 24.046464],
-        ]
-    ),
-    "World": Polygon(
-        [
-            [-171.210938, -57.136239],
-            [-171.210938, 79.997168],
-            [177.539063, 79.997168],
-            [177.539063, -57.136239],
-            [-171.210938, -57.136239],
-        ]
-    ),
-}
-
-
-@st.cache_data
-def uploaded_file_to_gdf(data):
-    import tempfile
-    import os
-    import uuid
-
-    _, file_extension = os.path.splitext(data.name)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(tempfile.gettempdir(), f"{file_id}{file_extension}")
-
-    with open(file_path, "wb") as file:
-        file.write(data.getbuffer())
-
-    if file_path.lower().endswith(".kml"):
-        fiona.drvsupport.supported_drivers["KML"] = "rw"
-        gdf = gpd.read_file(file_path, driver="KML")
-    else:
-        gdf = gpd.read_file(file_path)
-
-    return gdf
+
+def drawing_to_roi(drawing):
+    """Converts a shape drawn on the map to an ROI without any file I/O.
+
+    Args:
+        drawing (dict): The GeoJSON feature returned by the map.
+
+    Returns:
+        tuple: The ee.Geometry and its bounds (minx, miny, maxx, maxy).
+    """
+    geometry = drawing["geometry"]
+    # Leaflet draws straight lines in lat/lng, so the geometry is planar.
+    roi = ee.Geometry(geometry, "EPSG:4326", False)
+    return roi, shape(geometry).bounds
+
+
+def preflight(
+    empty_text,
+    collection,
+    start_date,
+    end_date,
+    frequency="year",
+    scan=None,
+    tiles=1,
+    dimensions=768,
+):
+    """Estimates the cost of a timelapse request and applies the budget.
+
+    Returns the estimate and the dimensions to render at. Requests over the
+    budget are refused before anything is sent to Earth Engine.
+    """
+    default_dimensions = dimensions * tiles
+    bounds = st.session_state.get("roi_bounds")
+    if bounds is None:
+        return None, default_dimensions
+
+    estimate = estimate_cost(
+        collection, bounds, start_date, end_date, frequency, default_dimensions, scan
+    )
+    action, dimensions, message = admit(estimate, tiles)
+    if action == "refuse":
+        empty_text.error(message)
+        st.stop()
+    elif action in ["warn", "downscale"]:
+        st.warning(message)
+
+    if dimensions != default_dimensions:
+        estimate = estimate_cost(
+            collection, bounds, start_date, end_date, frequency, dimensions, scan
+        )
+    return estimate, dimensions
+
+
+def fit_roi(roi, dimensions):
+    """Simplifies an uploaded ROI to the dimensions the frames are rendered at.
+
+    Drawn and sample ROIs are returned unchanged.
+    """
+    upload = st.session_state.get("roi_upload")
+    if roi is None or upload is None:
+        return roi
+    return geemap.gdf_to_ee(simplify_roi(upload, dimensions), geodesic=False)
+
+
+@st.cache_resource
+def map_shell():
+    """Renders the static part of the map once per process.
+
+    The basemaps and plugins are the same on every run, so they are rendered
+    once and every run sends the same HTML and JavaScript, byte-identical
+    between reruns and sessions. The browser keeps the mounted map and
+    Streamlit doesn't resend it. The ROI and markers of each run are rendered
+    by show_map().
+    """
+    m = geemap.Map(
+        basemap="HYBRID",
+        plugin_Draw=True,
+        Draw_export=True,
+        locate_control=True,
+        plugin_LatLngPopup=False,
+    )
+    m.add_basemap("ROADMAP")
+    return render_shell(m)
+
+
+def show_map(layers, center=None, zoom=None):
+    """Shows the cached map shell with the dynamic layers of this run.
+
+    Args:
+        layers (folium.FeatureGroup): The ROI and markers of this run.
+        center (tuple, optional): The (lat, lng) to center the map on.
+            Defaults to None, which keeps the current view.
+        zoom (int, optional): The zoom level to set with the center. Defaults
+            to None.
+    """
+    # Only drawings are sent back to the script, so panning and zooming the
+    # map does not trigger a rerun.
+    show_shell(
+        map_shell(),
+        layers,
+        key="timelapse_map",
+        height=600,
+        returned_objects=["last_active_drawing"],
+        center=center,
+        zoom=zoom,
+    )
+
+
+def bounds_view(bounds):
+    """Returns the center and zoom level that fit bounds in the map.
+
+    Args:
+        bounds (tuple): The bounds (minx, miny, maxx, maxy) in degrees.
+
+    Returns:
+        tuple: The (lat, lng) center and the zoom level.
+    """
+    minx, miny, maxx, maxy = bounds
+    center = ((miny + maxy) / 2, (minx + maxx) / 2)
+    # The map is about 900 x 600 pixels, i.e., 3.5 x 2.3 tiles of 256 pixels.
+    span = max(maxx - minx, (maxy - miny) * 1.5, 1e-6)
+    zoom = int(math.log2(360 * 3.5 / span))
+    return center, min(max(zoom, 1), 18)
+
+
+@contextmanager
+def ee_slot(empty_text, collection, estimate, cancel=None):
+    """Waits until the scheduler admits a timelapse render of this session.
+
+    Renders are queued by their estimated Earth Engine time. Renders without
+    an estimate count as one minute. Yields the time the render was admitted,
+    so that time spent in the queue is not recorded as render time.
+    """
+    cost = 60 if estimate is None else estimate["seconds"]
+    metrics = scheduler_metrics()
+    queued = metrics["queued"]
+    if queued:
+        empty_text.text(
+            f"Waiting for {queued} queued Earth Engine requests, recent waits "
+            f"took {metrics['wait_p50']:.0f} to {metrics['wait_p95']:.0f} seconds..."
+        )
+    with slot(session_id(), cost, request_width(collection), cancel):
+        if queued:
+            empty_text.text("Computing... Please wait...")
+        yield time.perf_counter()
 
 
 def app():
@@ -246,29 +221,24 @@ def app():
     st.session_state["vis_params"] = None
 
     with row1_col1:
-        ee_authenticate(token_name="EARTHENGINE_TOKEN")
-        m = geemap.Map(
-            basemap="HYBRID",
-            plugin_Draw=True,
-            Draw_export=True,
-            locate_control=True,
-            plugin_LatLngPopup=False,
-        )
-        m.add_basemap("ROADMAP")
+        ee_client.initialize(token_name="EARTHENGINE_TOKEN")
+        # The layers that change between runs, shown on the cached map shell.
+        layers = folium.FeatureGroup(name="ROI")
+        center, zoom = None, None
 
     with row1_col2:
 
         keyword = st.text_input("Search for a location:", "")
         if keyword:
-            locations = geemap.geocode(keyword)
-            if locations is not None and len(locations) > 0:
-                str_locations = [str(g)[1:-1] for g in locations]
+            locations = geocode(keyword)
+            if len(locations) > 0:
+                str_locations = [g.address for g in locations]
                 location = st.selectbox("Select a location:", str_locations)
                 loc_index = str_locations.index(location)
                 selected_loc = locations[loc_index]
                 lat, lng = selected_loc.lat, selected_loc.lng
-                folium.Marker(location=[lat, lng], popup=location).add_to(m)
-                m.set_center(lng, lat, 12)
+                folium.Marker(location=[lat, lng], popup=location).add_to(layers)
+                center, zoom = (lat, lng), 12
                 st.session_state["zoom_level"] = 12
 
         collection = st.selectbox(
@@ -290,26 +260,26 @@ def app():
             "Landsat TM-ETM-OLI Surface Reflectance",
             "Sentinel-2 MSI Surface Reflectance",
         ]:
-            roi_options = ["Uploaded GeoJSON"] + list(landsat_rois.keys())
+            roi_options = ["Drawn or uploaded ROI"] + list(landsat_rois.keys())
 
         elif collection == "Geostationary Operational Environmental Satellites (GOES)":
-            roi_options = ["Uploaded GeoJSON"] + list(goes_rois.keys())
+            roi_options = ["Drawn or uploaded ROI"] + list(goes_rois.keys())
 
         elif collection in [
             "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km",
             "MODIS Gap filled Land Surface Temperature Daily",
         ]:
-            roi_options = ["Uploaded GeoJSON"] + list(modis_rois.keys())
+            roi_options = ["Drawn or uploaded ROI"] + list(modis_rois.keys())
         elif collection == "MODIS Ocean Color SMI":
-            roi_options = ["Uploaded GeoJSON"] + list(ocean_rois.keys())
+            roi_options = ["Drawn or uploaded ROI"] + list(ocean_rois.keys())
         else:
-            roi_options = ["Uploaded GeoJSON"]
+            roi_options = ["Drawn or uploaded ROI"]
 
         if collection == "Any Earth Engine ImageCollection":
             keyword = st.text_input("Enter a keyword to search (e.g., MODIS):", "")
             if keyword:
 
-                assets = geemap.search_ee_data(keyword)
+                assets = search_catalog(keyword)
                 ee_assets = []
                 for asset in assets:
                     if asset["ee_id_snippet"].startswith("ee.ImageCollection"):
@@ -340,14 +310,13 @@ def app():
             if asset_id:
                 with st.expander("Customize band combination and color palette", True):
                     try:
-                        col = ee.ImageCollection.load(asset_id)
+                        img_bands = band_names(asset_id)
                         st.session_state["ee_asset_id"] = asset_id
                     except Exception:
                         st.error("Invalid Earth Engine asset ID.")
                         st.session_state["ee_asset_id"] = None
                         return
 
-                    img_bands = col.first().bandNames().getInfo()
                     if len(img_bands) >= 3:
                         default_bands = img_bands[:3][::-1]
                     else:
@@ -375,7 +344,22 @@ def app():
                             palette.replace("'", '"')
                         )
 
-                    if bands:
+                    stretch_enabled = st.checkbox(
+                        "Auto-stretch min, max and gamma over the ROI and dates",
+                        True,
+                        help="Used when the visualization parameters below have no min and max. Remove them to recompute the stretch.",
+                    )
+                    st.session_state["auto_stretch"] = stretch_enabled
+
+                    # A stretch computed by a previous render pre-fills the
+                    # parameters, so they can be fine-tuned.
+                    stretch = st.session_state.get("stretch") or {}
+                    if stretch.get("key") == (asset_id, bands):
+                        vis_params = st.text_area(
+                            "Enter visualization parameters",
+                            str(stretch["vis_params"]),
+                        )
+                    elif bands:
                         vis_params = st.text_area(
                             "Enter visualization parameters",
                             "{'bands': ["
@@ -544,26 +528,31 @@ def app():
     with row1_col1:
 
         with st.expander(
-            "Steps: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Expand this tab to see a demo 👉"
+            "Steps: Draw a rectangle on the map -> Click the Submit button. Expand this tab to see a demo 👉"
         ):
             video_empty = st.empty()
 
         data = st.file_uploader(
-            "Upload a GeoJSON file to use as an ROI. Customize timelapse parameters and then click the Submit button 😇👇",
+            "Or upload a GeoJSON file to use as an ROI. Customize timelapse parameters and then click the Submit button 😇👇",
             type=["geojson", "kml", "zip"],
         )
 
+        # The last shape drawn on the map, returned by the map on the previous run.
+        drawing = (st.session_state.get("timelapse_map") or {}).get(
+            "last_active_drawing"
+        )
+        custom_roi = data is not None or drawing is not None
+
         crs = "epsg:4326"
-        if sample_roi == "Uploaded GeoJSON":
-            if data is None:
-                # st.info(
-                #     "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click Submit button"
-                # )
+        # The uploaded ROI before simplification, see fit_roi().
+        st.session_state["roi_upload"] = None
+        if sample_roi == "Drawn or uploaded ROI":
+            if not custom_roi:
                 if collection in [
                     "Geostationary Operational Environmental Satellites (GOES)",
                     "USDA National Agriculture Imagery Program (NAIP)",
                 ] and (not keyword):
-                    m.set_center(-100, 40, 3)
+                    center, zoom = (40, -100), 3
                 # else:
                 #     m.set_center(4.20, 18.63, zoom=2)
         else:
@@ -586,7 +575,7 @@ def app():
                     index=[0], crs=crs, geometry=[modis_rois[sample_roi]]
                 )
 
-        if sample_roi != "Uploaded GeoJSON":
+        if sample_roi != "Drawn or uploaded ROI":
 
             if collection in [
                 "Landsat TM-ETM-OLI Surface Reflectance",
@@ -615,23 +604,39 @@ def app():
                 )
             try:
                 st.session_state["roi"] = geemap.gdf_to_ee(gdf, geodesic=False)
+                st.session_state["roi_bounds"] = tuple(gdf.total_bounds)
             except Exception as e:
                 st.error(e)
                 st.error("Please draw another ROI and try again.")
                 return
-            m.add_gdf(gdf, "ROI")
+            folium.GeoJson(gdf.__geo_interface__, name="ROI").add_to(layers)
+            center, zoom = bounds_view(gdf.total_bounds)
 
         elif data:
-            gdf = uploaded_file_to_gdf(data)
             try:
+                upload = read_roi(data.getvalue())
+                gdf = simplify_roi(upload)
+                st.session_state["roi_upload"] = upload
                 st.session_state["roi"] = geemap.gdf_to_ee(gdf, geodesic=False)
-                m.add_gdf(gdf, "ROI")
+                st.session_state["roi_bounds"] = tuple(gdf.total_bounds)
+                folium.GeoJson(gdf.__geo_interface__, name="ROI").add_to(layers)
+                center, zoom = bounds_view(gdf.total_bounds)
+            except Exception as e:
+                st.error(e)
+                st.error("Please draw another ROI and try again.")
+                return
+
+        elif drawing is not None:
+            try:
+                roi, bounds = drawing_to_roi(drawing)
+                st.session_state["roi"] = roi
+                st.session_state["roi_bounds"] = bounds
             except Exception as e:
                 st.error(e)
                 st.error("Please draw another ROI and try again.")
                 return
 
-        m.to_streamlit(height=600)
+        show_map(layers, center, zoom)
 
     with row1_col2:
 
@@ -655,7 +660,7 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 title = st.text_input(
                     "Enter a title to show on the timelapse: ", timelapse_title
@@ -706,6 +711,17 @@ def app():
                     apply_fmask = st.checkbox(
                         "Apply fmask (remove clouds, shadows, snow)", True
                     )
+                    min_valid = st.slider(
+                        "Minimum valid (unmasked) pixels per frame (%):", 0, 100, 50
+                    )
+                    max_cloud = st.slider(
+                        "Maximum cloud pixels per frame (%):", 0, 100, 80
+                    )
+                    quality_action = st.radio(
+                        "Frames below these thresholds:",
+                        ["Drop", "Interpolate"],
+                        horizontal=True,
+                    )
                     font_type = st.selectbox(
                         "Select the font type for the title:",
                         ["arial.ttf", "alibaba.otf"],
@@ -715,6 +731,12 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    max_mb = st.slider(
+                        "Maximum size of each output in MB (0 for no limit):",
+                        0,
+                        100,
+                        MAX_OUTPUT_MB,
+                    )
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -723,9 +745,9 @@ def app():
                 submitted = st.form_submit_button("Submit")
                 if submitted:
 
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
 
@@ -737,87 +759,93 @@ def app():
                         end_date = str(months[1]).zfill(2) + "-30"
                         bands = RGB.split("/")
 
-                        try:
-                            if collection == "Landsat TM-ETM-OLI Surface Reflectance":
-                                out_gif = geemap.landsat_timelapse(
-                                    roi=roi,
-                                    out_gif=out_gif,
-                                    start_year=start_year,
-                                    end_year=end_year,
-                                    start_date=start_date,
-                                    end_date=end_date,
-                                    bands=bands,
-                                    apply_fmask=apply_fmask,
-                                    frames_per_second=speed,
-                                    # dimensions=dimensions,
-                                    dimensions=768,
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    frequency=frequency,
-                                    date_format=None,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=True,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                            elif collection == "Sentinel-2 MSI Surface Reflectance":
-                                out_gif = geemap.sentinel2_timelapse(
-                                    roi=roi,
-                                    out_gif=out_gif,
-                                    start_year=start_year,
-                                    end_year=end_year,
-                                    start_date=start_date,
-                                    end_date=end_date,
-                                    bands=bands,
-                                    apply_fmask=apply_fmask,
-                                    frames_per_second=speed,
-                                    dimensions=768,
-                                    # dimensions=dimensions,
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    frequency=frequency,
-                                    date_format=None,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=True,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                        except Exception:
-                            empty_text.error(
-                                "An error occurred while computing the timelapse. Your probably requested too much data. Try reducing the ROI or timespan."
+                        params = {
+                            "title": title,
+                            "bands": bands,
+                            "frequency": frequency,
+                            "speed": speed,
+                            "dimensions": dimensions,
+                            "progress_bar_color": progress_bar_color,
+                            "start_year": start_year,
+                            "end_year": end_year,
+                            "start_date": start_date,
+                            "end_date": end_date,
+                            "font_size": font_size,
+                            "font_color": font_color,
+                            "apply_fmask": apply_fmask,
+                            "font_type": font_type,
+                            "fading": fading,
+                            "mp4": mp4,
+                            "min_valid": min_valid / 100,
+                            "max_cloud": max_cloud / 100,
+                            "quality_action": quality_action.lower(),
+                            "max_mb": max_mb,
+                            "overlay_data": overlay_data,
+                            "overlay_color": overlay_color,
+                            "overlay_width": overlay_width,
+                            "overlay_opacity": overlay_opacity,
+                        }
+                        cached = prerendered(collection, sample_roi, params)
+
+                        report = {}
+                        if cached is not None:
+                            estimate, out_gif = None, cached
+                        else:
+                            estimate, dimensions = preflight(
+                                empty_text,
+                                collection,
+                                f"{start_year}-{start_date}",
+                                f"{end_year}-{end_date[:2]}-28",
+                                frequency,
+                                dimensions=dimensions,
                             )
-                            st.stop()
+                            roi = fit_roi(roi, dimensions)
+                            started = time.perf_counter()
+
+                            def progress(message, frames=None):
+                                empty_text.text(message)
+                                if frames:
+                                    empty_image.image(preview_strip(frames))
+
+                            try:
+                                with job(session_id(), is_active_session) as cancel:
+                                    with ee_slot(
+                                        empty_text, collection, estimate, cancel
+                                    ) as started:
+                                        report = render_timelapse(
+                                            collection,
+                                            roi,
+                                            st.session_state.get("roi_bounds"),
+                                            params,
+                                            out_gif,
+                                            dimensions,
+                                            progress,
+                                            cancel=cancel,
+                                        )
+                            except Cancelled as e:
+                                empty_text.warning(f"The timelapse was cancelled: {e}.")
+                                st.stop()
+                            except Exception:
+                                empty_text.error(
+                                    "An error occurred while computing the timelapse. You probably requested too much data. Try reducing the ROI or timespan."
+                                )
+                                st.stop()
 
                         if out_gif is not None and os.path.exists(out_gif):
 
+                            if estimate is not None:
+                                record_cost(
+                                    estimate,
+                                    time.perf_counter() - started,
+                                    out_gif,
+                                    report=report,
+                                )
+
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            show([out_gif])
+                            empty_image.image(artifact_url(out_gif))
 
                             out_mp4 = out_gif.replace(".gif", ".mp4")
                             if mp4 and os.path.exists(out_mp4):
@@ -825,7 +853,13 @@ def app():
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
+
+                            if report:
+                                with empty_video:
+                                    st.caption(format_report(report))
 
                         else:
                             empty_text.error(
@@ -841,13 +875,13 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 satellite = st.selectbox("Select a satellite:", ["GOES-17", "GOES-16"])
                 earliest_date = datetime.date(2017, 7, 10)
                 latest_date = datetime.date.today()
 
-                if sample_roi == "Uploaded GeoJSON":
+                if sample_roi == "Drawn or uploaded ROI":
                     roi_start_date = today - datetime.timedelta(days=2)
                     roi_end_date = today - datetime.timedelta(days=1)
                     roi_start_time = datetime.time(14, 00)
@@ -907,6 +941,8 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    webp = st.checkbox("Save timelapse as WebP", False)
+                    formats = ["gif"] + ["mp4"] * mp4 + ["webp"] * webp
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -916,45 +952,94 @@ def app():
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
                         empty_text.text("Computing... Please wait...")
 
-                        geemap.goes_timelapse(
-                            roi,
-                            out_gif,
-                            start_date=start,
-                            end_date=end,
-                            data=satellite,
-                            scan=scan_type.replace(" ", "_").lower(),
-                            dimensions=768,
-                            framesPerSecond=speed,
-                            date_format="YYYY-MM-dd HH:mm",
-                            xy=("3%", "3%"),
-                            text_sequence=None,
-                            font_type="arial.ttf",
-                            font_size=font_size,
-                            font_color=font_color,
-                            add_progress_bar=add_progress_bar,
-                            progress_bar_color=progress_bar_color,
-                            progress_bar_height=5,
-                            loop=0,
-                            overlay_data=overlay_data,
-                            overlay_color=overlay_color,
-                            overlay_width=overlay_width,
-                            overlay_opacity=overlay_opacity,
-                            mp4=mp4,
-                            fading=fading,
-                        )
+                        scan = scan_type.replace(" ", "_").lower()
+                        fire = add_fire and scan in ["full_disk", "conus"]
+                        if add_fire and not fire:
+                            empty_fire_text.warning(
+                                "Fire/Hotspot Characterization is only available for the Full Disk and CONUS scans."
+                            )
+
+                        params = {
+                            "satellite": satellite,
+                            "start": start,
+                            "end": end,
+                            "scan": scan,
+                            "fire": fire,
+                            "speed": speed,
+                            "add_progress_bar": add_progress_bar,
+                            "progress_bar_color": progress_bar_color,
+                            "font_size": font_size,
+                            "font_color": font_color,
+                            "fading": fading,
+                            "formats": formats,
+                            "overlay_data": overlay_data,
+                            "overlay_color": overlay_color,
+                            "overlay_width": overlay_width,
+                            "overlay_opacity": overlay_opacity,
+                        }
+                        cached = prerendered(collection, sample_roi, params)
+
+                        report = {}
+                        if cached is not None:
+                            estimate, out_gif = None, cached
+                        else:
+                            estimate, dimensions = preflight(
+                                empty_text, collection, start, end, scan=scan
+                            )
+                            roi = fit_roi(roi, dimensions)
+                            started = time.perf_counter()
+
+                            def progress(message, frames=None):
+                                empty_text.text(message)
+                                if frames:
+                                    # A low-resolution preview while frames arrive.
+                                    empty_image.image(preview_strip(frames))
+
+                            try:
+                                with job(session_id(), is_active_session) as cancel:
+                                    with ee_slot(
+                                        empty_text, collection, estimate, cancel
+                                    ) as started:
+                                        report = render_timelapse(
+                                            collection,
+                                            roi,
+                                            st.session_state.get("roi_bounds"),
+                                            params,
+                                            out_gif,
+                                            dimensions,
+                                            progress,
+                                            cancel=cancel,
+                                        )
+                            except Cancelled as e:
+                                empty_text.warning(f"The timelapse was cancelled: {e}.")
+                                st.stop()
+                            except Exception:
+                                logger.exception("GOES timelapse failed")
+                                empty_image.empty()
+                                empty_text.error(
+                                    "An error occurred while computing the timelapse. You probably requested too much data. Try reducing the ROI or timespan."
+                                )
+                                st.stop()
+                        out_fire_gif = fire_path(out_gif)
 
                         if out_gif is not None and os.path.exists(out_gif):
+                            if estimate is not None:
+                                record_cost(
+                                    estimate, time.perf_counter() - started, out_gif
+                                )
+
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            show([out_gif, out_fire_gif])
+                            empty_image.image(artifact_url(out_gif))
 
                             out_mp4 = out_gif.replace(".gif", ".mp4")
                             if mp4 and os.path.exists(out_mp4):
@@ -962,35 +1047,24 @@ def app():
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
 
-                            if add_fire:
-                                out_fire_gif = geemap.temp_file_path(".gif")
-                                empty_fire_text.text(
-                                    "Delineating Fire Hotspot... Please wait..."
-                                )
-                                geemap.goes_fire_timelapse(
-                                    out_fire_gif,
-                                    start_date=start,
-                                    end_date=end,
-                                    data=satellite,
-                                    scan=scan_type.replace(" ", "_").lower(),
-                                    region=roi,
-                                    dimensions=768,
-                                    framesPerSecond=speed,
-                                    date_format="YYYY-MM-dd HH:mm",
-                                    xy=("3%", "3%"),
-                                    text_sequence=None,
-                                    font_type="arial.ttf",
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    loop=0,
-                                )
-                                if os.path.exists(out_fire_gif):
-                                    empty_fire_image.image(out_fire_gif)
+                            out_webp = out_gif.replace(".gif", ".webp")
+                            if webp and os.path.exists(out_webp):
+                                with empty_video:
+                                    st.text(
+                                        "Right click the WebP to save it to your computer👇"
+                                    )
+                                    st.image(artifact_url(out_webp))
+
+                            with empty_video:
+                                st.caption(format_report(report))
+
+                            if fire and os.path.exists(out_fire_gif):
+                                empty_fire_text.text("Fire/Hotspot Characterization👇")
+                                empty_fire_image.image(artifact_url(out_fire_gif))
                         else:
                             empty_text.text(
                                 "Something went wrong, either the ROI is too big or there are no data available for the specified date range. Please try a smaller ROI or different date range."
@@ -1008,7 +1082,7 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 with st.expander("Customize timelapse"):
 
@@ -1036,7 +1110,15 @@ def app():
                     fading = st.slider(
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
+                    tiles = st.slider(
+                        "Tiles per side (renders large ROIs at full resolution):",
+                        1,
+                        4,
+                        1,
+                    )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    webp = st.checkbox("Save timelapse as WebP", False)
+                    formats = ["gif"] + ["mp4"] * mp4 + ["webp"] * webp
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -1044,60 +1126,151 @@ def app():
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
 
                         empty_text.text("Computing... Please wait...")
 
-                        geemap.modis_ndvi_timelapse(
-                            roi,
-                            out_gif,
-                            satellite,
-                            band,
-                            start_date,
-                            end_date,
-                            768,
-                            speed,
-                            overlay_data=overlay_data,
-                            overlay_color=overlay_color,
-                            overlay_width=overlay_width,
-                            overlay_opacity=overlay_opacity,
-                            mp4=mp4,
-                            fading=fading,
-                        )
+                        params = {
+                            "satellite": satellite,
+                            "band": band,
+                            "start_date": start_date,
+                            "end_date": end_date,
+                            "speed": speed,
+                            "add_progress_bar": add_progress_bar,
+                            "progress_bar_color": progress_bar_color,
+                            "font_size": font_size,
+                            "font_color": font_color,
+                            "font_type": font_type,
+                            "fading": fading,
+                            "tiles": tiles,
+                            "formats": formats,
+                            "overlay_data": overlay_data,
+                            "overlay_color": overlay_color,
+                            "overlay_width": overlay_width,
+                            "overlay_opacity": overlay_opacity,
+                        }
+                        cached = prerendered(collection, sample_roi, params)
+
+                        report = {}
+                        if cached is not None:
+                            estimate, out_gif = None, cached
+                        else:
+                            bounds = st.session_state.get("roi_bounds")
+                            if bounds is None:
+                                tiles = 1
+                            estimate, dimensions = preflight(
+                                empty_text,
+                                collection,
+                                start_date,
+                                end_date,
+                                tiles=tiles,
+                            )
+                            roi = fit_roi(roi, dimensions)
+                            started = time.perf_counter()
+
+                            def progress(message, frames=None):
+                                empty_text.text(message)
+                                if frames:
+                                    empty_image.image(preview_strip(frames))
+
+                            try:
+                                with job(session_id(), is_active_session) as cancel:
+                                    with ee_slot(
+                                        empty_text, collection, estimate, cancel
+                                    ) as started:
+                                        report = render_timelapse(
+                                            collection,
+                                            roi,
+                                            bounds,
+                                            params,
+                                            out_gif,
+                                            dimensions,
+                                            progress,
+                                            cancel=cancel,
+                                        )
+                            except Cancelled as e:
+                                empty_text.warning(f"The timelapse was cancelled: {e}.")
+                                st.stop()
+                            except Exception:
+                                logger.exception("MODIS timelapse failed")
+                                empty_image.empty()
+                                empty_text.error(
+                                    "An error occurred while computing the timelapse. You probably requested too much data. Try reducing the ROI or timespan."
+                                )
+                                st.stop()
 
-                        geemap.reduce_gif_size(out_gif)
+                        if out_gif is not None and os.path.exists(out_gif):
+                            if estimate is not None:
+                                record_cost(
+                                    estimate, time.perf_counter() - started, out_gif
+                                )
 
-                        empty_text.text(
-                            "Right click the GIF to save it to your computer👇"
-                        )
-                        empty_image.image(out_gif)
+                            empty_text.text(
+                                "Right click the GIF to save it to your computer👇"
+                            )
+                            show([out_gif])
+                            empty_image.image(artifact_url(out_gif))
+
+                            out_mp4 = out_gif.replace(".gif", ".mp4")
+                            if mp4 and os.path.exists(out_mp4):
+                                with empty_video:
+                                    st.text(
+                                        "Right click the MP4 to save it to your computer👇"
+                                    )
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
+
+                            out_webp = out_gif.replace(".gif", ".webp")
+                            if webp and os.path.exists(out_webp):
+                                with empty_video:
+                                    st.text(
+                                        "Right click the WebP to save it to your computer👇"
+                                    )
+                                    st.image(artifact_url(out_webp))
 
-                        out_mp4 = out_gif.replace(".gif", ".mp4")
-                        if mp4 and os.path.exists(out_mp4):
                             with empty_video:
-                                st.text(
-                                    "Right click the MP4 to save it to your computer👇"
-                                )
-                                st.video(out_gif.replace(".gif", ".mp4"))
+                                st.caption(format_report(report))
+
+                        else:
+                            empty_text.error(
+                                "Something went wrong. You probably requested too much data. Try reducing the ROI or timespan."
+                            )
 
         elif collection == "Any Earth Engine ImageCollection":
 
+            # The dates default to the time span of the collection, if its
+            # date range can be looked up.
+            default_start = datetime.date(2020, 1, 1)
+            default_end = datetime.date.today()
+            ee_asset_id = st.session_state.get("ee_asset_id")
+            if ee_asset_id:
+                try:
+                    dates = date_range(ee_asset_id)
+                    first, last = (
+                        datetime.datetime.fromtimestamp(
+                            dates[k] / 1000, datetime.timezone.utc
+                        ).date()
+                        for k in ["start", "end"]
+                    )
+                except Exception:
+                    logger.warning("No date range for %s", ee_asset_id, exc_info=True)
+                else:
+                    default_end = min(default_end, last)
+                    default_start = min(max(default_start, first), default_end)
+
             with st.form("submit_ts_form"):
                 with st.expander("Customize timelapse"):
 
                     title = st.text_input(
                         "Enter a title to show on the timelapse: ", "Timelapse"
                     )
-                    start_date = st.date_input(
-                        "Select the start date:", datetime.date(2020, 1, 1)
-                    )
-                    end_date = st.date_input(
-                        "Select the end date:", datetime.date.today()
-                    )
+                    start_date = st.date_input("Select the start date:", default_start)
+                    end_date = st.date_input("Select the end date:", default_end)
                     frequency = st.selectbox(
                         "Select a temporal frequency:",
                         ["year", "quarter", "month", "day", "hour", "minute", "second"],
@@ -1151,70 +1324,125 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
 
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
 
                         empty_text.text("Computing... Please wait...")
+
+                        estimate, dimensions = preflight(
+                            empty_text, collection, start_date, end_date, frequency
+                        )
+                        roi = fit_roi(roi, dimensions)
+                        started = time.perf_counter()
+
+                        vis_params = st.session_state.get("vis_params")
+                        asset_id = st.session_state.get("ee_asset_id")
+                        bands = st.session_state.get("bands")
+                        if (
+                            st.session_state.get("auto_stretch")
+                            and roi is not None
+                            and bands
+                            and vis_params is not None
+                            and not {"min", "max"} & set(vis_params)
+                        ):
+                            empty_text.text("Computing the contrast stretch...")
+                            try:
+                                stretch = auto_stretch(
+                                    asset_id, bands, roi, start_date, end_date
+                                )
+                            except Exception:
+                                st.warning(
+                                    "The contrast could not be computed from the data. Rendering with the visualization parameters as entered."
+                                )
+                            else:
+                                vis_params = {**stretch, **vis_params}
+                                st.session_state["stretch"] = {
+                                    "key": (asset_id, bands),
+                                    "vis_params": stretch,
+                                }
+                            empty_text.text("Computing... Please wait...")
+
                         try:
-                            geemap.create_timelapse(
-                                st.session_state.get("ee_asset_id"),
-                                start_date=start_date.strftime("%Y-%m-%d"),
-                                end_date=end_date.strftime("%Y-%m-%d"),
-                                region=roi,
-                                frequency=frequency,
-                                reducer=reducer,
-                                date_format=data_format,
-                                out_gif=out_gif,
-                                bands=st.session_state.get("bands"),
-                                palette=st.session_state.get("palette"),
-                                vis_params=st.session_state.get("vis_params"),
-                                dimensions=768,
-                                frames_per_second=speed,
-                                crs="EPSG:3857",
-                                overlay_data=overlay_data,
-                                overlay_color=overlay_color,
-                                overlay_width=overlay_width,
-                                overlay_opacity=overlay_opacity,
-                                title=title,
-                                title_xy=("2%", "90%"),
-                                add_text=True,
-                                text_xy=("2%", "2%"),
-                                text_sequence=None,
-                                font_type=font_type,
-                                font_size=font_size,
-                                font_color=font_color,
-                                add_progress_bar=add_progress_bar,
-                                progress_bar_color=progress_bar_color,
-                                progress_bar_height=5,
-                                loop=0,
-                                mp4=mp4,
-                                fading=fading,
-                            )
+                            # geemap renders in one call that cannot be
+                            # interrupted, so the job is cancelled while it is
+                            # queued, and a superseded result is discarded.
+                            with job(session_id(), is_active_session) as cancel:
+                                with ee_slot(
+                                    empty_text, collection, estimate, cancel
+                                ) as started:
+                                    geemap.create_timelapse(
+                                        st.session_state.get("ee_asset_id"),
+                                        start_date=start_date.strftime("%Y-%m-%d"),
+                                        end_date=end_date.strftime("%Y-%m-%d"),
+                                        region=roi,
+                                        frequency=frequency,
+                                        reducer=reducer,
+                                        date_format=data_format,
+                                        out_gif=out_gif,
+                                        bands=st.session_state.get("bands"),
+                                        palette=st.session_state.get("palette"),
+                                        vis_params=vis_params,
+                                        dimensions=dimensions,
+                                        frames_per_second=speed,
+                                        crs="EPSG:3857",
+                                        overlay_data=overlay_data,
+                                        overlay_color=overlay_color,
+                                        overlay_width=overlay_width,
+                                        overlay_opacity=overlay_opacity,
+                                        title=title,
+                                        title_xy=("2%", "90%"),
+                                        add_text=True,
+                                        text_xy=("2%", "2%"),
+                                        text_sequence=None,
+                                        font_type=font_type,
+                                        font_size=font_size,
+                                        font_color=font_color,
+                                        add_progress_bar=add_progress_bar,
+                                        progress_bar_color=progress_bar_color,
+                                        progress_bar_height=5,
+                                        loop=0,
+                                        mp4=mp4,
+                                        fading=fading,
+                                    )
+                                cancel.check()
+                        except Cancelled as e:
+                            empty_text.warning(f"The timelapse was cancelled: {e}.")
+                            st.stop()
                         except Exception:
                             empty_text.error(
                                 "An error occurred while computing the timelapse. You probably requested too much data. Try reducing the ROI or timespan."
                             )
 
-                        empty_text.text(
-                            "Right click the GIF to save it to your computer👇"
-                        )
-                        empty_image.image(out_gif)
+                        if out_gif is not None and os.path.exists(out_gif):
 
-                        out_mp4 = out_gif.replace(".gif", ".mp4")
-                        if mp4 and os.path.exists(out_mp4):
-                            with empty_video:
-                                st.text(
-                                    "Right click the MP4 to save it to your computer👇"
+                            if estimate is not None:
+                                record_cost(
+                                    estimate, time.perf_counter() - started, out_gif
                                 )
-                                st.video(out_gif.replace(".gif", ".mp4"))
+
+                            empty_text.text(
+                                "Right click the GIF to save it to your computer👇"
+                            )
+                            show([out_gif])
+                            empty_image.image(artifact_url(out_gif))
+
+                            out_mp4 = out_gif.replace(".gif", ".mp4")
+                            if mp4 and os.path.exists(out_mp4):
+                                with empty_video:
+                                    st.text(
+                                        "Right click the MP4 to save it to your computer👇"
+                                    )
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
 
         elif collection in [
             "MODIS Gap filled Land Surface Temperature Daily",
@@ -1271,6 +1499,12 @@ def app():
                         "Fading duration (seconds) for each frame:", 0.0, 3.0, 0.0
                     )
                     mp4 = st.checkbox("Save timelapse as MP4", True)
+                    webp = st.checkbox("Save timelapse as WebP", False)
+                    formats = ["gif"] + ["mp4"] * mp4 + ["webp"] * webp
+                    # geemap renders these collections, without tiling.
+                    st.caption(
+                        "Each frame is rendered in a single Earth Engine request, so large ROIs such as the World are rendered at a lower resolution."
+                    )
 
                 empty_text = st.empty()
                 empty_image = st.empty()
@@ -1279,117 +1513,98 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
 
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
 
                         empty_text.text("Computing... Please wait...")
-                        try:
-                            if (
-                                collection
-                                == "MODIS Gap filled Land Surface Temperature Daily"
-                            ):
-                                out_gif = geemap.create_timelapse(
-                                    st.session_state.get("ee_asset_id"),
-                                    start_date=start_date.strftime("%Y-%m-%d"),
-                                    end_date=end_date.strftime("%Y-%m-%d"),
-                                    region=roi,
-                                    bands=None,
-                                    frequency=frequency,
-                                    reducer=reducer,
-                                    date_format=None,
-                                    out_gif=out_gif,
-                                    palette=st.session_state.get("palette"),
-                                    vis_params=None,
-                                    dimensions=768,
-                                    frames_per_second=speed,
-                                    crs="EPSG:3857",
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    add_colorbar=add_colorbar,
-                                    colorbar_label=colorbar_label,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                            elif collection == "MODIS Ocean Color SMI":
-                                if vis_params.startswith("{") and vis_params.endswith(
-                                    "}"
-                                ):
-                                    vis_params = json.loads(
-                                        vis_params.replace("'", '"')
-                                    )
-                                else:
-                                    vis_params = None
-                                out_gif = geemap.modis_ocean_color_timelapse(
-                                    st.session_state.get("ee_asset_id"),
-                                    start_date=start_date.strftime("%Y-%m-%d"),
-                                    end_date=end_date.strftime("%Y-%m-%d"),
-                                    region=roi,
-                                    bands=st.session_state["band"],
-                                    frequency=frequency,
-                                    reducer=reducer,
-                                    date_format=None,
-                                    out_gif=out_gif,
-                                    palette=st.session_state.get("palette"),
-                                    vis_params=vis_params,
-                                    dimensions=768,
-                                    frames_per_second=speed,
-                                    crs="EPSG:3857",
-                                    overlay_data=overlay_data,
-                                    overlay_color=overlay_color,
-                                    overlay_width=overlay_width,
-                                    overlay_opacity=overlay_opacity,
-                                    title=title,
-                                    title_xy=("2%", "90%"),
-                                    add_text=True,
-                                    text_xy=("2%", "2%"),
-                                    text_sequence=None,
-                                    font_type=font_type,
-                                    font_size=font_size,
-                                    font_color=font_color,
-                                    add_progress_bar=add_progress_bar,
-                                    progress_bar_color=progress_bar_color,
-                                    progress_bar_height=5,
-                                    add_colorbar=add_colorbar,
-                                    colorbar_label=colorbar_label,
-                                    loop=0,
-                                    mp4=mp4,
-                                    fading=fading,
-                                )
-                        except Exception:
-                            empty_text.error(
-                                "Something went wrong. You probably requested too much data. Try reducing the ROI or timespan."
+
+                        params = {
+                            "asset_id": st.session_state.get("ee_asset_id"),
+                            "palette": st.session_state.get("palette"),
+                            "title": title,
+                            "start_date": start_date.strftime("%Y-%m-%d"),
+                            "end_date": end_date.strftime("%Y-%m-%d"),
+                            "frequency": frequency,
+                            "reducer": reducer,
+                            "vis_params": vis_params,
+                            "speed": speed,
+                            "add_progress_bar": add_progress_bar,
+                            "progress_bar_color": progress_bar_color,
+                            "font_size": font_size,
+                            "font_color": font_color,
+                            "font_type": font_type,
+                            "add_colorbar": add_colorbar,
+                            "colorbar_label": colorbar_label,
+                            "fading": fading,
+                            "formats": formats,
+                            "overlay_data": overlay_data,
+                            "overlay_color": overlay_color,
+                            "overlay_width": overlay_width,
+                            "overlay_opacity": overlay_opacity,
+                        }
+                        if collection == "MODIS Ocean Color SMI":
+                            params["band"] = st.session_state["band"]
+                        cached = prerendered(collection, sample_roi, params)
+
+                        report = {}
+                        if cached is not None:
+                            estimate, out_gif = None, cached
+                        else:
+                            estimate, dimensions = preflight(
+                                empty_text, collection, start_date, end_date, frequency
                             )
+                            roi = fit_roi(roi, dimensions)
+                            started = time.perf_counter()
+
+                            def progress(message, frames=None):
+                                empty_text.text(message)
+                                if frames:
+                                    empty_image.image(preview_strip(frames))
+
+                            try:
+                                with job(session_id(), is_active_session) as cancel:
+                                    with ee_slot(
+                                        empty_text, collection, estimate, cancel
+                                    ) as started:
+                                        report = render_timelapse(
+                                            collection,
+                                            roi,
+                                            st.session_state.get("roi_bounds"),
+                                            params,
+                                            out_gif,
+                                            dimensions,
+                                            progress,
+                                            cancel=cancel,
+                                        )
+                            except Cancelled as e:
+                                empty_text.warning(f"The timelapse was cancelled: {e}.")
+                                st.stop()
+                            except Exception:
+                                empty_image.empty()
+                                empty_text.error(
+                                    "Something went wrong. You probably requested too much data. Try reducing the ROI or timespan."
+                                )
 
                         if out_gif is not None and os.path.exists(out_gif):
 
-                            geemap.reduce_gif_size(out_gif)
+                            if estimate is not None:
+                                record_cost(
+                                    estimate, time.perf_counter() - started, out_gif
+                                )
 
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            show([out_gif])
+                            empty_image.image(artifact_url(out_gif))
 
                             out_mp4 = out_gif.replace(".gif", ".mp4")
                             if mp4 and os.path.exists(out_mp4):
@@ -1397,7 +1612,20 @@ def app():
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
+
+                            out_webp = out_gif.replace(".gif", ".webp")
+                            if webp and os.path.exists(out_webp):
+                                with empty_video:
+                                    st.text(
+                                        "Right click the WebP to save it to your computer👇"
+                                    )
+                                    st.image(artifact_url(out_webp))
+
+                            with empty_video:
+                                st.caption(format_report(report))
 
                         else:
                             st.error(
@@ -1449,49 +1677,69 @@ def app():
                 roi = None
                 if st.session_state.get("roi") is not None:
                     roi = st.session_state.get("roi")
-                out_gif = geemap.temp_file_path(".gif")
+                out_gif = artifact_path(".gif", serve=True)
 
                 submitted = st.form_submit_button("Submit")
                 if submitted:
 
-                    if sample_roi == "Uploaded GeoJSON" and data is None:
+                    if sample_roi == "Drawn or uploaded ROI" and not custom_roi:
                         empty_text.warning(
-                            "Steps to create a timelapse: Draw a rectangle on the map -> Export it as a GeoJSON -> Upload it back to the app -> Click the Submit button. Alternatively, you can select a sample ROI from the dropdown list."
+                            "Steps to create a timelapse: Draw a rectangle on the map -> Click the Submit button. Alternatively, you can upload a GeoJSON file or select a sample ROI from the dropdown list."
                         )
                     else:
 
                         empty_text.text("Computing... Please wait...")
+
+                        estimate, dimensions = preflight(
+                            empty_text,
+                            collection,
+                            f"{years[0]}-01-01",
+                            f"{years[1]}-12-31",
+                        )
+                        roi = fit_roi(roi, dimensions)
+                        started = time.perf_counter()
+
                         try:
-                            geemap.naip_timelapse(
-                                roi,
-                                years[0],
-                                years[1],
-                                out_gif,
-                                bands=bands.split("/"),
-                                palette=st.session_state.get("palette"),
-                                vis_params=None,
-                                dimensions=768,
-                                frames_per_second=speed,
-                                crs="EPSG:3857",
-                                overlay_data=overlay_data,
-                                overlay_color=overlay_color,
-                                overlay_width=overlay_width,
-                                overlay_opacity=overlay_opacity,
-                                title=title,
-                                title_xy=("2%", "90%"),
-                                add_text=True,
-                                text_xy=("2%", "2%"),
-                                text_sequence=None,
-                                font_type=font_type,
-                                font_size=font_size,
-                                font_color=font_color,
-                                add_progress_bar=add_progress_bar,
-                                progress_bar_color=progress_bar_color,
-                                progress_bar_height=5,
-                                loop=0,
-                                mp4=mp4,
-                                fading=fading,
-                            )
+                            # As for create_timelapse(), only cancellable
+                            # while queued.
+                            with job(session_id(), is_active_session) as cancel:
+                                with ee_slot(
+                                    empty_text, collection, estimate, cancel
+                                ) as started:
+                                    geemap.naip_timelapse(
+                                        roi,
+                                        years[0],
+                                        years[1],
+                                        out_gif,
+                                        bands=bands.split("/"),
+                                        palette=st.session_state.get("palette"),
+                                        vis_params=None,
+                                        dimensions=dimensions,
+                                        frames_per_second=speed,
+                                        crs="EPSG:3857",
+                                        overlay_data=overlay_data,
+                                        overlay_color=overlay_color,
+                                        overlay_width=overlay_width,
+                                        overlay_opacity=overlay_opacity,
+                                        title=title,
+                                        title_xy=("2%", "90%"),
+                                        add_text=True,
+                                        text_xy=("2%", "2%"),
+                                        text_sequence=None,
+                                        font_type=font_type,
+                                        font_size=font_size,
+                                        font_color=font_color,
+                                        add_progress_bar=add_progress_bar,
+                                        progress_bar_color=progress_bar_color,
+                                        progress_bar_height=5,
+                                        loop=0,
+                                        mp4=mp4,
+                                        fading=fading,
+                                    )
+                                cancel.check()
+                        except Cancelled as e:
+                            empty_text.warning(f"The timelapse was cancelled: {e}.")
+                            st.stop()
                         except Exception:
                             empty_text.error(
                                 "Something went wrong. You either requested too much data or the ROI is outside the U.S."
@@ -1499,10 +1747,16 @@ def app():
 
                         if out_gif is not None and os.path.exists(out_gif):
 
+                            if estimate is not None:
+                                record_cost(
+                                    estimate, time.perf_counter() - started, out_gif
+                                )
+
                             empty_text.text(
                                 "Right click the GIF to save it to your computer👇"
                             )
-                            empty_image.image(out_gif)
+                            show([out_gif])
+                            empty_image.image(artifact_url(out_gif))
 
                             out_mp4 = out_gif.replace(".gif", ".mp4")
                             if mp4 and os.path.exists(out_mp4):
@@ -1510,7 +1764,9 @@ def app():
                                     st.text(
                                         "Right click the MP4 to save it to your computer👇"
                                     )
-                                    st.video(out_gif.replace(".gif", ".mp4"))
+                                    st.video(
+                                        artifact_url(out_gif.replace(".gif", ".mp4"))
+                                    )
 
                         else:
                             st.error(
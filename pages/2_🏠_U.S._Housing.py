@@ -1,14 +1,13 @@
 import datetime
 import os
-import pathlib
 import requests
-import zipfile
 import pandas as pd
 import pydeck as pdk
 import geopandas as gpd
 import streamlit as st
 import leafmap.colormaps as cm
 from leafmap.common import hex_to_rgb
+from common import artifacts
 
 st.set_page_config(layout="wide")
 
@@ -22,13 +21,6 @@ st.sidebar.info("""
     Qiusheng Wu at [wetlands.io](https://wetlands.io) | [GitHub](https://github.com/giswqs) | [Twitter](https://twitter.com/giswqs) | [YouTube](https://youtube.com/@giswqs) | [LinkedIn](https://www.linkedin.com/in/giswqs)
     """)
 
-STREAMLIT_STATIC_PATH = pathlib.Path(st.__path__[0]) / "static"
-# We create a downloads directory within the streamlit static asset directory
-# and we write output files to it
-DOWNLOADS_PATH = STREAMLIT_STATIC_PATH / "downloads"
-if not DOWNLOADS_PATH.is_dir():
-    DOWNLOADS_PATH.mkdir()
-
 # Data source: https://www.realtor.com/research/data/
 # link_prefix = "https://econdata.s3-us-west-2.amazonaws.com/Reports/"
 link_prefix = "https://raw.githubusercontent.com/giswqs/data/main/housing/"
@@ -151,12 +143,12 @@ def get_geom_data(category):
 
     if category.lower() == "zip":
         r = requests.get(links[category])
-        out_zip = os.path.join(DOWNLOADS_PATH, "cb_2018_us_zcta510_500k.zip")
-        with open(out_zip, "wb") as code:
-            code.write(r.content)
-        zip_ref = zipfile.ZipFile(out_zip, "r")
-        zip_ref.extractall(DOWNLOADS_PATH)
-        gdf = gpd.read_file(out_zip.replace("zip", "shp"))
+        # The shapefile is read straight from the zip, which is deleted once
+        # the GeoDataFrame is cached.
+        with artifacts.manager.temporary(".zip") as out_zip:
+            with open(out_zip, "wb") as code:
+                code.write(r.content)
+            gdf = gpd.read_file(out_zip)
     else:
         gdf = gpd.read_file(links[category])
     return gdf
@@ -2,6 +2,7 @@ import os
 import fiona
 import geopandas as gpd
 import streamlit as st
+from common.artifacts import artifact_path
 
 st.set_page_config(layout="wide")
 
@@ -29,15 +30,10 @@ def is_trusted_url(url):
 
 def save_uploaded_file(file_content, file_name):
     """
-    Save the uploaded file to a temporary directory
+    Save the uploaded file to the artifact directory, owned by the current session
     """
-    import tempfile
-    import os
-    import uuid
-
     _, file_extension = os.path.splitext(file_name)
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(tempfile.gettempdir(), f"{file_id}{file_extension}")
+    file_path = artifact_path(file_extension)
 
     with open(file_path, "wb") as file:
         file.write(file_content.getbuffer())
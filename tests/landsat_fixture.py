@@ -0,0 +1,123 @@
+"""The replay fixture of a small Landsat timelapse, and the script that writes it.
+
+The responses are synthetic, stored under the keys the replay backend looks up,
+as a recording would store them: the list of frame dates and one RGBA
+thumbnail per frame. Frames 1 and 2 are meant to be filtered out, the first
+for being mostly masked and the second for being all cloud.
+
+Write the fixture again when the Earth Engine expressions built by
+render_landsat() change:
+
+    python tests/landsat_fixture.py
+"""
+
+import io
+import json
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from common import ee_backend  # noqa: E402
+from timelapse.estimate import frame_size  # noqa: E402
+
+FIXTURES_DIR = os.path.join(APP_DIR, "tests", "fixtures", "landsat")
+COLLECTION = "Landsat TM-ETM-OLI Surface Reflectance"
+BOUNDS = (-115.3, 36.0, -115.1, 36.2)
+DIMENSIONS = 64
+DATES = ["2020-06-01", "2021-06-01", "2022-06-01", "2023-06-01"]
+PARAMS = {
+    "start_year": 2020,
+    "end_year": 2023,
+    "start_date": "06-10",
+    "end_date": "09-20",
+    "bands": ["NIR", "Red", "Green"],
+    "apply_fmask": True,
+    "frequency": "year",
+    "speed": 5,
+    "max_mb": 0,
+    "min_valid": 0.5,
+    "max_cloud": 0.8,
+    "quality_action": "drop",
+    "title": "Las Vegas",
+    "font_type": "arial.ttf",
+    "font_size": 12,
+    "font_color": "#ffffff",
+    "progress_bar_color": "#0000ff",
+    "fading": 0.0,
+    "formats": ["gif"],
+}
+
+
+def region():
+    """Returns the ROI of the fixture."""
+    import ee
+
+    return ee.Geometry.BBox(*BOUNDS)
+
+
+def synthetic_frames():
+    """Returns the four RGBA frames of the fixture."""
+    width, height = frame_size(BOUNDS, DIMENSIONS)
+    y, x = np.mgrid[:height, :width]
+    land = np.stack(
+        [80 + x % 64, 60 + y % 64, np.full_like(x, 40), np.full_like(x, 255)], axis=-1
+    ).astype(np.uint8)
+
+    masked = land.copy()
+    masked[: height * 4 // 5, :, 3] = 0
+    cloud = np.full_like(land, 230)
+    cloud[..., 3] = 255
+    return [land, masked, cloud, land[:, ::-1]]
+
+
+class _Writer(ee_backend.ReplayBackend):
+    """Answers the dates request with DATES and records it."""
+
+    def compute_value(self, obj):
+        os.makedirs(os.path.join(self.fixtures_dir, "values"), exist_ok=True)
+        key = ee_backend.request_key(obj)
+        with open(os.path.join(self.fixtures_dir, "values", f"{key}.json"), "w") as f:
+            json.dump(DATES, f)
+        return DATES
+
+
+def write_fixtures(fixtures_dir=FIXTURES_DIR):
+    """Writes the responses render_landsat() needs for PARAMS."""
+    import ee
+
+    from timelapse.frames import frame_requests
+    from timelapse.landsat import landsat_collection
+
+    with ee_backend.installed(_Writer(fixtures_dir)):
+        roi = region()
+        col, text_sequence = landsat_collection(
+            roi,
+            PARAMS["start_year"],
+            PARAMS["end_year"],
+            PARAMS["start_date"],
+            PARAMS["end_date"],
+            bands=PARAMS["bands"],
+            apply_fmask=PARAMS["apply_fmask"],
+            frequency=PARAMS["frequency"],
+        )
+        frames = synthetic_frames()
+        assert len(text_sequence) == len(frames)
+
+        params = frame_requests(roi, DIMENSIONS, "EPSG:3857")[0][0]
+        images = col.toList(len(frames))
+        os.makedirs(os.path.join(fixtures_dir, "thumbs"), exist_ok=True)
+        for i, frame in enumerate(frames):
+            key = ee_backend.request_key(ee.Image(images.get(i)), params)
+            buf = io.BytesIO()
+            Image.fromarray(frame).save(buf, "png")
+            with open(os.path.join(fixtures_dir, "thumbs", key), "wb") as f:
+                f.write(buf.getvalue())
+
+
+if __name__ == "__main__":
+    write_fixtures()
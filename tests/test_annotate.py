@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from timelapse.annotate import annotate_frames, fade_frames, paste_image, resolve_xy
+
+
+def frames(count=4, height=40, width=60):
+    return np.zeros((count, height, width, 3), dtype=np.uint8)
+
+
+def test_resolve_xy():
+    assert resolve_xy(("10%", "50%"), 200, 100) == (20, 50)
+    assert resolve_xy((3, 4), 200, 100) == (3, 4)
+    assert resolve_xy(None, 200, 100) == (10, 5)
+
+
+def test_progress_bar_grows_with_the_frames():
+    out = annotate_frames(frames(), progress_bar_color="#ff0000")
+    bar = out[:, -1, :, 0] == 255
+    assert bar.sum(axis=1).tolist() == [15, 30, 45, 60]
+    assert (out[:, :-5] == 0).all()
+
+
+def test_labels_differ_per_frame():
+    out = annotate_frames(
+        frames(2), ["2020", "2021"], font_size=12, add_progress_bar=False
+    )
+    assert out[0].any()
+    assert not np.array_equal(out[0], out[1])
+
+
+def test_paste_image_in_the_bottom_right_corner():
+    out = frames(2)
+    colorbar = Image.new("RGBA", (40, 10), (0, 0, 255, 255))
+    paste_image(out, colorbar, size=(20, 20))
+    assert (out[:, 25:30, 30:50] == (0, 0, 255)).all()
+    assert not out[:, :25].any() and not out[:, :, :30].any()
+
+
+def test_title_is_on_every_frame():
+    out = annotate_frames(
+        frames(3), title="T", title_xy=(0, 0), font_size=20, add_progress_bar=False
+    )
+    assert all(frame.any() for frame in out)
+    assert np.array_equal(out[0], out[2])
+
+
+def test_text_sequence_must_match_the_frames():
+    with pytest.raises(ValueError):
+        annotate_frames(frames(3), ["2020", "2021"])
+
+
+def test_fade_frames():
+    stack = np.stack([np.zeros((2, 2, 3)), np.full((2, 2, 3), 90)]).astype(np.uint8)
+    out = fade_frames(stack, fps=2, duration=1.0)
+    assert out[:, 0, 0, 0].tolist() == [0, 30, 60, 90]
+    assert fade_frames(stack, fps=2, duration=0).shape == stack.shape
+
+
+def test_fading_is_shortened_to_the_memory_cap():
+    stack = np.zeros((5, 10, 10, 3), dtype=np.uint8)
+    assert len(fade_frames(stack, fps=5, duration=1.0)) == 5 + 4 * 5
+    # Room for 13 frames, i.e., 2 inserted per transition.
+    out = fade_frames(stack, fps=5, duration=1.0, max_bytes=13 * 300)
+    assert len(out) == 5 + 4 * 2
+    assert len(fade_frames(stack, fps=5, max_bytes=5 * 300)) == 5
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+from common import artifacts
+from common.artifacts import ArtifactManager
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(artifacts.time, "time", clock)
+    return clock
+
+
+def write(manager, suffix=".gif", session=None, size=10, ttl=None):
+    path = manager.new_path(suffix, session, ttl)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return path
+
+
+def test_files_expire_after_their_ttl(tmp_path, clock):
+    manager = ArtifactManager(str(tmp_path), quota_bytes=10**6, ttl=60)
+    short = write(manager)
+    long = write(manager, ttl=600)
+
+    clock.now += 30
+    assert manager.sweep()["expired"] == 0
+    clock.now += 60
+    assert manager.sweep()["expired"] == 1
+    assert not os.path.exists(short)
+    assert os.path.exists(long)
+
+
+def test_siblings_share_the_owner_of_their_gif(tmp_path, clock):
+    manager = ArtifactManager(str(tmp_path), quota_bytes=10**6, ttl=60)
+    gif = write(manager)
+    mp4 = gif.replace(".gif", ".mp4")
+    with open(mp4, "wb") as f:
+        f.write(b"x")
+
+    manager.pin("a", [gif])
+    clock.now += 120
+    manager.sweep()
+    assert os.path.exists(mp4)
+    manager.pin("a", [])
+    manager.sweep()
+    assert not os.path.exists(gif)
+    assert not os.path.exists(mp4)
+
+
+def test_least_recently_used_files_are_evicted_over_quota(tmp_path, clock):
+    manager = ArtifactManager(str(tmp_path), quota_bytes=25, ttl=3600)
+    a = write(manager)
+    clock.now += 1
+    b = write(manager)
+    clock.now += 1
+    c = write(manager)
+    clock.now += 1
+    # Displaying a marks it as recently used.
+    manager.pin("s", [a])
+    manager.pin("s", [])
+
+    assert manager.sweep()["evicted"] == 1
+    assert os.path.exists(a)
+    assert not os.path.exists(b)
+    assert os.path.exists(c)
+
+
+def test_pinned_files_are_never_evicted(tmp_path, clock):
+    manager = ArtifactManager(str(tmp_path), quota_bytes=5, ttl=3600)
+    a = write(manager)
+    b = write(manager)
+    manager.pin("s", [a, b])
+
+    assert manager.sweep()["evicted"] == 0
+    assert manager.metrics()["pinned_files"] == 2
+
+
+def test_files_of_ended_sessions_are_released(tmp_path, clock):
+    manager = ArtifactManager(str(tmp_path), quota_bytes=10**6, ttl=3600)
+    gone = write(manager, session="gone")
+    alive = write(manager, session="alive")
+    shared = write(manager)
+    manager.pin("gone", [gone])
+
+    removed = manager.sweep(is_active=lambda session: session == "alive")
+    assert removed["released"] == 1
+    assert not os.path.exists(gone)
+    assert os.path.exists(alive)
+    assert os.path.exists(shared)
+
+
+def test_files_left_by_another_process_expire(tmp_path, clock):
+    path = tmp_path / "leftover.gif"
+    path.write_bytes(b"x")
+    os.utime(path, (clock.now - 7200, clock.now - 7200))
+
+    manager = ArtifactManager(str(tmp_path), quota_bytes=10**6, ttl=3600)
+    assert manager.sweep()["expired"] == 1
+    assert not path.exists()
+
+
+def test_temporary(tmp_path):
+    manager = ArtifactManager(str(tmp_path))
+    with manager.temporary(".zip") as path:
+        with open(path, "wb") as f:
+            f.write(b"x")
+    assert not os.path.exists(path)
+    assert manager.metrics()["files"] == 0
+
+
+def test_public_quota_keeps_static_under_the_limit(tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    public, prerender = static / "artifacts", static / "prerendered"
+    for directory in [public, prerender]:
+        directory.mkdir(parents=True)
+    monkeypatch.setattr(artifacts, "MAX_STATIC_BYTES", 1000)
+    monkeypatch.setattr(artifacts, "PRERENDER_QUOTA_BYTES", 300)
+
+    def quota(configured):
+        return artifacts.public_quota(
+            configured, str(static), str(public), str(prerender)
+        )
+
+    assert quota(500) == 500
+    (public / "left.gif").write_bytes(b"x" * 900)
+    assert quota(800) == 700
+    (static / "logo.png").write_bytes(b"x" * 100)
+    (prerender / "sample.gif").write_bytes(b"x" * 400)
+    assert quota(800) == 500
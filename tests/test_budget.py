@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from timelapse import budget
+from timelapse.budget import MB, fit_ratio, format_plan, gif_bytes, plan_output
+from timelapse.estimate import BYTES_PER_PIXEL
+
+LANDSAT = "Landsat TM-ETM-OLI Surface Reflectance"
+BOUNDS = (-115.3, 36.0, -115.1, 36.2)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return str(tmp_path / "costs.jsonl")
+
+
+def write_history(path, collection, ratio, count=budget.MIN_SAMPLES):
+    output = {"frames": 10, "frame_pixels": 10000, "colors": 256}
+    output["bytes"] = gif_bytes(10, 10000, 256, ratio)
+    with open(path, "a") as f:
+        for _ in range(count):
+            f.write(json.dumps({"collection": collection, "output": output}) + "\n")
+
+
+def test_fit_ratio_without_history(history):
+    assert fit_ratio(LANDSAT, history) == BYTES_PER_PIXEL
+
+
+def test_fit_ratio_prefers_the_collection(history):
+    write_history(history, "other", 0.2)
+    assert fit_ratio(LANDSAT, history) == pytest.approx(0.2)
+    write_history(history, LANDSAT, 0.4)
+    assert fit_ratio(LANDSAT, history) == pytest.approx(0.4)
+
+
+def test_small_request_is_unchanged(history):
+    plan = plan_output(LANDSAT, BOUNDS, 10, 768, 5, 20 * MB, history_file=history)
+    assert plan["fits"]
+    assert (plan["dimensions"], plan["colors"], plan["step"]) == (768, 256, 1)
+    assert format_plan(plan) == "Planned 768 px, 256 colors"
+
+
+def test_gives_up_colors_first(history):
+    full = plan_output(LANDSAT, None, 40, 768, 5, 1000 * MB, history_file=history)
+    plan = plan_output(
+        LANDSAT, None, 40, 768, 5, full["predicted"] * 0.9, history_file=history
+    )
+    assert plan["fits"]
+    assert plan["colors"] < 256
+    assert (plan["dimensions"], plan["step"]) == (768, 1)
+
+
+def test_then_dimensions_then_frames(history):
+    plan = plan_output(LANDSAT, None, 40, 768, 5, 5 * MB, history_file=history)
+    assert plan["fits"]
+    assert plan["step"] == 1
+    assert plan["dimensions"] < 768
+
+    plan = plan_output(LANDSAT, None, 100, 768, 10, 3 * MB, history_file=history)
+    assert plan["fits"]
+    assert plan["step"] > 1
+    # Subsampled frames play slower, so the duration is kept.
+    assert plan["fps"] == round(10 / plan["step"])
+
+
+def test_fading_counts_inserted_frames(history):
+    plain = plan_output(LANDSAT, None, 20, 512, 5, 1000 * MB, history_file=history)
+    faded = plan_output(
+        LANDSAT, None, 20, 512, 5, 1000 * MB, fading=1.0, history_file=history
+    )
+    assert faded["predicted"] > plain["predicted"] * 5
+
+
+def test_impossible_budget_does_not_fit(history):
+    plan = plan_output(LANDSAT, None, 400, 768, 5, 1, history_file=history)
+    assert not plan["fits"]
+    assert plan["dimensions"] >= budget.MIN_DIMENSIONS
+    assert plan["step"] == budget.STEPS[-1]
@@ -0,0 +1,48 @@
+import sys
+import threading
+
+import ee
+import pytest
+
+from common import ee_backend
+from common.scheduler import inherit
+
+
+@pytest.fixture
+def replay(tmp_path):
+    backend = ee_backend.ReplayBackend(str(tmp_path))
+    with ee_backend.installed(backend):
+        yield backend
+
+
+def test_algorithms_are_loaded_from_the_data_directory(tmp_path):
+    sys.modules.pop("ee.apitestcase", None)
+    algorithms = ee_backend.ReplayBackend(str(tmp_path)).algorithms()
+    assert "Image.constant" in algorithms
+    assert "ee.apitestcase" not in sys.modules
+
+
+def test_backend_is_only_installed_in_its_context(replay):
+    def get_info():
+        try:
+            ee.Number(1).getInfo()
+        except ee.EEException as e:
+            return str(e)
+
+    assert "No recorded response" in get_info()
+    assert "No recorded response" in inherit(get_info)()
+
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(ee_backend._installed.get())
+    )
+    thread.start()
+    thread.join()
+    assert results == [None]
+
+
+def test_backend_is_uninstalled_after_the_block(tmp_path):
+    with ee_backend.installed(ee_backend.ReplayBackend(str(tmp_path))) as backend:
+        assert ee_backend.get_backend() is backend
+    assert ee_backend._installed.get() is None
+    assert ee.data._get_state().credentials != "replay"
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from common import ee_cache
+from common.ee_cache import MetadataCache
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    calls = []
+    cache = MetadataCache(str(tmp_path), ttl=60)
+    compute = lambda: calls.append(1) or {"bands": ["B1"]}  # noqa: E731
+
+    assert cache.get("k", compute) == {"bands": ["B1"]}
+    assert cache.get("k", compute) == {"bands": ["B1"]}
+    # A new process finds the value on disk.
+    assert MetadataCache(str(tmp_path)).get("k", compute) == {"bands": ["B1"]}
+    assert len(calls) == 1
+
+
+def test_expired_values_are_computed_again(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ee_cache.time, "time", lambda: now[0])
+    cache = MetadataCache(str(tmp_path), ttl=60)
+    values = iter([1, 2])
+
+    assert cache.get("k", lambda: next(values)) == 1
+    now[0] += 61
+    assert cache.get("k", lambda: next(values)) == 2
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = MetadataCache(str(tmp_path))
+
+    def fail():
+        raise ValueError("no such asset")
+
+    with pytest.raises(ValueError):
+        cache.get("k", fail)
+    assert cache.get("k", lambda: 1) == 1
+
+
+def test_concurrent_lookups_share_one_request():
+    cache = MetadataCache(cache_dir=None)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("k", compute)))
+        for _ in range(4)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats["shared"] < 3:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["value"] * 4
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    cache = MetadataCache(cache_dir=None, max_entries=2)
+    cache.get("a", lambda: 1)
+    cache.get("b", lambda: 2)
+    cache.get("a", lambda: 0)
+    cache.get("c", lambda: 3)
+
+    assert cache.get("a", lambda: 0) == 1
+    assert cache.get("b", lambda: 0) == 0
+
+
+def test_invalidate(tmp_path):
+    cache = MetadataCache(str(tmp_path))
+    cache.get("k", lambda: 1)
+    cache.invalidate("k")
+    assert cache.get("k", lambda: 2) == 2
+
+
+def test_band_names_do_not_wait_for_the_date_range(tmp_path, monkeypatch):
+    cache = MetadataCache(str(tmp_path))
+    monkeypatch.setattr(ee_cache, "cache", cache)
+    cache.get("image:ID", lambda: {"bands": ["B1", "B2"], "properties": []})
+
+    def fail():
+        raise TimeoutError("minMax timed out")
+
+    with pytest.raises(TimeoutError):
+        cache.get("dates:ID", fail)
+    assert ee_cache.band_names("ID") == ["B1", "B2"]
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from timelapse import encode
+from timelapse.encode import (
+    encode_frames,
+    format_report,
+    quantize,
+    read_gif,
+    shared_palette,
+)
+from timelapse.jobs import Cancelled, CancelToken
+
+
+def stripes(count=3, height=16, width=24):
+    out = np.zeros((count, height, width, 3), dtype=np.uint8)
+    for i in range(count):
+        out[i, :, : width // 2] = (200, 40, 40)
+        out[i, :, width // 2 :] = (40, 40, 200)
+        out[i, i] = 255
+    return out
+
+
+def test_shared_palette_and_quantize():
+    frames = stripes()
+    palette = shared_palette(frames, colors=4)
+    indices = quantize(frames, palette)
+    assert indices.shape == frames.shape[:3]
+    assert np.abs(palette[indices].astype(int) - frames).max() <= 8
+
+
+def test_gif_and_webp_round_trip(tmp_path):
+    frames = stripes()
+    out_gif = str(tmp_path / "timelapse.gif")
+    report = encode_frames(frames, out_gif, fps=4, formats=("gif", "webp"))
+
+    assert report["gif"]["bytes"] > 0
+    assert report["webp"]["path"] == str(tmp_path / "timelapse.webp")
+    decoded = read_gif(out_gif)
+    assert decoded.shape == frames.shape
+    assert np.abs(decoded.astype(int) - frames).max() <= 8
+    assert format_report(report).startswith("GIF:")
+
+
+def test_palette_size_follows_the_plan(tmp_path):
+    frames = stripes()
+    out_gif = str(tmp_path / "timelapse.gif")
+    report = encode_frames(frames, out_gif, formats=("gif",), plan={"colors": 2})
+    assert len(np.unique(read_gif(out_gif).reshape(-1, 3), axis=0)) <= 2
+    assert report["gif"]["bytes"] > 0
+
+
+def test_cancelled_encoding_leaves_no_output(tmp_path):
+    token = CancelToken()
+    token.cancel()
+    out_gif = tmp_path / "timelapse.gif"
+    try:
+        encode_frames(stripes(), str(out_gif), formats=("gif",), cancel=token)
+    except Cancelled:
+        pass
+    else:
+        raise AssertionError("Cancelled was not raised")
+    assert not out_gif.exists()
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("encoder failed")
+
+
+def test_failed_secondary_format_is_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(encode, "encode_webp", fail)
+    out_gif = str(tmp_path / "timelapse.gif")
+    report = encode_frames(stripes(), out_gif, formats=("gif", "webp"))
+    assert report["gif"]["bytes"] > 0
+    assert report["webp"] == {"error": "encoder failed"}
+    assert "WEBP: failed" in format_report(report)
+
+
+def test_failed_gif_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(encode, "encode_gif", fail)
+    out_gif = str(tmp_path / "timelapse.gif")
+    with pytest.raises(RuntimeError):
+        encode_frames(stripes(), out_gif, formats=("gif", "webp"))
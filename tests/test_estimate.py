@@ -0,0 +1,130 @@
+import pytest
+
+from timelapse import estimate
+from timelapse.estimate import admit, calibration, count_frames, frame_size
+
+LANDSAT = "Landsat TM-ETM-OLI Surface Reflectance"
+BOUNDS = (-115.3, 36.0, -115.1, 36.2)
+
+
+@pytest.fixture
+def uncalibrated(monkeypatch):
+    monkeypatch.setattr(
+        estimate, "calibration", lambda collection: {"seconds": 1.0, "bytes": 1.0}
+    )
+
+
+def cost(frames, width, height=None, dimensions=768):
+    height = width if height is None else height
+    return {
+        "dimensions": dimensions,
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "frame_pixels": width * height,
+        "pixels": frames * width * height,
+        "bytes": 0,
+        "seconds": 60,
+    }
+
+
+def test_count_frames():
+    assert count_frames(LANDSAT, "2000-01-01", "2020-01-01") == 20
+    assert count_frames(LANDSAT, "2020-01-01", "2020-12-31", "month") == 12
+    goes = "Geostationary Operational Environmental Satellites (GOES)"
+    assert count_frames(goes, "2021-01-01", "2021-01-02", scan="conus") == 288
+
+
+def test_frame_size_keeps_the_longest_side():
+    assert frame_size((0, 0, 10, 1), 768)[0] == 768
+    assert frame_size((0, 0, 1, 10), 768)[1] == 768
+    assert frame_size((0, 0, 0, 0), 768) == (768, 768)
+
+
+def test_estimate_cost(uncalibrated):
+    result = estimate.estimate_cost(LANDSAT, BOUNDS, "2000-01-01", "2020-01-01")
+    assert result["frames"] == 20
+    assert (result["width"], result["height"]) == frame_size(BOUNDS, 768)
+    assert result["pixels"] == result["frames"] * result["frame_pixels"]
+
+
+def test_admit_ok():
+    action, dimensions, _ = admit(cost(20, 768))
+    assert (action, dimensions) == ("ok", 768)
+
+
+def test_admit_refuses_too_many_frames():
+    action, _, message = admit(cost(estimate.MAX_FRAMES + 1, 256))
+    assert action == "refuse"
+    assert "frames" in message
+
+
+def test_admit_downscales_large_frames():
+    action, dimensions, _ = admit(cost(1, 4000))
+    assert action == "downscale"
+    assert dimensions < 768
+    # Each tile is a request of its own.
+    assert admit(cost(1, 4000), tiles=2)[0] == "ok"
+
+
+def test_admit_refuses_below_min_dimensions():
+    action, dimensions, _ = admit(cost(estimate.MAX_FRAMES, 4000))
+    assert (action, dimensions) == ("refuse", 768)
+
+
+def test_admit_warns_on_long_requests():
+    assert admit(cost(100, 768))[0] == "warn"
+
+
+def test_calibration_from_history(tmp_path):
+    history = str(tmp_path / "costs.jsonl")
+    predicted = {
+        "collection": LANDSAT,
+        "frames": 10,
+        "pixels": 1,
+        "model": {"seconds": 10.0, "bytes": 1000},
+    }
+    for seconds in [20, 20, 30]:
+        estimate.record_cost(predicted, seconds, history_file=history)
+    factors = calibration(LANDSAT, history)
+    assert factors["seconds"] == 2.0
+    assert calibration("other", history)["seconds"] == 1.0
+
+
+def test_history_keeps_the_most_recent_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(estimate, "MAX_HISTORY", 5)
+    history = str(tmp_path / "costs.jsonl")
+    predicted = {
+        "collection": LANDSAT,
+        "frames": 10,
+        "pixels": 1,
+        "model": {"seconds": 10.0, "bytes": 1000},
+    }
+    for seconds in range(1, 9):
+        estimate.record_cost(predicted, seconds, history_file=history)
+    with open(history) as f:
+        assert len(f.readlines()) == 5
+    records = estimate.read_history(history)
+    assert [r["actual"]["seconds"] for r in records] == [4, 5, 6, 7, 8]
+
+
+def test_calibration_is_cached_until_the_history_changes(tmp_path, monkeypatch):
+    history = str(tmp_path / "costs.jsonl")
+    predicted = {
+        "collection": LANDSAT,
+        "frames": 10,
+        "pixels": 1,
+        "model": {"seconds": 10.0, "bytes": 1000},
+    }
+    estimate.record_cost(predicted, 20, history_file=history)
+    assert calibration(LANDSAT, history)["seconds"] == 2.0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the history was read again")
+
+    with monkeypatch.context() as m:
+        m.setattr(estimate, "open", fail, raising=False)
+        assert calibration(LANDSAT, history)["seconds"] == 2.0
+
+    estimate.record_cost(predicted, 40, history_file=history)
+    assert calibration(LANDSAT, history)["seconds"] == 4.0
@@ -0,0 +1,49 @@
+import pytest
+
+from common import geocode
+from common.ee_cache import MetadataCache
+from common.geocode import Place, normalize
+
+
+class FakeGazetteer:
+    places = [
+        Place("Washington", 47.4, -120.5),
+        Place("Washington County, OR", 45.5, -123.1),
+    ]
+
+    def lookup(self, query):
+        return [p for p in self.places if normalize(p.address) == query]
+
+    def suggest(self, prefix, limit=10):
+        return [p for p in self.places if normalize(p.address).startswith(prefix)]
+
+
+@pytest.fixture
+def local(monkeypatch):
+    monkeypatch.setattr(geocode, "cache", MetadataCache(cache_dir=None, ttl=60))
+    monkeypatch.setattr(geocode, "gazetteer", lambda: FakeGazetteer())
+
+
+def test_normalize():
+    assert normalize("Knoxville, TN") == normalize("knoxville  tn") == "knoxville tn"
+    assert normalize("São Paulo") == "sao paulo"
+
+
+def test_gazetteer_matches_are_merged_with_the_service(local, monkeypatch):
+    rows = [["Washington, District of Columbia", 38.9, -77.0], ["Washington", 0, 0]]
+    monkeypatch.setattr(geocode, "_search", lambda query, max_rows: rows)
+    places = geocode.geocode("washington")
+    assert [p.address for p in places] == [
+        "Washington",
+        "Washington, District of Columbia",
+    ]
+    assert places[0].lat == 47.4
+
+
+def test_service_failure_falls_back_to_the_gazetteer(local, monkeypatch):
+    def fail(query, max_rows):
+        raise OSError("unavailable")
+
+    monkeypatch.setattr(geocode, "_search", fail)
+    places = geocode.geocode("Washington")
+    assert [p.address for p in places] == ["Washington", "Washington County, OR"]
@@ -0,0 +1,70 @@
+import pytest
+
+from timelapse import jobs
+from timelapse.jobs import Cancelled, CancelToken, JobRegistry, check
+
+
+def test_cancel_token():
+    token = CancelToken("a")
+    check(token)
+    check(None)
+    token.cancel("first")
+    token.cancel("second")
+    assert token.cancelled
+    assert token.wait(0)
+    with pytest.raises(Cancelled, match="first"):
+        check(token)
+
+
+def test_new_job_supersedes_the_previous_one():
+    registry = JobRegistry()
+    first = registry.start("a")
+    other = registry.start("b")
+    second = registry.start("a")
+
+    assert first.cancelled
+    assert first.reason == "superseded by a newer request"
+    assert not second.cancelled
+    assert not other.cancelled
+    assert registry.metrics() == {
+        "running": 2,
+        "started": 3,
+        "superseded": 1,
+        "disconnected": 0,
+    }
+
+    # The superseded job ending does not forget the new one.
+    registry.finish(first)
+    assert registry.metrics()["running"] == 2
+    registry.finish(second)
+    assert registry.metrics()["running"] == 1
+
+
+def test_untracked_jobs():
+    registry = JobRegistry()
+    registry.start(None)
+    registry.start(None)
+    assert registry.metrics()["started"] == 0
+
+
+def test_sweep_cancels_disconnected_sessions():
+    registry = JobRegistry()
+    gone = registry.start("gone")
+    alive = registry.start("alive")
+    registry.sweep(lambda session: session == "alive")
+
+    assert gone.cancelled
+    assert gone.reason == "the session disconnected"
+    assert not alive.cancelled
+    assert registry.metrics()["disconnected"] == 1
+
+
+def test_job_context(monkeypatch):
+    registry = JobRegistry()
+    monkeypatch.setattr(jobs, "registry", registry)
+    with jobs.job("a") as outer:
+        with jobs.job("a") as inner:
+            assert outer.cancelled
+            assert registry.metrics()["running"] == 1
+        assert not inner.cancelled
+    assert registry.metrics()["running"] == 0
@@ -0,0 +1,69 @@
+import re
+
+import folium
+import folium.plugins
+import pytest
+import streamlit_folium
+
+from common.map_shell import render_shell, show_shell
+
+
+def shell_map():
+    m = folium.Map(location=[40, -100], zoom_start=4)
+    folium.plugins.Draw(export=True).add_to(m)
+    folium.TileLayer("CartoDB positron").add_to(m)
+    return m
+
+
+def layers(lat):
+    group = folium.FeatureGroup(name="roi")
+    folium.Marker([lat, -100]).add_to(group)
+    return group
+
+
+@pytest.fixture
+def component(monkeypatch):
+    calls = []
+
+    def component_func(**kwargs):
+        calls.append(kwargs)
+        return kwargs["default"]
+
+    monkeypatch.setattr(streamlit_folium, "_component_func", component_func)
+    return calls
+
+
+def normalize(kwargs):
+    # Folium names every element with a random suffix.
+    kwargs = {k: v for k, v in kwargs.items() if k not in ["id", "on_change"]}
+    return re.sub(r"_[0-9a-f]{32}", "", repr(kwargs))
+
+
+def test_matches_st_folium(component):
+    options = {
+        "key": "map",
+        "height": 600,
+        "returned_objects": ["last_active_drawing"],
+        "center": (40, -100),
+        "zoom": 5,
+    }
+    streamlit_folium.st_folium(
+        shell_map(),
+        use_container_width=True,
+        feature_group_to_add=layers(40),
+        render=False,
+        **options,
+    )
+    show_shell(render_shell(shell_map()), layers(40), **options)
+    expected, actual = component
+    assert normalize(actual) == normalize(expected)
+
+
+def test_shell_is_rendered_once(component):
+    shell = render_shell(shell_map())
+    show_shell(shell, layers(40))
+    show_shell(shell, layers(41))
+    first, second = component
+    assert first["script"] == second["script"]
+    assert first["header"] == second["header"]
+    assert "40" in first["feature_group"] and "41" in second["feature_group"]
@@ -0,0 +1,62 @@
+import datetime
+import os
+
+import pytest
+
+from timelapse import prerender
+
+LANDSAT = "Landsat TM-ETM-OLI Surface Reflectance"
+NDVI = "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km"
+DEPLOYED = datetime.date(2024, 12, 31)
+
+
+@pytest.fixture
+def manifest_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(prerender, "PRERENDER_DIR", str(tmp_path))
+    monkeypatch.setattr(prerender, "MANIFEST_FILE", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(prerender, "_cache", {"mtime": None, "manifest": {}})
+    return tmp_path
+
+
+def deploy(manifest_dir, collection, roi_name):
+    params = prerender.default_params(collection, roi_name, DEPLOYED)
+    key = prerender.render_key(collection, roi_name, params)
+    (manifest_dir / f"{key}.gif").write_bytes(b"GIF89a")
+    manifest = {key: {"params": params, "files": [f"{key}.gif"]}}
+    prerender.write_manifest(manifest)
+    return os.path.join(str(manifest_dir), f"{key}.gif")
+
+
+@pytest.mark.parametrize("collection", [LANDSAT, NDVI])
+@pytest.mark.parametrize(
+    "later", [DEPLOYED, datetime.date(2025, 1, 1), datetime.date(2026, 6, 30)]
+)
+def test_key_matches_defaults_on_later_dates(manifest_dir, collection, later):
+    roi_name = dict(prerender.jobs())[collection]
+    path = deploy(manifest_dir, collection, roi_name)
+
+    params = prerender.default_params(collection, roi_name, later)
+    assert prerender.prerendered(collection, roi_name, params, later) == path
+
+
+@pytest.mark.parametrize("collection", [LANDSAT, NDVI])
+def test_changed_end_date_does_not_match(manifest_dir, collection):
+    roi_name = dict(prerender.jobs())[collection]
+    deploy(manifest_dir, collection, roi_name)
+
+    today = datetime.date(2026, 6, 30)
+    params = prerender.default_params(collection, roi_name, today)
+    if collection == LANDSAT:
+        params["end_year"] = 2010
+    else:
+        params["end_date"] = "2010-01-01"
+    assert prerender.prerendered(collection, roi_name, params, today) is None
+
+
+def test_changed_form_value_does_not_match(manifest_dir):
+    roi_name = dict(prerender.jobs())[LANDSAT]
+    deploy(manifest_dir, LANDSAT, roi_name)
+
+    params = prerender.default_params(LANDSAT, roi_name, DEPLOYED)
+    params["speed"] = 10
+    assert prerender.prerendered(LANDSAT, roi_name, params, DEPLOYED) is None
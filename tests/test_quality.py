@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from timelapse.quality import filter_frames, format_quality, frame_stats
+
+
+def rgba(color, alpha=255, size=8):
+    frame = np.zeros((size, size, 4), dtype=np.uint8)
+    frame[..., :3] = color
+    frame[..., 3] = alpha
+    return frame
+
+
+LAND = rgba((90, 70, 40))
+CLOUD = rgba((240, 240, 240))
+
+
+def masked(fraction, size=8):
+    frame = LAND.copy()
+    frame[: int(size * fraction), :, 3] = 0
+    return frame
+
+
+def test_frame_stats():
+    stats = frame_stats(np.stack([LAND, masked(0.75), CLOUD]))
+    assert stats["valid"].tolist() == [1.0, 0.25, 1.0]
+    assert stats["cloud"].tolist() == [0.0, 0.0, 1.0]
+    assert stats["histogram"].sum(axis=1).tolist() == [64, 16, 64]
+
+
+def test_drops_masked_and_cloudy_frames_with_their_labels():
+    frames = [LAND, masked(0.75), CLOUD, LAND]
+    out, labels, report = filter_frames(
+        frames, ["a", "b", "c", "d"], min_valid=0.5, max_cloud=0.8
+    )
+    assert out.shape == (2, 8, 8, 3)
+    assert labels == ["a", "d"]
+    assert report["removed"] == 2
+    assert format_quality(report) == "Dropped 2 of 4 frames"
+
+
+def test_masked_pixels_are_black():
+    out, _, _ = filter_frames([LAND, masked(0.25)], min_valid=0.5)
+    assert (out[1, :2] == 0).all()
+    assert (out[1, 2:] == LAND[0, 0, :3]).all()
+
+
+def test_interpolates_rejected_frames():
+    frames = [rgba((100, 50, 0)), masked(1.0), rgba((200, 100, 0))]
+    out, labels, report = filter_frames(
+        frames, ["a", "b", "c"], min_valid=0.5, action="interpolate"
+    )
+    assert labels == ["a", "b", "c"]
+    assert report["removed"] == 1
+    assert out[1, 0, 0].tolist() == [150, 75, 0]
+    assert format_quality(report) == "Interpolated 1 of 3 frames"
+
+
+def test_keeps_all_frames_if_none_passes():
+    frames = [CLOUD, CLOUD]
+    out, labels, report = filter_frames(frames, ["a", "b"], max_cloud=0.5)
+    assert len(out) == 2
+    assert labels == ["a", "b"]
+    assert report["removed"] == 0
+    assert report["skipped"]
+    assert format_quality(report).startswith("No frame passed")
+
+
+def test_unknown_action():
+    with pytest.raises(ValueError):
+        filter_frames([LAND], action="blur")
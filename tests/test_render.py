@@ -0,0 +1,48 @@
+import pytest
+from PIL import Image
+
+import landsat_fixture
+from common import ee_backend
+from timelapse.render import render_landsat
+
+
+@pytest.fixture
+def replay():
+    backend = ee_backend.ReplayBackend(landsat_fixture.FIXTURES_DIR)
+    with ee_backend.installed(backend):
+        yield backend
+
+
+def test_render_landsat_from_replay(replay, tmp_path):
+    out_gif = str(tmp_path / "landsat.gif")
+    report = render_landsat(
+        landsat_fixture.COLLECTION,
+        landsat_fixture.region(),
+        landsat_fixture.BOUNDS,
+        landsat_fixture.PARAMS,
+        out_gif,
+        landsat_fixture.DIMENSIONS,
+    )
+
+    assert replay.stats["missing"] == 0
+    assert report["quality"]["frames"] == 4
+    assert report["quality"]["removed"] == 2
+    assert report["gif"]["bytes"] > 0
+    with Image.open(out_gif) as gif:
+        assert gif.n_frames == 2
+        assert gif.size == (52, 64)
+
+
+def test_render_landsat_reports_progress(replay, tmp_path):
+    messages = []
+    render_landsat(
+        landsat_fixture.COLLECTION,
+        landsat_fixture.region(),
+        landsat_fixture.BOUNDS,
+        landsat_fixture.PARAMS,
+        str(tmp_path / "landsat.gif"),
+        landsat_fixture.DIMENSIONS,
+        progress=lambda message, frames=None: messages.append(message),
+    )
+    assert "Fetching frames... 4/4" in messages
+    assert messages[-1].startswith("Encoding")
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from common.scheduler import FairScheduler, TokenBucket
+from timelapse.jobs import Cancelled, CancelToken
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError
+        time.sleep(0.005)
+
+
+def queue(scheduler, jobs):
+    """Queues the jobs one by one behind a held slot and returns their order."""
+    order = []
+    threads = []
+
+    def run(session, cost):
+        with scheduler.slot(session, cost):
+            order.append(session)
+
+    with scheduler.slot("holder"):
+        for i, (session, cost) in enumerate(jobs):
+            thread = threading.Thread(target=run, args=(session, cost))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: scheduler.metrics()["queued"] == i + 1)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.1, abs=0.02)
+    assert not bucket.full()
+
+
+def test_expensive_session_does_not_starve_others():
+    scheduler = FairScheduler(max_concurrent=1, rate=1000, burst=1000)
+    order = queue(scheduler, [("a", 10), ("a", 10), ("a", 10), ("b", 10)])
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_cheap_work_goes_first():
+    scheduler = FairScheduler(max_concurrent=1, rate=1000, burst=1000)
+    order = queue(scheduler, [("a", 100), ("a", 100), ("b", 1), ("b", 1)])
+    assert order == ["a", "b", "b", "a"]
+
+
+def test_cap_is_respected():
+    scheduler = FairScheduler(max_concurrent=3, rate=1000, burst=1000)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(i):
+        with scheduler.slot(f"s{i % 4}"):
+            with lock:
+                running.append(i)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(i)
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        list(executor.map(work, range(24)))
+    assert max(peak) <= 3
+    assert scheduler.metrics()["admitted"] == 24
+
+
+def test_cancel_while_queued():
+    scheduler = FairScheduler(max_concurrent=1, rate=1000, burst=1000)
+    token = CancelToken("a")
+    errors = []
+
+    def run():
+        try:
+            with scheduler.slot("a", cancel=token):
+                pass
+        except Cancelled as e:
+            errors.append(e)
+
+    with scheduler.slot("holder"):
+        thread = threading.Thread(target=run)
+        thread.start()
+        wait_until(lambda: scheduler.metrics()["queued"] == 1)
+        token.cancel("superseded")
+        thread.join(5)
+        assert scheduler.metrics()["queued"] == 0
+
+    assert [str(e) for e in errors] == ["superseded"]
+    assert scheduler.metrics()["cancelled"] == 1
+
+
+def test_nested_slots_and_inherited_workers_run_within_the_slot():
+    scheduler = FairScheduler(max_concurrent=1, rate=1000, burst=1000)
+    sessions = []
+
+    def fetch():
+        # Would wait forever if it needed a slot of its own.
+        with scheduler.slot():
+            sessions.append(scheduler._local.session)
+
+    with scheduler.slot("a"):
+        with scheduler.slot():
+            pass
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(scheduler.inherit(fetch)) for _ in range(2)]
+            for future in futures:
+                future.result(5)
+
+    assert sessions == ["a", "a"]
+    assert scheduler.metrics()["admitted"] == 1
+    assert scheduler.metrics()["running"] == 0
+
+
+def test_inherit_without_a_slot_uses_the_given_session():
+    scheduler = FairScheduler(max_concurrent=1, rate=1000, burst=1000)
+    sessions = []
+
+    def fetch():
+        with scheduler.slot():
+            sessions.append(scheduler._local.session)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(scheduler.inherit(fetch, "b")).result(5)
+    assert sessions == ["b"]
+    assert scheduler.metrics()["admitted"] == 1
+
+
+def test_metrics_are_logged_at_most_once_per_interval(caplog):
+    scheduler = FairScheduler(rate=1000, burst=1000, metrics_interval=0)
+    with caplog.at_level(logging.INFO, logger="common.scheduler"):
+        with scheduler.slot("a"):
+            pass
+    assert "wait_p95" in caplog.text
+
+    scheduler.metrics_interval = 3600
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="common.scheduler"):
+        with scheduler.slot("a"):
+            pass
+    assert "wait_p95" not in caplog.text
@@ -0,0 +1,52 @@
+import ee
+import pytest
+
+from common import ee_backend, tile_cache
+from common.ee_cache import MetadataCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = MetadataCache(cache_dir=None, ttl=60)
+    monkeypatch.setattr(tile_cache, "cache", cache)
+    with ee_backend.installed(ee_backend.ReplayBackend(str(tmp_path))):
+        yield cache
+
+
+def fake_get_map_id(calls):
+    def get_map_id(params):
+        calls.append(params)
+        name = f"map{len(calls)}"
+        return {
+            "mapid": name,
+            "token": "",
+            "tile_fetcher": ee.data.TileFetcher(
+                f"https://tiles/{name}/{{z}}/{{x}}/{{y}}"
+            ),
+        }
+
+    return get_map_id
+
+
+def test_map_ids_are_reused(cache):
+    calls = []
+    get_map_id = tile_cache.cached(fake_get_map_id(calls))
+
+    first = get_map_id({"image": ee.Image(1), "min": 0, "max": 1})
+    second = get_map_id({"image": ee.Image(1), "max": 1, "min": 0})
+    assert len(calls) == 1
+    assert first["mapid"] == second["mapid"] == "map1"
+    assert first["tile_fetcher"].url_format == second["tile_fetcher"].url_format
+    # Callers get their own dictionary.
+    first["extra"] = True
+    assert "extra" not in second
+
+
+def test_different_requests_are_not_shared(cache):
+    calls = []
+    get_map_id = tile_cache.cached(fake_get_map_id(calls))
+
+    get_map_id({"image": ee.Image(1), "min": 0, "max": 1})
+    get_map_id({"image": ee.Image(2), "min": 0, "max": 1})
+    get_map_id({"image": ee.Image(1), "min": 0, "max": 2})
+    assert len(calls) == 3
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from timelapse.estimate import frame_size
+from timelapse.tiling import mosaic, tile_grid
+
+BOUNDS = (-125.0, 24.0, -66.0, 50.0)
+
+
+@pytest.mark.parametrize("tiles", [1, 2, 3])
+def test_tiles_add_up_to_the_frame(tiles):
+    grid = tile_grid(BOUNDS, 1000, tiles)
+    width, height = frame_size(BOUNDS, 1000)
+
+    assert len(grid) == tiles
+    assert all(len(row) == tiles for row in grid)
+    assert sum(w for _, (w, _) in grid[0]) == width
+    assert sum(row[0][1][1] for row in grid) == height
+
+
+def test_tiles_share_their_edges():
+    grid = tile_grid(BOUNDS, 1000, 3)
+    minx, miny, maxx, maxy = BOUNDS
+
+    assert grid[0][0][0][0] == minx
+    assert grid[0][0][0][3] == pytest.approx(maxy)
+    assert grid[-1][-1][0][2] == pytest.approx(maxx)
+    assert grid[-1][-1][0][1] == pytest.approx(miny)
+    for row in grid:
+        for (left, _), (right, _) in zip(row, row[1:]):
+            assert left[2] == right[0]
+    for upper, lower in zip(grid, grid[1:]):
+        assert upper[0][0][1] == lower[0][0][3]
+
+
+def test_mosaic():
+    rows = [
+        [np.full((2, 3, 3), 1, np.uint8), np.full((2, 4, 3), 2, np.uint8)],
+        [np.full((5, 3, 3), 3, np.uint8), np.full((5, 4, 3), 4, np.uint8)],
+    ]
+    frame = mosaic(rows)
+    assert frame.shape == (7, 7, 3)
+    assert frame[0, 0, 0] == 1
+    assert frame[0, -1, 0] == 2
+    assert frame[-1, 0, 0] == 3
+    assert frame[-1, -1, 0] == 4
@@ -0,0 +1,10 @@
+"""Helpers for building satellite timelapses frame by frame."""
+
+from .annotate import annotate_frames, fade_frames, paste_image
+from .encode import encode_frames, format_report, read_gif
+from .frames import iter_frames, preview_strip
+from .goes import composite_fire, goes_collection, goes_dates, goes_fire_masks
+from .landsat import landsat_collection
+from .modis import modis_ndvi_collection, modis_timeseries_collection
+from .quality import filter_frames, frame_stats
+from .render import render_timelapse
@@ -0,0 +1,272 @@
+"""Vectorized titles, labels, progress bars, colorbars and fading for frame stacks.
+
+Everything that is the same across frames is rasterized once and blended over
+the whole stack with NumPy, instead of drawing on every frame with PIL.
+"""
+
+import importlib.resources
+
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+# Largest frame stack fade_frames() builds, in bytes. The stack is encoded in
+# memory, so long or large timelapses get shorter transitions instead.
+MAX_FADED_BYTES = 512 * 1024 * 1024
+
+
+def load_font(font_type="arial.ttf", font_size=20):
+    """Loads one of the fonts shipped with geemap, or a system font.
+
+    Args:
+        font_type (str, optional): Font file name. Defaults to "arial.ttf".
+        font_size (int, optional): Font size. Defaults to 20.
+
+    Returns:
+        ImageFont.FreeTypeFont: The font.
+    """
+    fonts_dir = importlib.resources.files("geemap").joinpath("data", "fonts")
+    if font_type in ["arial.ttf", "alibaba.otf"]:
+        return ImageFont.truetype(str(fonts_dir.joinpath(font_type)), font_size)
+    try:
+        return ImageFont.truetype(font_type, font_size)
+    except OSError:
+        return ImageFont.truetype(str(fonts_dir.joinpath("arial.ttf")), font_size)
+
+
+def resolve_xy(xy, width, height):
+    """Converts an xy position such as (10, 10) or ("2%", "90%") to pixels.
+
+    Args:
+        xy (tuple): The position, in pixels or as percentages of the frame size.
+        width (int): Frame width.
+        height (int): Frame height.
+
+    Returns:
+        tuple: The position in pixels.
+    """
+    if xy is None:
+        return int(0.05 * width), int(0.05 * height)
+    x, y = xy
+    if isinstance(x, str):
+        x = int(float(x.replace("%", "")) / 100.0 * width)
+    if isinstance(y, str):
+        y = int(float(y.replace("%", "")) / 100.0 * height)
+    return int(x), int(y)
+
+
+def render_text(texts, font):
+    """Rasterizes text labels into alpha masks that share one bounding box.
+
+    Identical labels are rasterized only once.
+
+    Args:
+        texts (list): The labels.
+        font (ImageFont.FreeTypeFont): The font.
+
+    Returns:
+        np.ndarray: Alpha masks as a (labels, height, width) float32 array.
+    """
+    boxes = [font.getbbox(text) for text in set(texts)]
+    width = max(1, max(box[2] for box in boxes))
+    height = max(1, max(box[3] for box in boxes))
+
+    rendered = {}
+    for text in set(texts):
+        mask = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(mask).text((0, 0), text, font=font, fill=255)
+        rendered[text] = np.asarray(mask, dtype=np.float32) / 255
+    return np.stack([rendered[text] for text in texts])
+
+
+def blend(frames, alpha, color, x, y):
+    """Blends a color into all frames through per-frame alpha masks, in place.
+
+    Args:
+        frames (np.ndarray): The frames as a (frames, height, width, 3) uint8 array.
+        alpha (np.ndarray): A (height, width) mask shared by all frames, or a
+            (frames, height, width) mask per frame.
+        color (tuple): The RGB color.
+        x (int): Left edge of the mask in the frames.
+        y (int): Top edge of the mask in the frames.
+    """
+    h, w = alpha.shape[-2:]
+    h = min(h, frames.shape[1] - y)
+    w = min(w, frames.shape[2] - x)
+    if h <= 0 or w <= 0:
+        return
+    alpha = alpha[..., :h, :w, np.newaxis]
+    region = frames[:, y : y + h, x : x + w].astype(np.float32)
+    region += (np.asarray(color, dtype=np.float32) - region) * alpha
+    frames[:, y : y + h, x : x + w] = region.round().astype(np.uint8)
+
+
+def progress_masks(count, width, height=5):
+    """Precomputes the progress bar of every frame.
+
+    Args:
+        count (int): Number of frames.
+        width (int): Frame width.
+        height (int, optional): Height of the bar in pixels. Defaults to 5.
+
+    Returns:
+        np.ndarray: Masks as a (frames, height, width) float32 array.
+    """
+    ends = np.arange(1, count + 1) / count * width
+    masks = np.arange(width)[np.newaxis] < ends[:, np.newaxis]
+    return np.repeat(masks[:, np.newaxis], height, axis=1).astype(np.float32)
+
+
+def annotate_frames(
+    frames,
+    text_sequence=None,
+    xy=("3%", "3%"),
+    title=None,
+    title_xy=("2%", "90%"),
+    font_type="arial.ttf",
+    font_size=20,
+    font_color="#ffffff",
+    add_progress_bar=True,
+    progress_bar_color="white",
+    progress_bar_height=5,
+):
+    """Adds a title, per-frame labels and a progress bar to a frame stack.
+
+    Args:
+        frames (np.ndarray | list): The frames as RGB arrays.
+        text_sequence (list, optional): One label per frame, e.g., the dates.
+            Defaults to None.
+        xy (tuple, optional): Top left corner of the labels. Defaults to
+            ("3%", "3%").
+        title (str, optional): A title shown on all frames. Defaults to None.
+        title_xy (tuple, optional): Top left corner of the title. Defaults to
+            ("2%", "90%").
+        font_type (str, optional): Font type. Defaults to "arial.ttf".
+        font_size (int, optional): Font size. Defaults to 20.
+        font_color (str, optional): Font color. Defaults to "#ffffff".
+        add_progress_bar (bool, optional): Whether to add a progress bar at the
+            bottom of the frames. Defaults to True.
+        progress_bar_color (str, optional): Color of the progress bar. Defaults to
+            "white".
+        progress_bar_height (int, optional): Height of the progress bar. Defaults
+            to 5.
+
+    Returns:
+        np.ndarray: The annotated frames as a (frames, height, width, 3) array.
+    """
+    frames = np.array(frames, dtype=np.uint8)
+    count, height, width = frames.shape[:3]
+    font = load_font(font_type, font_size)
+    color = ImageColor.getrgb(font_color)[:3]
+
+    if title:
+        x, y = resolve_xy(title_xy, width, height)
+        blend(frames, render_text([title], font)[0], color, x, y)
+
+    if text_sequence is not None:
+        if len(text_sequence) != count:
+            raise ValueError(
+                f"The length of the text sequence must be equal to the number "
+                f"({count}) of frames."
+            )
+        x, y = resolve_xy(xy, width, height)
+        labels = render_text([str(text) for text in text_sequence], font)
+        blend(frames, labels, color, x, y)
+
+    if add_progress_bar:
+        masks = progress_masks(count, width, progress_bar_height)
+        bar_color = ImageColor.getrgb(progress_bar_color)[:3]
+        blend(frames, masks, bar_color, 0, height - progress_bar_height)
+
+    return frames
+
+
+def paste_image(frames, image, xy=None, size=(300, 300)):
+    """Pastes an image, e.g., a colorbar, on all frames in place.
+
+    Args:
+        frames (np.ndarray): The frames as a (frames, height, width, 3) uint8 array.
+        image (PIL.Image.Image): The image. Its alpha channel, if any, is kept.
+        xy (tuple, optional): Top left corner of the image. Defaults to None,
+            the bottom right corner of the frames, like geemap.add_image_to_gif().
+        size (tuple, optional): Maximum size of the image. Defaults to
+            (300, 300).
+    """
+    image = image.convert("RGBA")
+    image.thumbnail(size, Image.LANCZOS)
+    height, width = frames.shape[1:3]
+    if xy is None:
+        x, y = width - image.width - 10, height - image.height - 10
+    else:
+        x, y = resolve_xy(xy, width, height)
+    x, y = max(0, x), max(0, y)
+
+    rgba = np.asarray(image, dtype=np.float32)[: height - y, : width - x]
+    h, w = rgba.shape[:2]
+    alpha = rgba[..., 3:] / 255
+    region = frames[:, y : y + h, x : x + w].astype(np.float32)
+    region += (rgba[..., :3] - region) * alpha
+    frames[:, y : y + h, x : x + w] = region.round().astype(np.uint8)
+
+
+def fade_steps(count, frame_pixels, fps, duration=1.0, max_bytes=MAX_FADED_BYTES):
+    """Returns the number of cross-fade frames inserted between two frames.
+
+    Args:
+        count (int): Number of frames.
+        frame_pixels (int): Pixels per frame.
+        fps (int): Frames per second of the output animation.
+        duration (float, optional): Fading duration in seconds. Defaults to 1.0.
+        max_bytes (int, optional): Maximum size of the RGB stack with the
+            transitions inserted. Defaults to MAX_FADED_BYTES.
+
+    Returns:
+        int: The number of frames per transition, lowered to fit max_bytes.
+    """
+    steps = int(round(duration * fps))
+    if count < 2:
+        return 0
+    room = max_bytes // max(3 * frame_pixels, 1) - count
+    return max(0, min(steps, room // (count - 1)))
+
+
+def fade_frames(frames, fps, duration=1.0, batch_size=8, max_bytes=MAX_FADED_BYTES):
+    """Inserts cross-fade frames between consecutive frames.
+
+    The transitions are computed for batches of frame pairs at once, and
+    shortened so that the output stays under max_bytes.
+
+    Args:
+        frames (np.ndarray | list): The frames as RGB arrays.
+        fps (int): Frames per second of the output animation.
+        duration (float, optional): Fading duration in seconds. Defaults to 1.0.
+        batch_size (int, optional): Number of frame pairs blended per batch.
+            Defaults to 8.
+        max_bytes (int, optional): Maximum size of the output. Defaults to
+            MAX_FADED_BYTES.
+
+    Returns:
+        np.ndarray: The frames with the transitions inserted.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    steps = fade_steps(
+        len(frames), frames.shape[1] * frames.shape[2], fps, duration, max_bytes
+    )
+    if steps < 1:
+        return frames
+
+    count = len(frames)
+    weights = np.arange(1, steps + 1, dtype=np.float32) / (steps + 1)
+    weights = weights[np.newaxis, :, np.newaxis, np.newaxis, np.newaxis]
+    out = np.empty((count + (count - 1) * steps,) + frames.shape[1:], dtype=np.uint8)
+    out[:: steps + 1] = frames
+
+    for start in range(0, count - 1, batch_size):
+        stop = min(start + batch_size, count - 1)
+        a = frames[start:stop, np.newaxis].astype(np.float32)
+        b = frames[start + 1 : stop + 1, np.newaxis].astype(np.float32)
+        mixed = (a + (b - a) * weights).round().astype(np.uint8)
+        for i, transition in enumerate(mixed, start):
+            offset = i * (steps + 1) + 1
+            out[offset : offset + steps] = transition
+
+    return out
@@ -0,0 +1,183 @@
+"""Plan the dimensions, colors and frames of a timelapse to fit a size budget.
+
+The size of a GIF grows with the number of frames, the pixels per frame and
+the bits per pixel of its palette, scaled by how well the imagery compresses.
+That scale is fitted per collection on the outputs of past renders, which
+estimate.record_cost() appends to the cost history, so the planner can pick an
+output that lands under the budget before anything is rendered. The size of an
+MP4 is set by its bitrate, which follows from the budget and the duration.
+
+The planner gives up, in order: palette colors, then dimensions, then frames.
+"""
+
+import math
+import os
+
+from .annotate import fade_steps
+from .estimate import (
+    BYTES_PER_PIXEL,
+    HISTORY_FILE,
+    MIN_DIMENSIONS,
+    frame_size,
+    read_history,
+)
+
+MB = 1024 * 1024
+# Default size budget per output, overridable with an environment variable.
+MAX_OUTPUT_MB = int(os.environ.get("TIMELAPSE_MAX_OUTPUT_MB", 20))
+
+# Palette sizes tried before the dimensions are reduced.
+COLORS = [256, 128, 64]
+# Frame subsampling steps tried before giving up.
+STEPS = [1, 2, 3, 4]
+# The dimensions are reduced to no less than this fraction of the request.
+MIN_SCALE = 0.5
+# Quantile of the fitted compression ratios, so that most outputs fit.
+QUANTILE = 0.9
+# Renders of a collection needed before its own ratio is used.
+MIN_SAMPLES = 5
+# Above this bitrate the MP4 is encoded at constant quality instead.
+MAX_BITRATE = 8_000_000
+# Share of the budget given to the MP4 bitrate, for container overhead.
+MP4_HEADROOM = 0.9
+
+
+def palette_bits(colors):
+    """Returns the bits per pixel of a palette."""
+    return max(1.0, math.log2(colors))
+
+
+def gif_bytes(frames, frame_pixels, colors, ratio):
+    """Predicts the size of a GIF.
+
+    Args:
+        frames (int): Number of frames.
+        frame_pixels (int): Pixels per frame.
+        colors (int): Palette colors.
+        ratio (float): Bytes per pixel of an 8-bit palette, see fit_ratio().
+
+    Returns:
+        float: The predicted bytes.
+    """
+    return ratio * frames * frame_pixels * palette_bits(colors) / 8
+
+
+def fit_ratio(collection=None, history_file=HISTORY_FILE, limit=200):
+    """Fits the compression ratio of GIF outputs on past renders.
+
+    Args:
+        collection (str, optional): The collection. Its own renders are used if
+            there are enough of them, all renders otherwise. Defaults to None.
+        history_file (str, optional): The cost history. Defaults to
+            HISTORY_FILE.
+        limit (int, optional): Number of most recent renders used. Defaults
+            to 200.
+
+    Returns:
+        float: The QUANTILE of the bytes per pixel of an 8-bit palette, or
+            BYTES_PER_PIXEL without enough history.
+    """
+    ratios = {}
+    for record in read_history(history_file):
+        try:
+            output = record["output"]
+            ratio = output["bytes"] / gif_bytes(
+                output["frames"], output["frame_pixels"], output["colors"], 1
+            )
+        except (KeyError, TypeError, ZeroDivisionError):
+            continue
+        ratios.setdefault(record.get("collection"), []).append(ratio)
+
+    samples = ratios.get(collection, [])[-limit:]
+    if len(samples) < MIN_SAMPLES:
+        samples = [r for values in ratios.values() for r in values][-limit:]
+    if len(samples) < MIN_SAMPLES:
+        return BYTES_PER_PIXEL
+    samples.sort()
+    return samples[min(len(samples) - 1, int(QUANTILE * len(samples)))]
+
+
+def _output_frames(count, step, fps, fading, frame_pixels):
+    frames = -(-count // step)
+    steps = fade_steps(frames, frame_pixels, fps, fading) if fading > 0 else 0
+    return frames + max(frames - 1, 0) * steps
+
+
+def plan_output(
+    collection,
+    bounds,
+    count,
+    dimensions=768,
+    fps=5,
+    max_bytes=MAX_OUTPUT_MB * MB,
+    fading=0.0,
+    history_file=HISTORY_FILE,
+):
+    """Chooses the dimensions, colors and frames of a timelapse to fit a budget.
+
+    Args:
+        collection (str): The collection name.
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees, or
+            None if unknown, in which case frames are assumed square.
+        count (int): Number of frames in the collection.
+        dimensions (int, optional): The requested dimensions. Defaults to 768.
+        fps (int, optional): The requested frames per second. Defaults to 5.
+        max_bytes (int, optional): The size budget per output. Defaults to
+            MAX_OUTPUT_MB.
+        fading (float, optional): Fading duration in seconds, which inserts
+            frames. Defaults to 0.
+        history_file (str, optional): The cost history. Defaults to
+            HISTORY_FILE.
+
+    Returns:
+        dict: The "dimensions", GIF "colors", subsampling "step", "fps" and MP4
+            "bitrate" (None for constant quality) to render with, and the
+            "predicted" GIF bytes and whether it "fits" the budget.
+    """
+    ratio = fit_ratio(collection, history_file)
+
+    def pixels(dims):
+        if bounds is None:
+            return dims * dims
+        width, height = frame_size(bounds, dims)
+        return width * height
+
+    def plan(dims, colors, step):
+        out_fps = max(1, round(fps / step))
+        frames = _output_frames(count, step, out_fps, fading, pixels(dims))
+        predicted = gif_bytes(frames, pixels(dims), colors, ratio)
+        # Subsampled frames play slower, so the timelapse keeps its duration.
+        bitrate = max_bytes * MP4_HEADROOM * 8 / max(frames / out_fps, 1e-3)
+        return {
+            "dimensions": dims,
+            "colors": colors,
+            "step": step,
+            "fps": out_fps,
+            "bitrate": int(bitrate) if bitrate < MAX_BITRATE else None,
+            "predicted": int(predicted),
+            "fits": predicted <= max_bytes,
+            "ratio": round(ratio, 4),
+        }
+
+    for step in STEPS:
+        for colors in COLORS:
+            candidate = plan(dimensions, colors, step)
+            if candidate["fits"]:
+                return candidate
+        # The largest dimensions that fit with the smallest palette.
+        scale = math.sqrt(max_bytes / max(candidate["predicted"], 1))
+        dims = int(dimensions * scale)
+        if scale >= MIN_SCALE and dims >= MIN_DIMENSIONS:
+            candidate = plan(dims, COLORS[-1], step)
+            if candidate["fits"]:
+                return candidate
+
+    return plan(max(MIN_DIMENSIONS, min(dimensions, dims)), COLORS[-1], STEPS[-1])
+
+
+def format_plan(plan):
+    """Formats a plan as a short sentence, e.g., "512 px, 128 colors"."""
+    items = [f"{plan['dimensions']} px", f"{plan['colors']} colors"]
+    if plan["step"] > 1:
+        items.append(f"every {plan['step']} frames at {plan['fps']} fps")
+    return "Planned " + ", ".join(items)
@@ -0,0 +1,314 @@
+"""Encode a stack of timelapse frames to GIF, MP4 and WebP in a single pass."""
+
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .jobs import Cancelled, check
+from .budget import format_plan
+from .quality import format_quality
+
+FORMATS = ["gif", "mp4", "webp"]
+
+
+def read_gif(in_gif):
+    """Reads all frames of a GIF into a single array.
+
+    Args:
+        in_gif (str): The input GIF file path.
+
+    Returns:
+        np.ndarray: The frames as a (frames, height, width, 3) uint8 array.
+    """
+    frames = []
+    with Image.open(in_gif) as image:
+        for index in range(image.n_frames):
+            image.seek(index)
+            frames.append(np.asarray(image.convert("RGB")))
+    return np.stack(frames)
+
+
+def shared_palette(frames, colors=256, max_samples=1_000_000):
+    """Computes one palette for the whole frame stack.
+
+    Pixels are sampled on a regular grid across all frames so that the palette
+    is computed once, instead of once per frame.
+
+    Args:
+        frames (np.ndarray): The frames as a (frames, height, width, 3) array.
+        colors (int, optional): Number of palette colors. Defaults to 256.
+        max_samples (int, optional): Maximum number of pixels to sample.
+            Defaults to 1,000,000.
+
+    Returns:
+        np.ndarray: The palette as a (colors, 3) uint8 array.
+    """
+    n, h, w, _ = frames.shape
+    step = max(1, int(np.ceil(np.sqrt(n * h * w / max_samples))))
+    sample = np.ascontiguousarray(frames[:, ::step, ::step].reshape(1, -1, 3))
+    image = Image.fromarray(sample).quantize(colors, method=Image.Quantize.MEDIANCUT)
+    palette = np.array(image.getpalette()[: colors * 3], dtype=np.uint8)
+    return palette.reshape(-1, 3)
+
+
+def quantize(frames, palette, bits=5):
+    """Maps every pixel of the frame stack to its nearest palette color.
+
+    A lookup table over a reduced RGB cube is built once, then the whole stack
+    is indexed in one vectorized operation.
+
+    Args:
+        frames (np.ndarray): The frames as a (frames, height, width, 3) array.
+        palette (np.ndarray): The palette as a (colors, 3) uint8 array.
+        bits (int, optional): Bits per channel of the lookup table. Defaults to 5.
+
+    Returns:
+        np.ndarray: Palette indices as a (frames, height, width) uint8 array.
+    """
+    shift = 8 - bits
+    levels = (np.arange(1 << bits) << shift) + (1 << shift >> 1)
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    cube = cube.reshape(-1, 1, 3).astype(np.int32)
+    pal = palette.astype(np.int32)[np.newaxis]
+
+    lut = np.empty(len(cube), dtype=np.uint8)
+    chunk = 4096
+    for start in range(0, len(cube), chunk):
+        dist = ((cube[start : start + chunk] - pal) ** 2).sum(axis=-1)
+        lut[start : start + chunk] = dist.argmin(axis=-1)
+    lut = lut.reshape(1 << bits, 1 << bits, 1 << bits)
+
+    rgb = frames >> shift
+    return lut[rgb[..., 0], rgb[..., 1], rgb[..., 2]]
+
+
+def encode_gif(frames, out_gif, duration, loop=0, colors=256):
+    """Encodes the frames as a GIF with a palette shared by all frames."""
+    palette = shared_palette(frames, colors)
+    indices = quantize(frames, palette)
+    flat_palette = palette.flatten().tolist()
+    images = []
+    for index in indices:
+        image = Image.fromarray(index, mode="P")
+        image.putpalette(flat_palette)
+        images.append(image)
+    images[0].save(
+        out_gif,
+        save_all=True,
+        append_images=images[1:],
+        duration=duration,
+        loop=loop,
+        optimize=False,
+    )
+
+
+def encode_webp(frames, out_webp, duration, loop=0, quality=75):
+    """Encodes the frames as an animated WebP."""
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(
+        out_webp,
+        save_all=True,
+        append_images=images[1:],
+        duration=duration,
+        loop=loop,
+        quality=quality,
+        method=4,
+    )
+
+
+def encode_mp4(frames, out_mp4, fps, crf=25, cancel=None, bitrate=None):
+    """Encodes the frames as an H.264 MP4 by piping raw pixels to ffmpeg.
+
+    Frames are written one at a time, so a cancelled job stops ffmpeg early.
+    With a bitrate, the size follows from the duration instead of the CRF.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise Exception("ffmpeg is not installed on your computer.")
+
+    n, h, w, _ = frames.shape
+    # yuv420p requires even dimensions.
+    frames = np.pad(frames, ((0, 0), (0, h % 2), (0, w % 2), (0, 0)), mode="edge")
+    if bitrate is None:
+        rate = ["-crf", str(crf)]
+    else:
+        rate = ["-b:v", str(bitrate), "-maxrate", str(bitrate)]
+        rate += ["-bufsize", str(2 * bitrate)]
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "-s",
+        f"{w + w % 2}x{h + h % 2}",
+        "-r",
+        str(fps),
+        "-i",
+        "-",
+        "-vcodec",
+        "libx264",
+        *rate,
+        "-pix_fmt",
+        "yuv420p",
+        out_mp4,
+    ]
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for frame in frames:
+            check(cancel)
+            process.stdin.write(np.ascontiguousarray(frame).tobytes())
+        process.stdin.close()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+
+
+def _encode(fmt, frames, out_path, fps, loop, quality, cancel=None, plan=None):
+    duration = 1000 / fps
+    plan = plan or {}
+    if fmt == "gif":
+        colors = int(np.clip(32 + quality * 224 / 100, 2, 256))
+        encode_gif(frames, out_path, duration, loop, plan.get("colors", colors))
+    elif fmt == "webp":
+        encode_webp(frames, out_path, duration, loop, quality)
+    elif fmt == "mp4":
+        crf = round(51 - quality * 0.35)
+        encode_mp4(frames, out_path, fps, crf, cancel, plan.get("bitrate"))
+
+
+def _encode_with_target(
+    fmt, frames, out_path, fps, loop, quality, max_bytes, cancel=None, plan=None
+):
+    start = time.perf_counter()
+    while True:
+        check(cancel)
+        try:
+            _encode(fmt, frames, out_path, fps, loop, quality, cancel, plan)
+            check(cancel)
+        except Cancelled:
+            # Don't leave a partial output behind.
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            raise
+        size = os.path.getsize(out_path)
+        if max_bytes is None or size <= max_bytes or quality <= 10:
+            break
+        quality = max(10, quality - 20)
+
+    return {
+        "path": out_path,
+        "seconds": time.perf_counter() - start,
+        "bytes": size,
+        "quality": quality,
+    }
+
+
+def encode_frames(
+    frames,
+    out_gif,
+    fps=5,
+    loop=0,
+    formats=("gif", "mp4"),
+    quality=75,
+    max_bytes=None,
+    cancel=None,
+    plan=None,
+):
+    """Encodes a frame stack to several formats concurrently.
+
+    The GIF, MP4 and WebP outputs are all written from the same in-memory
+    frames, so no output is decoded or re-encoded from another.
+
+    Args:
+        frames (np.ndarray | list): The frames as RGB arrays.
+        out_gif (str): The output GIF path. Other formats use the same path with
+            their own extension.
+        fps (int, optional): Frames per second. Defaults to 5.
+        loop (int, optional): Number of times the animation repeats. 0 means
+            forever. Defaults to 0.
+        formats (tuple, optional): Formats to emit, any of "gif", "mp4" and "webp".
+            Defaults to ("gif", "mp4").
+        quality (int, optional): Quality target from 1 to 100. It sets the GIF
+            color count, the WebP quality and the MP4 CRF. Defaults to 75.
+        max_bytes (int, optional): Size target per output. Outputs above it are
+            re-encoded at a lower quality. Defaults to None.
+        cancel (CancelToken, optional): Stops the encoders and raises Cancelled.
+            Defaults to None.
+        plan (dict, optional): An output plan from budget.plan_output(). Its
+            GIF colors and MP4 bitrate override the quality. Defaults to None.
+
+    Returns:
+        dict: Encoding time, output bytes and quality per format. A format
+            other than GIF that fails is reported with its "error".
+
+    Raises:
+        Exception: The error of the GIF encoder, if it fails.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    base = os.path.splitext(out_gif)[0]
+    report = {}
+
+    with ThreadPoolExecutor(max_workers=len(formats)) as executor:
+        futures = {
+            fmt: executor.submit(
+                _encode_with_target,
+                fmt,
+                frames,
+                f"{base}.{fmt}",
+                fps,
+                loop,
+                quality,
+                max_bytes,
+                cancel,
+                plan,
+            )
+            for fmt in formats
+        }
+        for fmt, future in futures.items():
+            try:
+                report[fmt] = future.result()
+            except Cancelled:
+                raise
+            except Exception as e:
+                if fmt == "gif":
+                    # Callers show the GIF, so there is no output without it.
+                    raise
+                report[fmt] = {"error": str(e)}
+
+    return report
+
+
+def format_report(report):
+    """Formats an encoding report as a single line of text.
+
+    Args:
+        report (dict): The report returned by encode_frames(), with the report
+            of quality.filter_frames() under "quality" if frames were filtered
+            and the output plan under "plan" if the output was budgeted.
+
+    Returns:
+        str: One entry per format, e.g., "GIF: 1.2 MB in 0.8 s".
+    """
+    items = []
+    for fmt, result in report.items():
+        if fmt == "quality":
+            items.append(format_quality(result))
+        elif fmt == "plan":
+            items.append(format_plan(result))
+        elif "error" in result:
+            items.append(f"{fmt.upper()}: failed ({result['error']})")
+        else:
+            size = result["bytes"] / 1024 / 1024
+            items.append(f"{fmt.upper()}: {size:.1f} MB in {result['seconds']:.1f} s")
+    return " | ".join(items)
@@ -0,0 +1,376 @@
+"""Pre-flight cost estimates and admission control for timelapse requests.
+
+Estimates are made from the ROI bounds, the output dimensions and the number of
+frames implied by the date range and frequency, before anything is sent to
+Earth Engine. Actual costs are recorded after each render so that later
+estimates are scaled by how far off earlier ones were. The history keeps the
+most recent renders only, and is parsed again only when it changes.
+"""
+
+import datetime
+import json
+import math
+import os
+import tempfile
+import threading
+
+# Budget defaults, overridable with environment variables.
+MAX_FRAME_PIXELS = int(os.environ.get("TIMELAPSE_MAX_FRAME_PIXELS", 4_000_000))
+MAX_TOTAL_PIXELS = int(os.environ.get("TIMELAPSE_MAX_TOTAL_PIXELS", 150_000_000))
+WARN_TOTAL_PIXELS = int(os.environ.get("TIMELAPSE_WARN_TOTAL_PIXELS", 50_000_000))
+MAX_FRAMES = int(os.environ.get("TIMELAPSE_MAX_FRAMES", 500))
+MIN_DIMENSIONS = 256
+
+HISTORY_FILE = os.environ.get(
+    "TIMELAPSE_COST_HISTORY",
+    os.path.join(tempfile.gettempdir(), "timelapse_costs.jsonl"),
+)
+# Renders kept in the history file. Older ones are dropped as new ones arrive.
+MAX_HISTORY = int(os.environ.get("TIMELAPSE_COST_HISTORY_MAX", 1000))
+
+# Minutes between GOES scans.
+GOES_CADENCE = {"full_disk": 10, "conus": 5, "mesoscale": 1}
+
+# Days covered by one frame for each temporal frequency.
+FREQUENCY_DAYS = {
+    "year": 365.25,
+    "quarter": 91.3,
+    "month": 30.44,
+    "week": 7,
+    "day": 1,
+    "hour": 1 / 24,
+    "minute": 1 / 1440,
+    "second": 1 / 86400,
+}
+
+# Rough model constants: GIF bytes per frame pixel, seconds per request and
+# seconds per million pixels.
+BYTES_PER_PIXEL = 0.6
+SECONDS_PER_REQUEST = 5.0
+SECONDS_PER_MEGAPIXEL = 0.4
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def count_frames(collection, start_date, end_date, frequency="year", scan=None):
+    """Predicts the number of frames of a timelapse.
+
+    Args:
+        collection (str): The collection name shown in the app.
+        start_date (str | date): Start of the date range.
+        end_date (str | date): End of the date range.
+        frequency (str, optional): The temporal frequency. Defaults to "year".
+        scan (str, optional): The GOES scan type, e.g., "full_disk". Defaults to
+            None.
+
+    Returns:
+        int: The predicted number of frames.
+    """
+    start = _to_datetime(start_date)
+    end = _to_datetime(end_date)
+    days = max((end - start).total_seconds() / 86400, 0)
+
+    if collection.startswith("Geostationary"):
+        minutes = GOES_CADENCE.get(scan or "full_disk", 10)
+        return max(1, int(days * 1440 / minutes))
+    elif collection.startswith("MODIS Vegetation"):
+        # One frame per 16-day composite of the year.
+        return 23
+    elif collection.startswith("USDA"):
+        # NAIP is acquired every two to three years.
+        return max(1, math.ceil((end.year - start.year + 1) / 2))
+    else:
+        return max(1, math.ceil(days / FREQUENCY_DAYS.get(frequency, 365.25)))
+
+
+def frame_size(bounds, dimensions=768):
+    """Predicts the frame size in pixels for the ROI bounds.
+
+    Args:
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees.
+        dimensions (int, optional): Maximum width or height. Defaults to 768.
+
+    Returns:
+        tuple: The frame (width, height).
+    """
+    minx, miny, maxx, maxy = bounds
+    miny, maxy = max(miny, -85), min(maxy, 85)
+
+    def mercator_y(lat):
+        return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+    width = math.radians(maxx - minx)
+    height = mercator_y(maxy) - mercator_y(miny)
+    if width <= 0 or height <= 0:
+        return dimensions, dimensions
+    if width >= height:
+        return dimensions, max(1, round(dimensions * height / width))
+    return max(1, round(dimensions * width / height)), dimensions
+
+
+# History file -> {"stamp", "lines", "records", "factors"} of its last read.
+_history = {}
+_history_lock = threading.Lock()
+
+
+def _stamp(history_file):
+    try:
+        stat = os.stat(history_file)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load(history_file):
+    stamp = _stamp(history_file)
+    with _history_lock:
+        entry = _history.get(history_file)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry
+
+    records = []
+    lines = 0
+    if stamp is not None:
+        try:
+            with open(history_file) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict):
+                        records.append(record)
+        except OSError:
+            pass
+    entry = {
+        "stamp": stamp,
+        "lines": lines,
+        "records": records[-MAX_HISTORY:],
+        "factors": {},
+    }
+    with _history_lock:
+        _history[history_file] = entry
+    return entry
+
+
+def read_history(history_file=HISTORY_FILE):
+    """Returns the most recent recorded renders, oldest first.
+
+    Args:
+        history_file (str, optional): The history file. Defaults to HISTORY_FILE.
+
+    Returns:
+        list: Up to MAX_HISTORY records. Do not modify them.
+    """
+    return _load(history_file)["records"]
+
+
+def calibration(collection=None, history_file=HISTORY_FILE, limit=200):
+    """Returns correction factors learned from recorded renders.
+
+    The factors are cached until the history file changes.
+
+    Args:
+        collection (str, optional): Only use records of this collection.
+            Defaults to None.
+        history_file (str, optional): The history file. Defaults to HISTORY_FILE.
+        limit (int, optional): Number of most recent records to use. Defaults
+            to 200.
+
+    Returns:
+        dict: Median ratios of actual to predicted "seconds" and "bytes".
+    """
+    entry = _load(history_file)
+    factors = entry["factors"].get((collection, limit))
+    if factors is not None:
+        return dict(factors)
+
+    records = [
+        r
+        for r in entry["records"]
+        if collection is None or r.get("collection") == collection
+    ]
+    factors = {}
+    for key in ["seconds", "bytes"]:
+        ratios = sorted(
+            r["actual"][key] / r["predicted"][key]
+            for r in records[-limit:]
+            if r["predicted"].get(key) and r["actual"].get(key)
+        )
+        factors[key] = ratios[len(ratios) // 2] if ratios else 1.0
+    entry["factors"][(collection, limit)] = factors
+    return dict(factors)
+
+
+def estimate_cost(
+    collection,
+    bounds,
+    start_date,
+    end_date,
+    frequency="year",
+    dimensions=768,
+    scan=None,
+    fill=1.0,
+):
+    """Predicts the size and duration of a timelapse request.
+
+    Args:
+        collection (str): The collection name shown in the app.
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees.
+        start_date (str | date): Start of the date range.
+        end_date (str | date): End of the date range.
+        frequency (str, optional): The temporal frequency. Defaults to "year".
+        dimensions (int, optional): Maximum frame width or height. Defaults to 768.
+        scan (str, optional): The GOES scan type. Defaults to None.
+        fill (float, optional): Fraction of the bounds covered by the ROI.
+            Defaults to 1.0.
+
+    Returns:
+        dict: The predicted frames, frame size, pixels, bytes and seconds.
+    """
+    frames = count_frames(collection, start_date, end_date, frequency, scan)
+    width, height = frame_size(bounds, dimensions)
+    frame_pixels = width * height
+    pixels = frames * frame_pixels
+    model = {
+        "bytes": pixels * max(fill, 0.1) * BYTES_PER_PIXEL,
+        "seconds": SECONDS_PER_REQUEST + pixels / 1e6 * SECONDS_PER_MEGAPIXEL,
+    }
+    factors = calibration(collection)
+
+    return {
+        "collection": collection,
+        "dimensions": dimensions,
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "frame_pixels": frame_pixels,
+        "pixels": pixels,
+        "bytes": int(model["bytes"] * factors["bytes"]),
+        "seconds": model["seconds"] * factors["seconds"],
+        "model": model,
+    }
+
+
+def admit(estimate, tiles=1):
+    """Decides whether a request should run, run smaller or be refused.
+
+    Args:
+        estimate (dict): The estimate returned by estimate_cost().
+        tiles (int, optional): Number of tiles per side each frame is split
+            into. The per-request pixel limit applies to each tile. Defaults to 1.
+
+    Returns:
+        tuple: The action ("ok", "warn", "downscale" or "refuse"), the
+            dimensions to render at and a message for the user.
+    """
+    dimensions = estimate["dimensions"]
+    frames = estimate["frames"]
+    size_mb = estimate["bytes"] / 1024 / 1024
+    summary = (
+        f"about {frames} frames of {estimate['width']}x{estimate['height']} pixels, "
+        f"{size_mb:.0f} MB and {estimate['seconds'] / 60:.1f} minutes"
+    )
+
+    if frames > MAX_FRAMES:
+        return (
+            "refuse",
+            dimensions,
+            f"This request would produce {summary}, above the limit of "
+            f"{MAX_FRAMES} frames. Try a shorter time span or a coarser frequency.",
+        )
+
+    scale = min(
+        1.0,
+        math.sqrt(MAX_FRAME_PIXELS * tiles**2 / estimate["frame_pixels"]),
+        math.sqrt(MAX_TOTAL_PIXELS / estimate["pixels"]),
+    )
+    if scale < 1.0:
+        new_dimensions = int(dimensions * scale)
+        if new_dimensions < MIN_DIMENSIONS:
+            return (
+                "refuse",
+                dimensions,
+                f"This request would produce {summary}, which is too much data. "
+                "Try reducing the ROI or timespan.",
+            )
+        return (
+            "downscale",
+            new_dimensions,
+            f"This request would produce {summary}. The timelapse will be "
+            f"rendered at {new_dimensions} pixels instead of {dimensions}.",
+        )
+
+    if estimate["pixels"] > WARN_TOTAL_PIXELS:
+        return (
+            "warn",
+            dimensions,
+            f"This request will produce {summary}. It may take a while.",
+        )
+
+    return "ok", dimensions, summary
+
+
+def record_cost(
+    estimate, seconds, out_gif=None, history_file=HISTORY_FILE, report=None
+):
+    """Records the predicted and actual cost of a render.
+
+    Args:
+        estimate (dict): The estimate returned by estimate_cost().
+        seconds (float): The actual render time in seconds.
+        out_gif (str, optional): The rendered GIF. Its size is recorded as the
+            actual bytes. Defaults to None.
+        history_file (str, optional): The history file. Defaults to HISTORY_FILE.
+        report (dict, optional): The report of a budgeted render. Its output
+            frames, pixels and colors are recorded for budget.fit_ratio().
+            Defaults to None.
+    """
+    actual = {"seconds": seconds}
+    if out_gif is not None and os.path.exists(out_gif):
+        actual["bytes"] = os.path.getsize(out_gif)
+
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "collection": estimate["collection"],
+        "frames": estimate["frames"],
+        "pixels": estimate["pixels"],
+        # Uncalibrated model values, so that calibration does not compound.
+        "predicted": estimate["model"],
+        "actual": actual,
+    }
+    plan = (report or {}).get("plan")
+    if plan is not None and "output" in plan and "bytes" in actual:
+        record["output"] = {**plan["output"], "bytes": actual["bytes"]}
+
+    try:
+        with open(history_file, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        return
+    _compact(history_file)
+
+
+def _compact(history_file):
+    # Rewrites the history with its most recent records once it grows too long.
+    entry = _load(history_file)
+    if entry["lines"] <= MAX_HISTORY:
+        return
+    tmp = f"{history_file}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            for record in entry["records"]:
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp, history_file)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+"""Fetch timelapse frames one by one so they can be previewed while they arrive."""
+
+import io
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import ee
+import numpy as np
+from PIL import Image
+
+from common.artifacts import session_id
+from common.ee_backend import get_backend
+from common.scheduler import inherit
+
+from .jobs import check
+from .tiling import mosaic, tile_grid, tile_requests
+
+VIS_BANDS = ["vis-red", "vis-green", "vis-blue"]
+# Thumbnail requests iter_frames() keeps in flight by default.
+MAX_WORKERS = 8
+
+
+def fetch_frame(image, params, mode="RGB", timeout=300):
+    """Downloads a single visualized image as an array.
+
+    Args:
+        image (ee.Image): A visualized image (vis-red, vis-green, vis-blue bands).
+        params (dict): Parameters passed to ee.Image.getThumbURL(). The
+            thumbnail is fetched by the configured Earth Engine backend.
+        mode (str, optional): The PIL mode to convert the image to. Use "L" for
+            single-band masks. Defaults to "RGB".
+        timeout (int, optional): Request timeout in seconds. Defaults to 300.
+
+    Returns:
+        np.ndarray: The frame as a (height, width, 3) uint8 array, or as a
+            (height, width) array for single-band modes.
+    """
+    content = get_backend().thumbnail(image, params, timeout)
+    return np.asarray(Image.open(io.BytesIO(content)).convert(mode))
+
+
+def frame_requests(region, dimensions=768, crs=None, tiles=1, bounds=None):
+    """Creates the thumbnail parameters of one frame, split into tiles if needed.
+
+    Args:
+        region (ee.Geometry): The region to render.
+        dimensions (int | str, optional): Maximum dimensions of each frame.
+            Defaults to 768.
+        crs (str | ee.Projection, optional): The projection to render the frames
+            in. Defaults to None.
+        tiles (int, optional): Number of tiles per side. Defaults to 1.
+        bounds (tuple, optional): The ROI bounds (minx, miny, maxx, maxy) in
+            degrees. Required when tiles is above 1. Defaults to None.
+
+    Returns:
+        list: Rows of thumbnail parameters, from north to south.
+    """
+    params = {
+        "bands": VIS_BANDS,
+        "min": 0,
+        "max": 255,
+        "region": region,
+        "dimensions": dimensions,
+        "format": "png",
+    }
+    if crs is not None:
+        params["crs"] = crs
+
+    if tiles > 1:
+        return tile_requests(tile_grid(bounds, dimensions, tiles), params)
+    return [[params]]
+
+
+def mask_requests(requests_grid):
+    """Adapts the thumbnail parameters of a frame to single-band 0/1 masks."""
+    return [
+        [dict(p, bands=["mask"], min=0, max=1) for p in row] for row in requests_grid
+    ]
+
+
+def fetch_mask(image, requests_grid):
+    """Downloads a single-band 0/1 image on the pixel grid of the frames.
+
+    Args:
+        image (ee.Image): An image with a "mask" band.
+        requests_grid (list): The frame parameters returned by frame_requests().
+
+    Returns:
+        np.ndarray: The mask as a (height, width) boolean array.
+    """
+    rows = [
+        [fetch_frame(image, p, "L") for p in row]
+        for row in mask_requests(requests_grid)
+    ]
+    return mosaic(rows) > 0
+
+
+def iter_frames(
+    collection,
+    region,
+    count,
+    dimensions=768,
+    crs=None,
+    max_workers=MAX_WORKERS,
+    tiles=1,
+    bounds=None,
+    mask_collection=None,
+    mode="RGB",
+    cancel=None,
+):
+    """Yields the frames of a visualized ImageCollection in chronological order.
+
+    Frames are requested concurrently, but yielded in order as soon as each one
+    (and all frames before it) has been downloaded.
+
+    Args:
+        collection (ee.ImageCollection): The visualized image collection.
+        region (ee.Geometry): The region to render.
+        count (int): The number of images in the collection.
+        dimensions (int | str, optional): Maximum dimensions of each frame.
+            Defaults to 768.
+        crs (str | ee.Projection, optional): The projection to render the frames
+            in. Defaults to None.
+        max_workers (int, optional): Number of concurrent requests. Defaults to
+            MAX_WORKERS.
+        tiles (int, optional): Number of tiles per side. Values above 1 render
+            each frame as a grid of tiles in EPSG:3857 and mosaic them locally.
+            Defaults to 1.
+        bounds (tuple, optional): The ROI bounds (minx, miny, maxx, maxy) in
+            degrees. Required when tiles is above 1. Defaults to None.
+        mask_collection (ee.ImageCollection, optional): A collection of 0/1
+            images with a "mask" band and one image per frame, e.g., fire
+            detections. Each mask is fetched on the same pixel grid as its frame,
+            through the same pool of requests. Defaults to None.
+        mode (str, optional): The PIL mode of the frames. Use "RGBA" to keep
+            masked pixels transparent. Defaults to "RGB".
+        cancel (CancelToken, optional): Cancels the requests that have not
+            started yet and raises Cancelled. Defaults to None.
+
+    Yields:
+        np.ndarray: Each frame as a (height, width, 3) uint8 array, or
+            (height, width, 4) in RGBA mode. If
+            mask_collection is given, (frame, mask) pairs where the mask is a
+            (height, width) boolean array.
+    """
+    requests_grid = frame_requests(region, dimensions, crs, tiles, bounds)
+    # Masks are rendered on the same grid, without the RGB visualization.
+    mask_grid = mask_requests(requests_grid)
+
+    images = collection.toList(count)
+    masks = None if mask_collection is None else mask_collection.toList(count)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def fetch(image, params, mode):
+        # Requests queued behind a cancellation are never sent.
+        check(cancel)
+        return fetch_frame(image, params, mode)
+
+    # The workers run on behalf of the session and the slot of the thread that
+    # consumes the frames.
+    fetch = inherit(fetch, session_id())
+
+    def submit(image, grid, mode):
+        return [[executor.submit(fetch, image, p, mode) for p in row] for row in grid]
+
+    def result(tile_futures):
+        futures = [future for row in tile_futures for future in row]
+        while cancel is not None and wait(futures, timeout=0.5).not_done:
+            check(cancel)
+        check(cancel)
+        return mosaic([[future.result() for future in row] for row in tile_futures])
+
+    try:
+        futures = []
+        for i in range(count):
+            frame = submit(ee.Image(images.get(i)), requests_grid, mode)
+            mask = None
+            if masks is not None:
+                mask = submit(ee.Image(masks.get(i)), mask_grid, "L")
+            futures.append((frame, mask))
+
+        for frame, mask in futures:
+            if mask is None:
+                yield result(frame)
+            else:
+                yield result(frame), result(mask) > 0
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def preview_strip(frames, height=120, max_frames=6):
+    """Creates a low-resolution strip of the most recent frames.
+
+    Args:
+        frames (list): The frames fetched so far.
+        height (int, optional): Height of the strip in pixels. Defaults to 120.
+        max_frames (int, optional): Maximum number of frames to show. Defaults to 6.
+
+    Returns:
+        np.ndarray: The preview strip as an RGB array.
+    """
+    thumbs = []
+    for frame in frames[-max_frames:]:
+        h, w = frame.shape[:2]
+        width = max(1, round(w * height / h))
+        thumb = Image.fromarray(frame).convert("RGB")
+        thumb = thumb.resize((width, height), Image.BILINEAR)
+        thumbs.append(np.asarray(thumb))
+    return np.hstack(thumbs)
@@ -0,0 +1,143 @@
+"""GOES collections prepared for frame-by-frame rendering."""
+
+import ee
+import numpy as np
+from geemap import timelapse as gt
+
+from .annotate import blend
+
+# Fire mask codes and their detection confidence, as in
+# geemap.goes_fire_timeseries().
+FIRE_MASK_CODES = [10, 30, 11, 31, 12, 32, 13, 33, 14, 34, 15, 35]
+FIRE_CONFIDENCE = [1.0, 1.0, 0.9, 0.9, 0.8, 0.8, 0.5, 0.5, 0.3, 0.3, 0.1, 0.1]
+FIRE_SCANS = {"full_disk": "FDCF", "conus": "FDCC"}
+
+
+def goes_collection(
+    roi,
+    start_date,
+    end_date,
+    data="GOES-17",
+    scan="full_disk",
+    bands=["CMI_C02", "CMI_GREEN", "CMI_C01"],
+    overlay_data=None,
+    overlay_color="black",
+    overlay_width=1,
+    overlay_opacity=1.0,
+):
+    """Creates a visualized GOES collection, mirroring geemap.goes_timelapse().
+
+    Args:
+        roi (ee.Geometry): The region of interest.
+        start_date (str): Start date of the time series, e.g., "2021-10-24T14:00:00".
+        end_date (str): End date of the time series, e.g., "2021-10-25T01:00:00".
+        data (str, optional): The GOES satellite to use. Defaults to "GOES-17".
+        scan (str, optional): The GOES scan to use. Defaults to "full_disk".
+        bands (list, optional): The bands to visualize. Defaults to
+            ["CMI_C02", "CMI_GREEN", "CMI_C01"].
+        overlay_data (str | ee.FeatureCollection, optional): Administrative
+            boundary to be drawn on the timelapse. Defaults to None.
+        overlay_color (str, optional): Color of the overlay. Defaults to "black".
+        overlay_width (int, optional): Line width of the overlay. Defaults to 1.
+        overlay_opacity (float, optional): Opacity of the overlay. Defaults to 1.0.
+
+    Returns:
+        tuple: The visualized ee.ImageCollection and the crs to render it in.
+    """
+    vis_params = {"bands": bands, "min": 0, "max": 0.8}
+
+    col = gt.goes_timeseries(start_date, end_date, data, scan, roi)
+    col = col.select(bands).map(
+        lambda img: img.visualize(**vis_params)
+        .setDefaultProjection(img.projection())
+        .set({"system:time_start": img.get("system:time_start")})
+    )
+
+    if overlay_data is not None:
+        col = gt.add_overlay(
+            col, overlay_data, overlay_color, overlay_width, overlay_opacity, roi
+        )
+        # The native GEOS projection doesn't work well with overlays.
+        crs = "EPSG:3857"
+    else:
+        crs = col.first().projection()
+
+    return col, crs
+
+
+def goes_dates(collection, date_format="YYYY-MM-dd HH:mm"):
+    """Returns the formatted acquisition time of each image in the collection.
+
+    Args:
+        collection (ee.ImageCollection): The GOES collection.
+        date_format (str, optional): The date format. Defaults to "YYYY-MM-dd HH:mm".
+
+    Returns:
+        list: The formatted dates.
+    """
+    dates = collection.aggregate_array("system:time_start")
+    return dates.map(lambda d: ee.Date(d).format(date_format)).getInfo()
+
+
+def goes_fire_masks(collection, start_date, end_date, data="GOES-17", scan="full_disk"):
+    """Creates one fire detection mask per image of a GOES collection.
+
+    Fire pixels of medium to high confidence are matched to the images by
+    acquisition time. Images without a fire product get an empty mask, so the
+    masks line up one to one with the frames.
+
+    Args:
+        collection (ee.ImageCollection): The collection returned by
+            goes_collection().
+        start_date (str): Start date of the time series.
+        end_date (str): End date of the time series.
+        data (str, optional): The GOES satellite to use. Defaults to "GOES-17".
+        scan (str, optional): Either "full_disk" or "conus". Defaults to
+            "full_disk".
+
+    Returns:
+        ee.ImageCollection: Images with a single "mask" band of 0 and 1.
+    """
+    if scan not in FIRE_SCANS:
+        raise ValueError("The scan must be either full_disk or conus.")
+
+    fdc = ee.ImageCollection(f"NOAA/GOES/{data[-2:]}/{FIRE_SCANS[scan]}")
+    fdc = fdc.filterDate(start_date, end_date)
+
+    join_filter = ee.Filter.equals(
+        leftField="system:time_start", rightField="system:time_start"
+    )
+    joined = ee.Join.saveFirst("match", outer=True).apply(collection, fdc, join_filter)
+
+    def fire_mask(img):
+        empty = ee.Image.constant(0).toByte().rename("mask")
+        fire = (
+            ee.Image(img.get("match"))
+            .remap(FIRE_MASK_CODES, FIRE_CONFIDENCE, 0, "Mask")
+            .gte(0.3)
+            .unmask(0)
+            .toByte()
+            .rename("mask")
+        )
+        return ee.Image(ee.Algorithms.If(img.get("match"), fire, empty))
+
+    return ee.ImageCollection(joined.map(fire_mask))
+
+
+def composite_fire(frames, masks, color=(255, 83, 73), opacity=0.7):
+    """Draws fire detections onto a copy of the frames.
+
+    Args:
+        frames (np.ndarray | list): The frames as RGB arrays.
+        masks (np.ndarray | list): The fire masks as boolean arrays.
+        color (tuple, optional): The RGB color of fire pixels. Defaults to
+            (255, 83, 73).
+        opacity (float, optional): Opacity of fire pixels. Defaults to 0.7.
+
+    Returns:
+        np.ndarray: The frames with the fire overlay.
+    """
+    frames = np.array(frames, dtype=np.uint8)
+    alpha = np.asarray(masks, dtype=np.float32) * opacity
+    blend(frames, alpha, color, 0, 0)
+    return frames
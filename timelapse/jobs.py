@@ -0,0 +1,186 @@
+"""Cooperative cancellation of timelapse jobs.
+
+Every timelapse render gets a CancelToken that the frame fetch and encode
+stages check between units of work. Tokens are registered per session, so a
+new submission cancels the session's previous job, and a watcher thread cancels
+the jobs of sessions that have disconnected.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two checks for disconnected sessions.
+WATCH_INTERVAL = 2.0
+
+
+class Cancelled(Exception):
+    """Raised by a stage when its job has been cancelled."""
+
+
+class CancelToken:
+    """A flag shared by the stages of one job.
+
+    Args:
+        session (str, optional): The session that owns the job. Defaults to
+            None.
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+        self.reason = None
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """Whether the job has been cancelled."""
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        """Cancels the job. Only the first reason is kept."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def check(self):
+        """Raises Cancelled if the job has been cancelled."""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout):
+        """Waits up to timeout seconds and returns whether the job was cancelled."""
+        return self._event.wait(timeout)
+
+
+def check(cancel):
+    """Raises Cancelled if the optional token has been cancelled.
+
+    Args:
+        cancel (CancelToken): The token, or None.
+    """
+    if cancel is not None:
+        cancel.check()
+
+
+class JobRegistry:
+    """The running job of each session."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Session -> CancelToken of its running job.
+        self._jobs = {}
+        self._watcher = None
+        self._counters = {"started": 0, "superseded": 0, "disconnected": 0}
+
+    def start(self, session):
+        """Starts a job for a session, superseding its previous job.
+
+        Args:
+            session (str): The session, or None for jobs that are not tracked.
+
+        Returns:
+            CancelToken: The token of the new job.
+        """
+        token = CancelToken(session)
+        if session is None:
+            return token
+        with self._lock:
+            previous = self._jobs.get(session)
+            self._jobs[session] = token
+            self._counters["started"] += 1
+            if previous is not None:
+                self._counters["superseded"] += 1
+        if previous is not None:
+            previous.cancel("superseded by a newer request")
+            logger.info("Superseded a timelapse job of session %s", session)
+        return token
+
+    def finish(self, token):
+        """Forgets a job that has ended.
+
+        Args:
+            token (CancelToken): The token returned by start().
+        """
+        with self._lock:
+            if self._jobs.get(token.session) is token:
+                del self._jobs[token.session]
+
+    def cancel(self, session, reason="cancelled"):
+        """Cancels the running job of a session, if any."""
+        with self._lock:
+            token = self._jobs.pop(session, None)
+        if token is not None:
+            token.cancel(reason)
+
+    def sweep(self, is_active):
+        """Cancels the jobs of sessions that are no longer connected.
+
+        Args:
+            is_active (callable): Returns whether a session is still connected.
+        """
+        with self._lock:
+            sessions = list(self._jobs)
+        for session in sessions:
+            if not is_active(session):
+                self.cancel(session, "the session disconnected")
+                with self._lock:
+                    self._counters["disconnected"] += 1
+                logger.info("Cancelled the timelapse job of session %s", session)
+
+    def watch(self, is_active, interval=WATCH_INTERVAL):
+        """Starts a daemon thread that sweeps disconnected sessions.
+
+        Calling it again while the thread is running has no effect.
+
+        Args:
+            is_active (callable): Returns whether a session is still connected.
+            interval (float, optional): Seconds between sweeps. Defaults to
+                WATCH_INTERVAL.
+        """
+
+        def run():
+            stop = threading.Event()
+            while not stop.wait(interval):
+                try:
+                    self.sweep(is_active)
+                except Exception:
+                    logger.exception("Failed to sweep timelapse jobs")
+
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(
+                    target=run, name="timelapse-jobs", daemon=True
+                )
+                self._watcher.start()
+
+    def metrics(self):
+        """Returns the number of running jobs and of started and cancelled jobs."""
+        with self._lock:
+            return {"running": len(self._jobs), **self._counters}
+
+
+registry = JobRegistry()
+
+
+@contextmanager
+def job(session, is_active=None):
+    """Runs a block as the current job of a session.
+
+    Args:
+        session (str): The session, or None for jobs that are not tracked.
+        is_active (callable, optional): Returns whether a session is still
+            connected. If given, jobs of disconnected sessions are cancelled.
+            Defaults to None.
+
+    Yields:
+        CancelToken: The token to pass to the stages of the job.
+    """
+    if is_active is not None:
+        registry.watch(is_active)
+    token = registry.start(session)
+    try:
+        yield token
+    finally:
+        registry.finish(token)
@@ -0,0 +1,84 @@
+"""Landsat and Sentinel-2 collections prepared for frame-by-frame rendering."""
+
+from geemap import timelapse as gt
+
+# The visualization geemap.landsat_timelapse() and sentinel2_timelapse() use.
+VIS_PARAMS = {"min": 0, "max": 0.4, "gamma": [1, 1, 1]}
+
+
+def landsat_collection(
+    roi,
+    start_year,
+    end_year,
+    start_date,
+    end_date,
+    bands=["NIR", "Red", "Green"],
+    apply_fmask=True,
+    frequency="year",
+    sentinel2=False,
+    overlay_data=None,
+    overlay_color="black",
+    overlay_width=1,
+    overlay_opacity=1.0,
+):
+    """Creates a visualized Landsat or Sentinel-2 collection, mirroring
+    geemap.landsat_timelapse() and geemap.sentinel2_timelapse().
+
+    Pixels removed by fmask, and periods without any image, stay masked, so
+    they come back transparent in PNG thumbnails.
+
+    Args:
+        roi (ee.Geometry): The region of interest.
+        start_year (int): Start year of the time series.
+        end_year (int): End year of the time series.
+        start_date (str): Start month and day of each period, e.g., "06-10".
+        end_date (str): End month and day of each period, e.g., "09-20".
+        bands (list, optional): The three bands to visualize. Defaults to
+            ["NIR", "Red", "Green"].
+        apply_fmask (bool, optional): Whether to mask clouds, shadows and snow.
+            Defaults to True.
+        frequency (str, optional): "year", "quarter" or "month". Defaults to
+            "year".
+        sentinel2 (bool, optional): Whether to use Sentinel-2 instead of
+            Landsat. Defaults to False.
+        overlay_data (str | ee.FeatureCollection, optional): Administrative
+            boundary to be drawn on the timelapse. Defaults to None.
+        overlay_color (str, optional): Color of the overlay. Defaults to "black".
+        overlay_width (int, optional): Line width of the overlay. Defaults to 1.
+        overlay_opacity (float, optional): Opacity of the overlay. Defaults to 1.0.
+
+    Returns:
+        tuple: The visualized ee.ImageCollection and the date label of each
+            frame.
+    """
+    if sentinel2:
+        col = gt.sentinel2_timeseries(
+            roi,
+            start_year,
+            end_year,
+            start_date,
+            end_date,
+            bands,
+            apply_fmask,
+            frequency=frequency,
+        )
+    else:
+        col = gt.landsat_timeseries(
+            roi, start_year, end_year, start_date, end_date, apply_fmask, frequency
+        )
+
+    vis_params = {**VIS_PARAMS, "bands": bands}
+    col = col.select(bands).map(
+        lambda img: img.visualize(**vis_params).set(
+            {
+                "system:time_start": img.get("system:time_start"),
+                "system:date": img.get("system:date"),
+            }
+        )
+    )
+    if overlay_data is not None:
+        col = gt.add_overlay(
+            col, overlay_data, overlay_color, overlay_width, overlay_opacity
+        )
+
+    return col, col.aggregate_array("system:date").getInfo()
@@ -0,0 +1,169 @@
+"""MODIS collections prepared for frame-by-frame rendering."""
+
+import ee
+import geemap.colormaps as cm
+from geemap import timelapse as gt
+
+NDVI_PALETTE = [
+    "FFFFFF",
+    "CE7E45",
+    "DF923D",
+    "F1B555",
+    "FCD163",
+    "99B718",
+    "74A901",
+    "66A000",
+    "529400",
+    "3E8601",
+    "207401",
+    "056201",
+    "004C00",
+    "023B01",
+    "012E01",
+    "011D01",
+    "011301",
+]
+
+
+def modis_ndvi_collection(
+    roi,
+    data="Terra",
+    band="NDVI",
+    start_date=None,
+    end_date=None,
+    overlay_data=None,
+    overlay_color="black",
+    overlay_width=1,
+    overlay_opacity=1.0,
+):
+    """Creates a visualized MODIS NDVI/EVI collection, mirroring
+    geemap.modis_ndvi_timelapse().
+
+    Args:
+        roi (ee.Geometry): The region of interest.
+        data (str, optional): Either "Terra" or "Aqua". Defaults to "Terra".
+        band (str, optional): Either "NDVI" or "EVI". Defaults to "NDVI".
+        start_date (str, optional): Start date, e.g., "2000-02-08". Defaults to None.
+        end_date (str, optional): End date. Defaults to None.
+        overlay_data (str | ee.FeatureCollection, optional): Administrative
+            boundary to be drawn on the timelapse. Defaults to None.
+        overlay_color (str, optional): Color of the overlay. Defaults to "black".
+        overlay_width (int, optional): Line width of the overlay. Defaults to 1.
+        overlay_opacity (float, optional): Opacity of the overlay. Defaults to 1.0.
+
+    Returns:
+        tuple: The visualized ee.ImageCollection and the label (MM-dd) of each
+            frame.
+    """
+    vis_params = {"min": 0.0, "max": 9000.0, "palette": NDVI_PALETTE}
+
+    col = gt.modis_ndvi_doy_ts(data, band, start_date, end_date, roi)
+    col = col.map(lambda img: img.visualize(**vis_params).clip(roi))
+
+    if overlay_data is not None:
+        col = gt.add_overlay(
+            col, overlay_data, overlay_color, overlay_width, overlay_opacity, roi
+        )
+
+    text = col.aggregate_array("system:index").getInfo()
+    return col, [d.replace("_", "-")[5:] for d in text]
+
+
+def modis_timeseries_collection(
+    collection,
+    roi,
+    start_date,
+    end_date,
+    frequency="year",
+    reducer="median",
+    bands=None,
+    palette=None,
+    vis_params=None,
+    overlay_data=None,
+    overlay_color="black",
+    overlay_width=1,
+    overlay_opacity=1.0,
+):
+    """Creates a visualized time series of a collection, mirroring
+    geemap.create_timelapse().
+
+    Args:
+        collection (ee.ImageCollection): The images to reduce, e.g., the gap
+            filled land surface temperature or MODIS ocean color collection.
+        roi (ee.Geometry): The region of interest.
+        start_date (str): Start date, e.g., "2018-01-01".
+        end_date (str): End date.
+        frequency (str, optional): One of "year", "month", "day". Defaults to
+            "year".
+        reducer (str, optional): The reducer of each period. Defaults to
+            "median".
+        bands (list, optional): The bands to show. Defaults to None, the first
+            band, or the first three bands reversed.
+        palette (str | list, optional): The palette of single-band images.
+            Defaults to None, the NDVI palette.
+        vis_params (dict, optional): Visualization parameters. A missing min or
+            max is computed from the first image. Defaults to None.
+        overlay_data (str | ee.FeatureCollection, optional): Administrative
+            boundary to be drawn on the timelapse. Defaults to None.
+        overlay_color (str, optional): Color of the overlay. Defaults to "black".
+        overlay_width (int, optional): Line width of the overlay. Defaults to 1.
+        overlay_opacity (float, optional): Opacity of the overlay. Defaults to 1.0.
+
+    Returns:
+        tuple: The visualized ee.ImageCollection, the date (YYYY-MM-dd) of each
+            frame and the visualization parameters, for drawing a colorbar.
+    """
+    col = gt.create_timeseries(
+        collection,
+        start_date,
+        end_date,
+        region=roi,
+        bands=bands,
+        frequency=frequency,
+        reducer=reducer,
+        drop_empty=True,
+    )
+    col = col.map(
+        lambda img: img.rename(
+            img.bandNames().map(lambda name: ee.String(name).replace(f"_{reducer}", ""))
+        )
+    )
+
+    if bands is None:
+        names = col.first().bandNames().getInfo()
+        bands = [names[0]] if len(names) < 3 else names[:3][::-1]
+    elif isinstance(bands, str):
+        bands = [bands]
+    if isinstance(palette, str):
+        palette = cm.get_palette(palette, 15)
+
+    vis_params = {"bands": bands, **(vis_params or {})}
+    if "min" not in vis_params or "max" not in vis_params:
+        img = col.first().select(bands)
+        scale = collection.first().select(0).projection().nominalScale().multiply(10)
+        if "min" not in vis_params:
+            values = gt.image_min_value(img, region=roi, scale=scale).getInfo()
+            vis_params["min"] = min(values.values())
+        if "max" not in vis_params:
+            values = gt.image_max_value(img, region=roi, scale=scale).getInfo()
+            vis_params["max"] = max(values.values())
+    if len(bands) > 1:
+        vis_params.pop("palette", None)
+    elif "palette" not in vis_params:
+        vis_params["palette"] = cm.palettes.ndvi if palette is None else palette
+
+    col = col.select(bands).map(
+        lambda img: img.visualize(**vis_params).set(
+            {
+                "system:time_start": img.get("system:time_start"),
+                "system:date": img.get("system:date"),
+            }
+        )
+    )
+
+    if overlay_data is not None:
+        col = gt.add_overlay(
+            col, overlay_data, overlay_color, overlay_width, overlay_opacity
+        )
+
+    return col, col.aggregate_array("system:date").getInfo(), vis_params
@@ -0,0 +1,166 @@
+"""Administrative boundary overlays rasterized once and composited locally.
+
+Instead of blending the boundary into every image on Earth Engine, the
+boundary is clipped to the ROI, simplified to the output resolution and
+painted into a single 0/1 mask on the pixel grid of the frames. Masks are
+cached, so repeated renders of the same ROI reuse them, and the line color and
+opacity are applied locally.
+"""
+
+import hashlib
+import math
+from collections import OrderedDict
+
+import ee
+import numpy as np
+import requests
+from PIL import ImageColor
+
+from .annotate import blend
+from .frames import fetch_mask, frame_requests
+
+# Boundary sets shipped as public Earth Engine assets.
+PUBLIC_OVERLAYS = ["continents", "countries", "us_states", "china"]
+
+# Rasterized masks, keyed by overlay, ROI, output grid and line width.
+_MASKS = OrderedDict()
+CACHE_SIZE = 64
+
+# GeoJSON files downloaded from user-supplied URLs.
+_GEOJSON = OrderedDict()
+
+
+def _cache_put(cache, key, value):
+    cache[key] = value
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _fingerprint(value):
+    """Returns a short, stable key for an ee object, a string or a tuple."""
+    if isinstance(value, ee.ComputedObject):
+        value = value.serialize()
+    return hashlib.sha256(str(value).encode()).hexdigest()
+
+
+def load_overlay(overlay_data):
+    """Resolves an overlay name, GeoJSON URL or asset id to a FeatureCollection.
+
+    GeoJSON files are downloaded once per URL.
+
+    Args:
+        overlay_data (str | ee.FeatureCollection): The overlay.
+
+    Returns:
+        ee.FeatureCollection: The boundary features.
+    """
+    if isinstance(overlay_data, ee.FeatureCollection):
+        return overlay_data
+    if overlay_data.lower() in PUBLIC_OVERLAYS:
+        return ee.FeatureCollection(f"users/giswqs/public/{overlay_data.lower()}")
+    if overlay_data.startswith("http"):
+        if overlay_data not in _GEOJSON:
+            r = requests.get(overlay_data, timeout=60)
+            r.raise_for_status()
+            _cache_put(_GEOJSON, overlay_data, r.json())
+        return ee.FeatureCollection(_GEOJSON[overlay_data])
+    return ee.FeatureCollection(overlay_data)
+
+
+def pixel_size(bounds, dimensions):
+    """Approximates the size of one output pixel in meters.
+
+    Args:
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees.
+        dimensions (int): Maximum width or height of the frames.
+
+    Returns:
+        float: The pixel size in meters.
+    """
+    minx, miny, maxx, maxy = bounds
+    latitude = math.radians((miny + maxy) / 2)
+    width = (maxx - minx) * 111320 * math.cos(latitude)
+    height = (maxy - miny) * 110540
+    return max(width, height, 1) / dimensions
+
+
+def overlay_mask(
+    overlay_data,
+    roi,
+    bounds,
+    dimensions=768,
+    crs="EPSG:3857",
+    width=1,
+    tiles=1,
+):
+    """Rasterizes a boundary overlay into a mask on the pixel grid of the frames.
+
+    Args:
+        overlay_data (str | ee.FeatureCollection): A public boundary set such as
+            "countries", an HTTP URL to a GeoJSON file or an asset id.
+        roi (ee.Geometry | ee.FeatureCollection): The region of interest.
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees.
+        dimensions (int, optional): Maximum width or height of the frames.
+            Defaults to 768.
+        crs (str, optional): The projection the frames are rendered in.
+            Defaults to "EPSG:3857".
+        width (int, optional): Line width in pixels. Defaults to 1.
+        tiles (int, optional): Number of tiles per side of the frames. Defaults
+            to 1.
+
+    Returns:
+        np.ndarray: The mask as a (height, width) boolean array.
+    """
+    key = (
+        _fingerprint(overlay_data),
+        _fingerprint(roi),
+        tuple(bounds),
+        dimensions,
+        _fingerprint(crs),
+        width,
+        tiles,
+    )
+    if key in _MASKS:
+        _MASKS.move_to_end(key)
+        return _MASKS[key]
+
+    if isinstance(roi, ee.Geometry):
+        region = roi
+    else:
+        region = roi.geometry()
+
+    # Clip to the ROI and drop detail below the size of one output pixel.
+    error = pixel_size(bounds, dimensions)
+    features = (
+        load_overlay(overlay_data)
+        .filterBounds(region)
+        .map(
+            lambda f: f.intersection(region, ee.ErrorMargin(error)).simplify(
+                ee.ErrorMargin(error)
+            )
+        )
+    )
+    image = ee.Image(0).byte().paint(features, 1, width).rename("mask")
+
+    requests_grid = frame_requests(region, dimensions, crs, tiles, bounds)
+    mask = fetch_mask(image, requests_grid)
+    _cache_put(_MASKS, key, mask)
+    return mask
+
+
+def composite_overlay(frames, mask, color="black", opacity=1.0):
+    """Draws a boundary mask onto a copy of the frames.
+
+    Args:
+        frames (np.ndarray | list): The frames as RGB arrays.
+        mask (np.ndarray): The boundary mask returned by overlay_mask().
+        color (str, optional): Line color. Defaults to "black".
+        opacity (float, optional): Line opacity. Defaults to 1.0.
+
+    Returns:
+        np.ndarray: The frames with the boundary drawn on them.
+    """
+    frames = np.array(frames, dtype=np.uint8)
+    alpha = mask.astype(np.float32) * opacity
+    blend(frames, alpha, ImageColor.getrgb(color)[:3], 0, 0)
+    return frames
@@ -0,0 +1,422 @@
+"""Pre-render the timelapse of every sample ROI at deploy time.
+
+Every sample ROI is rendered for each collection that offers it, with the
+default form values of the Timelapse page, on a pool of worker processes. The
+outputs go to artifacts.PRERENDER_DIR, which is served like other artifacts but
+never swept, and are listed in a manifest. When a user submits a sample ROI
+with unchanged form values, the page shows the pre-rendered files instead of
+rendering live.
+
+Some defaults move with the date, e.g., the end year of Landsat. They are left
+out of the manifest key, so an output rendered at deploy time keeps matching
+the page's defaults on later days. It is shown as long as the submitted value
+is today's default or the value it was rendered with.
+
+Usage:
+    python -m timelapse.prerender --workers 4
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from common.artifacts import PRERENDER_DIR, PRERENDER_QUOTA_BYTES
+
+from .budget import MAX_OUTPUT_MB
+from .samples import SAMPLE_ROIS, goes_rois
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = os.path.join(PRERENDER_DIR, "manifest.json")
+
+# Overlay values used when the boundary overlay is unchecked.
+NO_OVERLAY = {
+    "overlay_data": None,
+    "overlay_color": "black",
+    "overlay_width": 1,
+    "overlay_opacity": 1,
+}
+
+
+def moving_params(collection, today=None):
+    """Returns the default form values of a collection that move with the date.
+
+    Args:
+        collection (str): The collection name, as shown in the Timelapse page.
+        today (datetime.date, optional): The date. Defaults to today.
+
+    Returns:
+        dict: The form values, empty if no default depends on the date.
+    """
+    today = today or datetime.date.today()
+    if collection in [
+        "Landsat TM-ETM-OLI Surface Reflectance",
+        "Sentinel-2 MSI Surface Reflectance",
+    ]:
+        return {"end_year": today.year}
+    if collection == "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km":
+        return {"end_date": today.strftime("%Y-%m-%d")}
+    return {}
+
+
+def default_params(collection, roi_name, today=None):
+    """Returns the default form values of the Timelapse page for a sample ROI.
+
+    Args:
+        collection (str): The collection name, as shown in the Timelapse page.
+        roi_name (str): The sample ROI name.
+        today (datetime.date, optional): The date the defaults depend on.
+            Defaults to today.
+
+    Returns:
+        dict: The form values, as passed to render.render_timelapse().
+    """
+    import geemap.colormaps as cm
+
+    today = today or datetime.date.today()
+
+    if collection in [
+        "Landsat TM-ETM-OLI Surface Reflectance",
+        "Sentinel-2 MSI Surface Reflectance",
+    ]:
+        landsat = collection == "Landsat TM-ETM-OLI Surface Reflectance"
+        params = {
+            "title": "Landsat Timelapse" if landsat else "Sentinel-2 Timelapse",
+            "bands": ["SWIR1", "NIR", "Red"],
+            "frequency": "year",
+            "speed": 5,
+            "dimensions": 768,
+            "progress_bar_color": "#0000ff",
+            "start_year": 1984 if landsat else 2015,
+            "start_date": "01-01",
+            "end_date": "12-30",
+            "font_size": 30,
+            "font_color": "#ffffff",
+            "apply_fmask": True,
+            "font_type": "arial.ttf",
+            "fading": 0.0,
+            "mp4": True,
+            "min_valid": 0.5,
+            "max_cloud": 0.8,
+            "quality_action": "drop",
+            "max_mb": MAX_OUTPUT_MB,
+        }
+    elif collection == "Geostationary Operational Environmental Satellites (GOES)":
+        params = {
+            "satellite": "GOES-17",
+            "start": goes_rois[roi_name]["start_time"],
+            "end": goes_rois[roi_name]["end_time"],
+            "scan": "full_disk",
+            "fire": False,
+            "speed": 5,
+            "add_progress_bar": True,
+            "progress_bar_color": "#0000ff",
+            "font_size": 20,
+            "font_color": "#ffffff",
+            "fading": 0.0,
+            "formats": ["gif", "mp4"],
+        }
+    elif collection == "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km":
+        params = {
+            "satellite": "Terra",
+            "band": "NDVI",
+            "start_date": "2000-02-08",
+            "speed": 5,
+            "add_progress_bar": True,
+            "progress_bar_color": "#0000ff",
+            "font_size": 20,
+            "font_color": "#ffffff",
+            "font_type": "arial.ttf",
+            "fading": 0.0,
+            "tiles": 1,
+            "formats": ["gif", "mp4"],
+        }
+    else:
+        lst = collection == "MODIS Gap filled Land Surface Temperature Daily"
+        if lst:
+            asset_id = "projects/sat-io/open-datasets/gap-filled-lst/gf_day_1km"
+            palette = cm.get_palette(cm.list_colormaps()[90], 15)
+        else:
+            asset_id = "Aqua"
+            palette = cm.get_palette("coolwarm", 15)
+        params = {
+            "asset_id": asset_id,
+            "palette": palette,
+            "title": "Surface Temperature",
+            "start_date": "2018-01-01",
+            "end_date": "2020-12-31",
+            "frequency": "month",
+            "reducer": "median",
+            "vis_params": "",
+            "speed": 5,
+            "add_progress_bar": True,
+            "progress_bar_color": "#0000ff",
+            "font_size": 30,
+            "font_color": "#ffffff",
+            "font_type": "arial.ttf",
+            "add_colorbar": True,
+            "colorbar_label": "Surface Temperature (°C)",
+            "fading": 0.0,
+            "formats": ["gif", "mp4"],
+        }
+        if not lst:
+            params["band"] = "sst"
+
+    return {**params, **moving_params(collection, today), **NO_OVERLAY}
+
+
+def render_key(collection, roi_name, params):
+    """Returns the key of a rendering in the manifest.
+
+    Args:
+        collection (str): The collection name.
+        roi_name (str): The sample ROI name.
+        params (dict): The form values.
+
+    Returns:
+        str: A hex digest of the collection, ROI and form values, without the
+            values that move with the date.
+    """
+    moving = moving_params(collection)
+    params = {k: v for k, v in params.items() if k not in moving}
+    payload = json.dumps([collection, roi_name, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def jobs():
+    """Returns every (collection, sample ROI) combination."""
+    return [
+        (collection, roi_name)
+        for collection, rois in SAMPLE_ROIS.items()
+        for roi_name in rois
+    ]
+
+
+def _init_worker(token_name):
+    from common import ee_client
+
+    logging.basicConfig(level=logging.INFO)
+    ee_client.initialize(token_name)
+
+
+def render_sample(collection, roi_name, params, out_dir=PRERENDER_DIR):
+    """Renders one sample ROI with the given form values.
+
+    Args:
+        collection (str): The collection name.
+        roi_name (str): The sample ROI name.
+        params (dict): The form values.
+        out_dir (str, optional): The output directory. Defaults to
+            PRERENDER_DIR.
+
+    Returns:
+        dict: The manifest entry, with the output file names.
+    """
+    import geopandas as gpd
+    from geemap.common import gdf_to_ee
+
+    from .estimate import admit, estimate_cost
+    from .render import render_timelapse
+    from .samples import sample_geometry
+
+    key = render_key(collection, roi_name, params)
+    gdf = gpd.GeoDataFrame(
+        index=[0], crs="epsg:4326", geometry=[sample_geometry(collection, roi_name)]
+    )
+    roi = gdf_to_ee(gdf, geodesic=False)
+    bounds = tuple(gdf.total_bounds)
+
+    # Samples are held to the same budget as live requests.
+    start, end = _date_range(params)
+    estimate = estimate_cost(
+        collection,
+        bounds,
+        start,
+        end,
+        params.get("frequency", "year"),
+        768 * params.get("tiles", 1),
+        params.get("scan"),
+    )
+    action, dimensions, message = admit(estimate, params.get("tiles", 1))
+    if action == "refuse":
+        raise ValueError(message)
+
+    started = time.perf_counter()
+    out_gif = os.path.join(out_dir, f"{key}.gif")
+    report = render_timelapse(collection, roi, bounds, params, out_gif, dimensions)
+    files = sorted(name for name in os.listdir(out_dir) if name.split(".")[0] == key)
+    if f"{key}.gif" not in files:
+        raise RuntimeError("The timelapse was not written.")
+
+    return {
+        "collection": collection,
+        "roi": roi_name,
+        "params": params,
+        "files": files,
+        "report": report,
+        "seconds": round(time.perf_counter() - started, 1),
+        "rendered": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _date_range(params):
+    if "start_year" in params:
+        return f"{params['start_year']}-01-01", f"{params['end_year']}-12-28"
+    if "start" in params:
+        return params["start"], params["end"]
+    return params["start_date"], params["end_date"]
+
+
+def read_manifest(path=None):
+    """Returns the manifest, or an empty one if there is none."""
+    try:
+        with open(path or MANIFEST_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest, path=None):
+    """Writes the manifest atomically."""
+    path = path or MANIFEST_FILE
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp, path)
+
+
+def prerender(workers=4, force=False, token_name="EARTHENGINE_TOKEN", today=None):
+    """Renders every sample ROI that is missing from the manifest.
+
+    Args:
+        workers (int, optional): Number of worker processes. Defaults to 4.
+        force (bool, optional): Whether to render samples that are already in
+            the manifest. Defaults to False.
+        token_name (str, optional): The environment variable holding the Earth
+            Engine token. Defaults to "EARTHENGINE_TOKEN".
+        today (datetime.date, optional): The date the defaults depend on.
+            Defaults to today.
+
+    Returns:
+        dict: The manifest.
+    """
+    os.makedirs(PRERENDER_DIR, exist_ok=True)
+    manifest = read_manifest()
+    pending = {}
+    for collection, roi_name in jobs():
+        params = default_params(collection, roi_name, today)
+        key = render_key(collection, roi_name, params)
+        entry = manifest.get(key)
+        if not force and entry is not None and _complete(entry):
+            continue
+        pending[key] = (collection, roi_name, params)
+
+    logger.info("Pre-rendering %d of %d samples", len(pending), len(jobs()))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(token_name,)
+    ) as executor:
+        futures = {
+            executor.submit(render_sample, *job): key for key, job in pending.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            collection, roi_name, _ = pending[key]
+            try:
+                manifest[key] = future.result()
+                logger.info("Rendered %s / %s", collection, roi_name)
+            except Exception as e:
+                manifest.pop(key, None)
+                logger.error("Failed %s / %s: %s", collection, roi_name, e)
+            write_manifest(manifest)
+
+    # Drop outputs of samples whose defaults have changed.
+    current = {render_key(c, r, default_params(c, r, today)) for c, r in jobs()}
+    for key in list(manifest):
+        if key not in current:
+            del manifest[key]
+    for name in os.listdir(PRERENDER_DIR):
+        if (
+            name != os.path.basename(MANIFEST_FILE)
+            and name.split(".")[0] not in current
+        ):
+            os.remove(os.path.join(PRERENDER_DIR, name))
+    write_manifest(manifest)
+
+    size = sum(
+        os.path.getsize(os.path.join(PRERENDER_DIR, name))
+        for name in os.listdir(PRERENDER_DIR)
+    )
+    if size > PRERENDER_QUOTA_BYTES:
+        # The public artifact quota shrinks to keep ./static under 1 GB.
+        logger.warning(
+            "Pre-rendered samples take %d bytes, more than the %d reserved",
+            size,
+            PRERENDER_QUOTA_BYTES,
+        )
+    return manifest
+
+
+def _complete(entry):
+    return all(
+        os.path.exists(os.path.join(PRERENDER_DIR, name)) for name in entry["files"]
+    )
+
+
+_cache = {"mtime": None, "manifest": {}}
+_cache_lock = threading.Lock()
+
+
+def prerendered(collection, roi_name, params, today=None):
+    """Returns the pre-rendered GIF of a sample ROI, if the form values match.
+
+    A value that moves with the date matches if it is today's default or the
+    value the sample was rendered with.
+
+    Args:
+        collection (str): The collection name.
+        roi_name (str): The sample ROI name.
+        params (dict): The submitted form values.
+        today (datetime.date, optional): The date of today's defaults.
+            Defaults to today.
+
+    Returns:
+        str: The GIF path, or None if the sample was not pre-rendered with
+            these form values.
+    """
+    try:
+        mtime = os.path.getmtime(MANIFEST_FILE)
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cache["mtime"] != mtime:
+            _cache["manifest"] = read_manifest()
+            _cache["mtime"] = mtime
+        manifest = _cache["manifest"]
+
+    key = render_key(collection, roi_name, params)
+    entry = manifest.get(key)
+    if entry is None or not _complete(entry):
+        return None
+    for name, default in moving_params(collection, today).items():
+        if params.get(name) not in [default, entry["params"].get(name)]:
+            return None
+    return os.path.join(PRERENDER_DIR, f"{key}.gif")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-render the sample timelapses.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--token-name", default="EARTHENGINE_TOKEN")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    manifest = prerender(args.workers, args.force, args.token_name)
+    print(f"{len(manifest)} samples in {MANIFEST_FILE}")
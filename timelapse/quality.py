@@ -0,0 +1,192 @@
+"""Score timelapse frames and remove the empty or cloud-dominated ones.
+
+Landsat and Sentinel-2 frames are fetched as RGBA thumbnails, in which pixels
+removed by fmask and periods without any image are transparent. Each frame is
+scored from the fetched arrays by the fraction of the ROI it covers with valid
+pixels and by a luminance histogram of those pixels, and the frames below the
+thresholds are dropped or interpolated before annotation and encoding.
+"""
+
+import numpy as np
+
+# Number of luminance histogram bins per frame.
+BINS = 16
+# Pixels whose three channels are all at least this bright count as cloud.
+CLOUD_LEVEL = 200
+# Frames scored at once, to bound the memory of the intermediate arrays.
+BATCH_SIZE = 16
+
+
+def valid_masks(frames):
+    """Returns the valid pixels of each frame.
+
+    Args:
+        frames (np.ndarray): The frames as (frames, height, width, 4) RGBA or
+            (frames, height, width, 3) RGB arrays.
+
+    Returns:
+        np.ndarray: A (frames, height, width) boolean array. Transparent pixels
+            of RGBA frames and black pixels of RGB frames are invalid.
+    """
+    frames = np.asarray(frames)
+    if frames.shape[-1] == 4:
+        return frames[..., 3] > 0
+    return frames.max(axis=-1) > 0
+
+
+def frame_stats(frames, valid=None):
+    """Computes the valid fraction and histogram statistics of each frame.
+
+    The ROI footprint is every pixel that is valid in at least one frame, so
+    the pixels outside a clipped, non-rectangular ROI don't count as missing.
+
+    Args:
+        frames (np.ndarray): The frames, see valid_masks().
+        valid (np.ndarray, optional): The valid pixels, as returned by
+            valid_masks(). Defaults to None, which computes them.
+
+    Returns:
+        dict: Per-frame arrays of the "valid" fraction of the footprint, the
+            "mean" and "std" luminance and the "cloud" fraction of the valid
+            pixels, and the (frames, BINS) luminance "histogram".
+    """
+    frames = np.asarray(frames)
+    if valid is None:
+        valid = valid_masks(frames)
+    count = len(frames)
+    area = max(int(valid.any(axis=0).sum()), 1)
+
+    histogram = np.zeros((count, BINS), dtype=np.int64)
+    cloud = np.zeros(count, dtype=np.int64)
+    for start in range(0, count, BATCH_SIZE):
+        rgb = frames[start : start + BATCH_SIZE, ..., :3]
+        mask = valid[start : start + BATCH_SIZE]
+        n = len(rgb)
+        # Integer BT.601 luminance, 0-255.
+        wide = rgb.astype(np.uint16)
+        luma = (77 * wide[..., 0] + 150 * wide[..., 1] + 29 * wide[..., 2]) >> 8
+        # One bincount for the whole batch, offset by frame.
+        bins = (luma >> 4) + (np.arange(n) * BINS)[:, np.newaxis, np.newaxis]
+        histogram[start : start + n] = np.bincount(
+            bins[mask], minlength=n * BINS
+        ).reshape(n, BINS)
+        cloud[start : start + n] = ((rgb.min(axis=-1) >= CLOUD_LEVEL) & mask).sum(
+            axis=(1, 2)
+        )
+
+    pixels = histogram.sum(axis=1)
+    centers = (np.arange(BINS) + 0.5) * 256 / BINS
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = histogram @ centers / pixels
+        std = np.sqrt(np.maximum(histogram @ centers**2 / pixels - mean**2, 0))
+        cloud = cloud / pixels
+
+    return {
+        "valid": pixels / area,
+        "mean": np.nan_to_num(mean),
+        "std": np.nan_to_num(std),
+        "cloud": np.nan_to_num(cloud),
+        "histogram": histogram,
+    }
+
+
+def interpolate_frames(frames, keep):
+    """Replaces the rejected frames by a blend of their nearest kept frames.
+
+    Each rejected frame is weighted between the kept frames before and after
+    it by its distance to them. Rejected frames at either end copy the nearest
+    kept frame.
+
+    Args:
+        frames (np.ndarray): The RGB frames.
+        keep (np.ndarray): A boolean array, True for the frames to keep. At
+            least one frame must be kept.
+
+    Returns:
+        np.ndarray: The frames, with the rejected ones replaced.
+    """
+    kept = np.flatnonzero(keep)
+    out = frames.copy()
+    for i in np.flatnonzero(~keep):
+        j = np.searchsorted(kept, i)
+        if j == 0:
+            out[i] = frames[kept[0]]
+        elif j == len(kept):
+            out[i] = frames[kept[-1]]
+        else:
+            before, after = kept[j - 1], kept[j]
+            weight = (i - before) / (after - before)
+            mixed = frames[before] * (1 - weight) + frames[after] * weight
+            out[i] = mixed.round().astype(np.uint8)
+    return out
+
+
+def filter_frames(
+    frames, text_sequence=None, min_valid=0.5, max_cloud=1.0, action="drop"
+):
+    """Drops or interpolates the frames that are mostly masked or cloudy.
+
+    If no frame passes, all frames are kept.
+
+    Args:
+        frames (np.ndarray | list): The frames, see valid_masks().
+        text_sequence (list, optional): One label per frame. The labels of
+            dropped frames are dropped too. Defaults to None.
+        min_valid (float, optional): Minimum fraction of the ROI a frame must
+            cover with valid pixels. Defaults to 0.5.
+        max_cloud (float, optional): Maximum fraction of the valid pixels that
+            may be cloud. Defaults to 1.0, which keeps cloudy frames.
+        action (str, optional): "drop" or "interpolate". Defaults to "drop".
+
+    Returns:
+        tuple: The RGB frames, with invalid pixels set to black, the labels
+            and a report with the number of frames "removed".
+    """
+    if action not in ["drop", "interpolate"]:
+        raise ValueError(f"Unknown action {action}. Use 'drop' or 'interpolate'.")
+
+    frames = np.asarray(frames, dtype=np.uint8)
+    valid = valid_masks(frames)
+    stats = frame_stats(frames, valid)
+    keep = (stats["valid"] >= min_valid) & (stats["cloud"] <= max_cloud)
+
+    rgb = frames[..., :3].copy()
+    rgb[~valid] = 0
+
+    report = {
+        "frames": len(frames),
+        "removed": int((~keep).sum()),
+        "action": action,
+        "min_valid": min_valid,
+        "max_cloud": max_cloud,
+        "valid": [round(float(v), 3) for v in stats["valid"]],
+        "cloud": [round(float(v), 3) for v in stats["cloud"]],
+    }
+    if keep.all():
+        return rgb, text_sequence, report
+    if not keep.any():
+        report["removed"] = 0
+        report["skipped"] = True
+        return rgb, text_sequence, report
+
+    if action == "interpolate":
+        return interpolate_frames(rgb, keep), text_sequence, report
+
+    if text_sequence is not None:
+        text_sequence = [text for text, k in zip(text_sequence, keep) if k]
+    return rgb[keep], text_sequence, report
+
+
+def format_quality(report):
+    """Formats the report of filter_frames() as a short sentence.
+
+    Args:
+        report (dict): The report returned by filter_frames().
+
+    Returns:
+        str: The number of frames removed, e.g., "Dropped 3 of 40 frames".
+    """
+    if report.get("skipped"):
+        return f"No frame passed the quality filter, all {report['frames']} kept"
+    verb = "Interpolated" if report["action"] == "interpolate" else "Dropped"
+    return f"{verb} {report['removed']} of {report['frames']} frames"
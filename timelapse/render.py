@@ -0,0 +1,523 @@
+"""Render a timelapse of a built-in collection from the Timelapse form values.
+
+The Timelapse page and the deploy-time pre-rendering CLI both render through
+render_timelapse(), so a pre-rendered sample is the exact output the page would
+produce for the same form values.
+"""
+
+import json
+import os
+
+import ee
+from PIL import Image
+
+from .annotate import annotate_frames, fade_frames, paste_image
+from .budget import MB, plan_output
+from .encode import encode_frames
+from .frames import MAX_WORKERS, iter_frames
+from .jobs import check
+from .goes import composite_fire, goes_collection, goes_dates, goes_fire_masks
+from .landsat import landsat_collection
+from .modis import modis_ndvi_collection, modis_timeseries_collection
+from .overlay import composite_overlay, overlay_mask
+from .quality import filter_frames
+
+
+def fire_path(out_gif):
+    """Returns the path of the fire timelapse rendered next to a GOES timelapse.
+
+    The path shares the stem of out_gif, so both files have the same owner.
+    """
+    return os.path.splitext(out_gif)[0] + ".fire.gif"
+
+
+def request_width(collection):
+    """Returns the number of Earth Engine requests a render keeps in flight.
+
+    Collections rendered frame by frame fetch MAX_WORKERS frames at once, the
+    ones rendered by geemap make one request at a time.
+    """
+    if collection in [
+        "Landsat TM-ETM-OLI Surface Reflectance",
+        "Sentinel-2 MSI Surface Reflectance",
+        "Geostationary Operational Environmental Satellites (GOES)",
+        "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km",
+        "MODIS Gap filled Land Surface Temperature Daily",
+        "MODIS Ocean Color SMI",
+    ]:
+        return MAX_WORKERS
+    return 1
+
+
+def _formats(params):
+    if "formats" in params:
+        return list(params["formats"])
+    return ["gif"] + ["mp4"] * params.get("mp4", False)
+
+
+def _overlay(params):
+    return {
+        "overlay_data": params.get("overlay_data"),
+        "overlay_color": params.get("overlay_color", "black"),
+        "overlay_width": params.get("overlay_width", 1),
+        "overlay_opacity": params.get("overlay_opacity", 1.0),
+    }
+
+
+def _remote_overlay(overlay, local_overlay):
+    # A local overlay is composited after the frames are fetched.
+    if local_overlay:
+        return {**overlay, "overlay_data": None}
+    return overlay
+
+
+def _report(progress, message, frames=None):
+    if progress is not None:
+        progress(message, frames)
+
+
+def _collect(col, roi, count, progress, **kwargs):
+    frames = []
+    masks = []
+    for item in iter_frames(col, roi, count, **kwargs):
+        if kwargs.get("mask_collection") is not None:
+            frame, mask = item
+            masks.append(mask)
+        else:
+            frame = item
+        frames.append(frame)
+        _report(progress, f"Fetching frames... {len(frames)}/{count}", frames)
+    return frames, masks
+
+
+def render_landsat(
+    collection, roi, bounds, params, out_gif, dimensions, progress=None, cancel=None
+):
+    """Renders a Landsat or Sentinel-2 timelapse.
+
+    The output is planned to fit params["max_mb"] once the number of frames is
+    known, so frames that are subsampled away are never fetched. Frames that
+    are mostly masked by fmask, or dominated by clouds, are dropped or
+    interpolated before they are annotated and encoded.
+    """
+    overlay = _overlay(params)
+    local_overlay = overlay["overlay_data"] is not None and bounds is not None
+
+    col, text_sequence = landsat_collection(
+        roi,
+        params["start_year"],
+        params["end_year"],
+        params["start_date"],
+        params["end_date"],
+        bands=params["bands"],
+        apply_fmask=params["apply_fmask"],
+        frequency=params["frequency"],
+        sentinel2=collection == "Sentinel-2 MSI Surface Reflectance",
+        **_remote_overlay(overlay, local_overlay),
+    )
+    count = len(text_sequence)
+    fps = params["speed"]
+
+    plan = None
+    if params["max_mb"]:
+        plan = plan_output(
+            collection,
+            bounds,
+            count,
+            dimensions,
+            fps,
+            params["max_mb"] * MB,
+            params["fading"],
+        )
+        dimensions, fps = plan["dimensions"], plan["fps"]
+        if plan["step"] > 1:
+            images = col.toList(count)
+            indices = list(range(0, count, plan["step"]))
+            col = ee.ImageCollection([ee.Image(images.get(i)) for i in indices])
+            text_sequence = [text_sequence[i] for i in indices]
+            count = len(indices)
+
+    frames, _ = _collect(
+        col,
+        roi,
+        count,
+        progress,
+        dimensions=dimensions,
+        crs="EPSG:3857",
+        mode="RGBA",
+        cancel=cancel,
+    )
+
+    check(cancel)
+    frames, text_sequence, quality = filter_frames(
+        frames,
+        text_sequence,
+        params["min_valid"],
+        params["max_cloud"],
+        params["quality_action"],
+    )
+
+    if local_overlay:
+        outline = overlay_mask(
+            overlay["overlay_data"],
+            roi,
+            bounds,
+            dimensions,
+            "EPSG:3857",
+            overlay["overlay_width"],
+        )
+        frames = composite_overlay(
+            frames, outline, overlay["overlay_color"], overlay["overlay_opacity"]
+        )
+
+    _report(progress, "Encoding timelapse... Please wait...")
+    frames = annotate_frames(
+        frames,
+        text_sequence,
+        xy=("2%", "2%"),
+        title=params["title"],
+        title_xy=("2%", "90%"),
+        font_type=params["font_type"],
+        font_size=params["font_size"],
+        font_color=params["font_color"],
+        add_progress_bar=True,
+        progress_bar_color=params["progress_bar_color"],
+        progress_bar_height=5,
+    )
+    if params["fading"] > 0:
+        frames = fade_frames(frames, fps, params["fading"])
+    report = encode_frames(
+        frames,
+        out_gif,
+        fps=fps,
+        formats=_formats(params),
+        cancel=cancel,
+        plan=plan,
+    )
+    report = {"quality": quality, **report}
+    if plan is not None:
+        # What was actually encoded, for fitting later plans.
+        plan["output"] = {
+            "frames": len(frames),
+            "frame_pixels": int(frames.shape[1] * frames.shape[2]),
+            "colors": plan["colors"],
+        }
+        report["plan"] = plan
+    return report
+
+
+def render_goes(roi, bounds, params, out_gif, dimensions, progress=None, cancel=None):
+    """Renders a GOES timelapse, and its fire timelapse if requested."""
+    overlay = _overlay(params)
+    scan = params["scan"]
+    fire = params["fire"] and scan in ["full_disk", "conus"]
+    # The boundary is rasterized once and drawn locally, instead of being
+    # blended into every image.
+    local_overlay = overlay["overlay_data"] is not None and bounds is not None
+
+    col, crs = goes_collection(
+        roi,
+        params["start"],
+        params["end"],
+        data=params["satellite"],
+        scan=scan,
+        **_remote_overlay(overlay, local_overlay),
+    )
+    if local_overlay:
+        # The native GEOS projection doesn't work well with overlays.
+        crs = "EPSG:3857"
+    text_sequence = goes_dates(col, "YYYY-MM-dd HH:mm")
+    count = len(text_sequence)
+
+    # Fire masks are fetched alongside the frames, so the fire timelapse reuses
+    # the same imagery.
+    masks = None
+    if fire:
+        masks = goes_fire_masks(
+            col, params["start"], params["end"], data=params["satellite"], scan=scan
+        )
+    frames, fire_masks = _collect(
+        col,
+        roi,
+        count,
+        progress,
+        dimensions=dimensions,
+        crs=crs,
+        mask_collection=masks,
+        cancel=cancel,
+    )
+
+    if local_overlay:
+        outline = overlay_mask(
+            overlay["overlay_data"],
+            roi,
+            bounds,
+            dimensions,
+            crs,
+            overlay["overlay_width"],
+        )
+        frames = composite_overlay(
+            frames, outline, overlay["overlay_color"], overlay["overlay_opacity"]
+        )
+
+    check(cancel)
+    _report(progress, "Encoding timelapse... Please wait...")
+    annotate_params = {
+        "xy": ("3%", "3%"),
+        "font_type": "arial.ttf",
+        "font_size": params["font_size"],
+        "font_color": params["font_color"],
+        "add_progress_bar": params["add_progress_bar"],
+        "progress_bar_color": params["progress_bar_color"],
+        "progress_bar_height": 5,
+    }
+    if fire:
+        fire_frames = annotate_frames(
+            composite_fire(frames, fire_masks), text_sequence, **annotate_params
+        )
+    frames = annotate_frames(frames, text_sequence, **annotate_params)
+    if params["fading"] > 0:
+        frames = fade_frames(frames, params["speed"], params["fading"])
+    report = encode_frames(
+        frames,
+        out_gif,
+        fps=params["speed"],
+        formats=_formats(params),
+        cancel=cancel,
+    )
+    if fire:
+        encode_frames(
+            fire_frames,
+            fire_path(out_gif),
+            fps=params["speed"],
+            formats=["gif"],
+            cancel=cancel,
+        )
+    return report
+
+
+def render_modis_ndvi(
+    roi, bounds, params, out_gif, dimensions, progress=None, cancel=None
+):
+    """Renders a MODIS NDVI/EVI timelapse."""
+    overlay = _overlay(params)
+    tiles = params["tiles"] if bounds is not None else 1
+    local_overlay = overlay["overlay_data"] is not None and bounds is not None
+
+    col, text_sequence = modis_ndvi_collection(
+        roi,
+        params["satellite"],
+        params["band"],
+        params["start_date"],
+        params["end_date"],
+        **_remote_overlay(overlay, local_overlay),
+    )
+    count = len(text_sequence)
+    frames, _ = _collect(
+        col,
+        roi,
+        count,
+        progress,
+        dimensions=dimensions,
+        crs="EPSG:3857",
+        tiles=tiles,
+        bounds=bounds,
+        cancel=cancel,
+    )
+
+    if local_overlay:
+        outline = overlay_mask(
+            overlay["overlay_data"],
+            roi,
+            bounds,
+            dimensions,
+            "EPSG:3857",
+            overlay["overlay_width"],
+            tiles,
+        )
+        frames = composite_overlay(
+            frames, outline, overlay["overlay_color"], overlay["overlay_opacity"]
+        )
+
+    check(cancel)
+    _report(progress, "Encoding timelapse... Please wait...")
+    frames = annotate_frames(
+        frames,
+        text_sequence,
+        xy=("3%", "3%"),
+        font_type=params["font_type"],
+        font_size=params["font_size"],
+        font_color=params["font_color"],
+        add_progress_bar=params["add_progress_bar"],
+        progress_bar_color=params["progress_bar_color"],
+        progress_bar_height=5,
+    )
+    if params["fading"] > 0:
+        frames = fade_frames(frames, params["speed"], params["fading"])
+    return encode_frames(
+        frames,
+        out_gif,
+        fps=params["speed"],
+        formats=_formats(params),
+        cancel=cancel,
+    )
+
+
+def render_modis_timeseries(
+    collection, roi, params, out_gif, dimensions, progress=None, cancel=None
+):
+    """Renders a MODIS land surface temperature or ocean color timelapse.
+
+    The collection is built like geemap.create_timelapse() builds it, but the
+    frames are fetched one by one and annotated and encoded in memory, so the
+    GIF is not written by geemap and then decoded again for the other formats.
+
+    The frames are not split into tiles: each frame is requested as one
+    thumbnail. Large ROIs such as the World sample are therefore downscaled by
+    estimate.admit() to the per-request pixel limit instead of being rendered
+    at full resolution.
+    """
+    from geemap import timelapse as gt
+
+    check(cancel)
+    if collection == "MODIS Gap filled Land Surface Temperature Daily":
+        source = ee.ImageCollection(params["asset_id"])
+        bands, vis_params, bg_color = None, None, None
+    else:
+        bands = params["band"]
+        source = gt.modis_ocean_color_timeseries(
+            params["asset_id"],
+            params["start_date"],
+            params["end_date"],
+            roi,
+            bands,
+            params["frequency"],
+            params["reducer"],
+        )
+        vis_params = params["vis_params"]
+        if vis_params.startswith("{") and vis_params.endswith("}"):
+            vis_params = json.loads(vis_params.replace("'", '"'))
+        else:
+            vis_params = None
+        bg_color = "white"
+
+    col, text_sequence, vis_params = modis_timeseries_collection(
+        source,
+        roi,
+        params["start_date"],
+        params["end_date"],
+        frequency=params["frequency"],
+        reducer=params["reducer"],
+        bands=bands,
+        palette=params["palette"],
+        vis_params=vis_params,
+        **_overlay(params),
+    )
+    frames, _ = _collect(
+        col,
+        roi,
+        len(text_sequence),
+        progress,
+        dimensions=dimensions,
+        crs="EPSG:3857",
+        cancel=cancel,
+    )
+
+    check(cancel)
+    _report(progress, "Encoding timelapse... Please wait...")
+    frames = annotate_frames(
+        frames,
+        text_sequence,
+        xy=("2%", "2%"),
+        title=params["title"],
+        title_xy=("2%", "90%"),
+        font_type=params["font_type"],
+        font_size=params["font_size"],
+        font_color=params["font_color"],
+        add_progress_bar=params["add_progress_bar"],
+        progress_bar_color=params["progress_bar_color"],
+        progress_bar_height=5,
+    )
+    if params["add_colorbar"] and "palette" in vis_params:
+        colorbar = gt.save_colorbar(
+            None,
+            6.0,
+            0.4,
+            vis_params["min"],
+            vis_params["max"],
+            vis_params["palette"],
+            label=params["colorbar_label"],
+            label_size=12,
+            tick_size=10,
+            bg_color=bg_color,
+            show_colorbar=False,
+        )
+        try:
+            with Image.open(colorbar) as image:
+                paste_image(frames, image)
+        finally:
+            os.remove(colorbar)
+    if params["fading"] > 0:
+        frames = fade_frames(frames, params["speed"], params["fading"])
+    return encode_frames(
+        frames,
+        out_gif,
+        fps=params["speed"],
+        formats=_formats(params),
+        cancel=cancel,
+    )
+
+
+def render_timelapse(
+    collection,
+    roi,
+    bounds,
+    params,
+    out_gif,
+    dimensions=768,
+    progress=None,
+    cancel=None,
+):
+    """Renders the timelapse of a built-in collection.
+
+    Args:
+        collection (str): The collection name, as shown in the Timelapse page.
+        roi (ee.Geometry): The region of interest.
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees, or
+            None if unknown.
+        params (dict): The form values of the collection, see
+            prerender.default_params() for the keys.
+        out_gif (str): The output GIF path. MP4 and WebP outputs are written
+            next to it.
+        dimensions (int, optional): Maximum dimensions of each frame. Defaults
+            to 768.
+        progress (callable, optional): Called with a status message and, while
+            frames arrive, the frames fetched so far. Defaults to None.
+        cancel (CancelToken, optional): Stops the frame fetch and encode stages
+            and raises jobs.Cancelled. Defaults to None.
+
+    Returns:
+        dict: The encoding report, as returned by encode_frames(), with the
+            frame quality report under "quality" for Landsat and Sentinel-2.
+    """
+    if collection in [
+        "Landsat TM-ETM-OLI Surface Reflectance",
+        "Sentinel-2 MSI Surface Reflectance",
+    ]:
+        return render_landsat(
+            collection, roi, bounds, params, out_gif, dimensions, progress, cancel
+        )
+    if collection == "Geostationary Operational Environmental Satellites (GOES)":
+        return render_goes(roi, bounds, params, out_gif, dimensions, progress, cancel)
+    if collection == "MODIS Vegetation Indices (NDVI/EVI) 16-Day Global 1km":
+        return render_modis_ndvi(
+            roi, bounds, params, out_gif, dimensions, progress, cancel
+        )
+    if collection in [
+        "MODIS Gap filled Land Surface Temperature Daily",
+        "MODIS Ocean Color SMI",
+    ]:
+        return render_modis_timeseries(
+            collection, roi, params, out_gif, dimensions, progress, cancel
+        )
+    raise ValueError(f"No renderer for {collection}.")
@@ -0,0 +1,81 @@
+"""Read uploaded ROIs from memory and simplify them before they reach Earth Engine.
+
+Uploads are read with pyogrio straight from their bytes, so nothing is written
+to the temp directory. Parsed ROIs are cached by content hash, and the geometry
+is simplified to the pixel size of the rendered frames, since detail below one
+pixel cannot show up in a timelapse but is still sent with every request.
+"""
+
+import hashlib
+import io
+from collections import OrderedDict
+
+import geopandas as gpd
+import pyogrio
+import shapely
+
+# Parsed uploads, keyed by the SHA-256 of their content.
+_CACHE = OrderedDict()
+CACHE_SIZE = 32
+
+# ROIs with more vertices than this after simplification are replaced by their
+# convex hull.
+MAX_VERTICES = 5000
+
+
+def read_roi(content):
+    """Reads a GeoJSON, KML or zipped shapefile from memory.
+
+    Args:
+        content (bytes): The file content.
+
+    Returns:
+        gpd.GeoDataFrame: The features, in EPSG:4326.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    if digest in _CACHE:
+        _CACHE.move_to_end(digest)
+        return _CACHE[digest].copy()
+
+    gdf = pyogrio.read_dataframe(io.BytesIO(content))
+    if gdf.crs is None:
+        gdf = gdf.set_crs("EPSG:4326")
+    elif not gdf.crs.equals("EPSG:4326"):
+        gdf = gdf.to_crs("EPSG:4326")
+
+    _CACHE[digest] = gdf
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return gdf.copy()
+
+
+def count_vertices(geometry):
+    """Returns the number of vertices of a shapely geometry."""
+    return int(shapely.get_num_coordinates(geometry))
+
+
+def simplify_roi(gdf, dimensions=768, max_vertices=MAX_VERTICES):
+    """Merges and simplifies an ROI to the pixel size of the output frames.
+
+    Args:
+        gdf (gpd.GeoDataFrame): The ROI in EPSG:4326.
+        dimensions (int, optional): Maximum frame width or height the ROI will
+            be rendered at. Defaults to 768.
+        max_vertices (int, optional): Vertex budget. ROIs still above it after
+            simplification are replaced by their convex hull. Defaults to 5000.
+
+    Returns:
+        gpd.GeoDataFrame: A single-feature ROI.
+    """
+    geometry = gdf.geometry.union_all()
+    minx, miny, maxx, maxy = geometry.bounds
+    # Half a pixel, so that the simplified outline stays within the same pixels.
+    tolerance = max(maxx - minx, maxy - miny) / dimensions / 2
+
+    simplified = geometry.simplify(tolerance, preserve_topology=True)
+    if simplified.is_empty:
+        simplified = geometry.envelope
+    elif count_vertices(simplified) > max_vertices:
+        simplified = simplified.convex_hull
+
+    return gpd.GeoDataFrame(index=[0], crs="EPSG:4326", geometry=[simplified])
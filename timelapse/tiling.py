@@ -0,0 +1,122 @@
+"""Split large ROIs into a grid of tiles that are rendered separately.
+
+Earth Engine limits the number of pixels per thumbnail request. Rendering each
+frame as a grid of smaller requests in EPSG:3857, then mosaicking the tiles
+locally, lets continent-scale timelapses render at full resolution.
+
+The MODIS land surface temperature and ocean color timelapses are not tiled:
+each of their frames is fetched as one thumbnail, and large ROIs are
+downscaled instead.
+"""
+
+import math
+
+import ee
+import numpy as np
+
+from .estimate import frame_size
+
+MAX_LATITUDE = 85.0511
+
+
+def _lat_to_y(lat):
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+
+def _y_to_lat(y):
+    return math.degrees(2 * math.atan(math.exp(y)) - math.pi / 2)
+
+
+def _split(total, parts):
+    """Splits an integer into nearly equal integer parts."""
+    return [total // parts + (i < total % parts) for i in range(parts)]
+
+
+def tile_grid(bounds, dimensions, tiles):
+    """Splits the ROI bounds into a grid of tiles with exact pixel sizes.
+
+    The tile edges are placed so that every tile has the same pixel size in
+    EPSG:3857 as its share of the full frame, which lets the tiles be joined
+    without resampling.
+
+    Args:
+        bounds (tuple): The ROI bounds (minx, miny, maxx, maxy) in degrees.
+        dimensions (int): Maximum width or height of the full frame.
+        tiles (int): Number of tiles per side.
+
+    Returns:
+        list: Rows of tiles, from north to south. Each tile is a tuple of its
+            (minx, miny, maxx, maxy) bounds in degrees and its (width, height)
+            in pixels.
+    """
+    minx, miny, maxx, maxy = bounds
+    width, height = frame_size(bounds, dimensions)
+    widths = _split(width, tiles)
+    heights = _split(height, tiles)
+
+    x_edges = [minx]
+    for w in widths:
+        x_edges.append(x_edges[-1] + (maxx - minx) * w / width)
+
+    top, bottom = _lat_to_y(maxy), _lat_to_y(miny)
+    y_edges = [top]
+    for h in heights:
+        y_edges.append(y_edges[-1] - (top - bottom) * h / height)
+    lat_edges = [_y_to_lat(y) for y in y_edges]
+
+    grid = []
+    for row, h in enumerate(heights):
+        grid.append(
+            [
+                (
+                    (
+                        x_edges[col],
+                        lat_edges[row + 1],
+                        x_edges[col + 1],
+                        lat_edges[row],
+                    ),
+                    (w, h),
+                )
+                for col, w in enumerate(widths)
+            ]
+        )
+    return grid
+
+
+def tile_requests(grid, params):
+    """Creates the thumbnail parameters for each tile of the grid.
+
+    Args:
+        grid (list): The grid returned by tile_grid().
+        params (dict): The thumbnail parameters of the full frame.
+
+    Returns:
+        list: Rows of thumbnail parameters, one per tile.
+    """
+    rows = []
+    for row in grid:
+        rows.append(
+            [
+                dict(
+                    params,
+                    region=ee.Geometry.Rectangle(list(box), None, False),
+                    dimensions=f"{w}x{h}",
+                    crs="EPSG:3857",
+                )
+                for box, (w, h) in row
+            ]
+        )
+    return rows
+
+
+def mosaic(rows):
+    """Joins the rows of tile arrays into a single frame.
+
+    Args:
+        rows (list): Rows of (height, width, 3) arrays, from north to south.
+
+    Returns:
+        np.ndarray: The mosaicked frame.
+    """
+    return np.concatenate([np.concatenate(row, axis=1) for row in rows], axis=0)